@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
 from fastapi import APIRouter, HTTPException, Request, Response
+import asyncio
 import chess
 import chess.pgn
 import chess.svg
 import io
 import re
+from typing import Any, Awaitable
+
+from app.backend.db.codecs import TYPED_ARRAY_MISSING, pack_move, typed_array_base64
 
 try:
     from app.backend.db.db import (
@@ -13,6 +17,7 @@ try:
         get_moves,
         get_game_raw_pgn,
         get_eval,
+        get_game_evals,
         update_move_annotations,
         save_quiz_results,
         get_quiz_results,
@@ -101,6 +106,28 @@ MOVETEXT_COMMENT_ALIAS_REGEX = re.compile(
     r"\{\s*(?P<alias>1/2-1/2|½-½|=|∞|\+=|=\+|\+/-|-/\+|\+-|-\+)\s*}"
 )
 
+BATCH_PREEMPTION_RETRIES = 3
+CLIENT_DISCONNECT_POLL_SECONDS = 0.25
+CLIENT_CLOSED_REQUEST_STATUS = 499
+
+
+async def _cancel_on_disconnect(request: Request, work: Awaitable[Any]) -> Any:
+    """Await engine-backed work, cancelling it (which stops its engine) if the client disconnects."""
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=CLIENT_DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info("Client disconnected from %s; cancelling engine work", request.url.path)
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise HTTPException(status_code=CLIENT_CLOSED_REQUEST_STATUS, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
+
 
 async def _read_pgn_from_request(request: Request) -> str:
     """Read PGN text from JSON or multipart form-data."""
@@ -311,6 +338,19 @@ def _build_quiz_positions_from_rows(rows: list[dict]) -> list[dict]:
     return quiz_positions
 
 
+async def _precompute_quiz_positions(game_id: int | None) -> None:
+    """Queue background MultiPV analysis of a stored game's quiz positions so submissions hit the cache."""
+    if game_id is None or not DB_ENABLED:
+        return
+    try:
+        from app.backend.services.quiz_results_service import schedule_quiz_precompute
+
+        rows = await get_moves(game_id)
+        schedule_quiz_precompute([position["fen_before"] for position in _build_quiz_positions_from_rows(rows)])
+    except Exception as e:
+        logger.warning("Could not queue quiz precomputation for game_id=%s: %s", game_id, e)
+
+
 def _apply_db_annotations_to_mainline_tree(variation_tree: dict | None, rows: list[dict]) -> dict[int, dict]:
     mainline_lookup = _build_mainline_node_lookup(variation_tree)
     for row in rows:
@@ -461,6 +501,14 @@ def _extract_pgn_tree(pgn_str: str) -> tuple[dict, list[int]]:
         raise ValueError(str(e))
 
 
+def _parse_elo(value: str | None) -> int | None:
+    try:
+        elo = int((value or "").strip())
+    except ValueError:
+        return None
+    return elo if elo > 0 else None
+
+
 def _parse_pgn_payload(pgn_str: str) -> tuple[dict, list[dict], list[dict], int, str, dict, list[int]]:
     """Parse PGN into headers, UI positions, DB move rows, ply count, movetext, and variation tree."""
     try:
@@ -473,6 +521,8 @@ def _parse_pgn_payload(pgn_str: str) -> tuple[dict, list[dict], list[dict], int,
             "date": game.headers.get("Date", "Unknown"),
             "result": game.headers.get("Result", "*"),
             "site": game.headers.get("Site", "Unknown"),
+            "white_elo": _parse_elo(game.headers.get("WhiteElo")),
+            "black_elo": _parse_elo(game.headers.get("BlackElo")),
         }
 
         board = game.board()
@@ -563,6 +613,7 @@ async def analyze_pgn(request: Request):
 
                 await insert_moves(game_id, move_rows)
                 logger.info(f"Moves inserted successfully ({len(move_rows)} rows)")
+                await _precompute_quiz_positions(game_id)
             except Exception as e:
                 logger.error(f"DB error during insert in analyze_pgn: {e}", exc_info=True)
                 # Don't fail the entire request; still return positions from parsing
@@ -632,6 +683,7 @@ async def create_game_from_pgn(request: Request):
             try:
                 game_id = await create_game(game_str, headers)
                 await insert_moves(game_id, move_rows)
+                await _precompute_quiz_positions(game_id)
             except Exception as e:
                 logger.error(f"DB error during insert: {e}", exc_info=True)
 
@@ -723,6 +775,7 @@ async def fetch_game_moves(game_id: int):
             "san": None if r["san"] == "START" else r["san"],
             "comment": r.get("comment"),
             "cp_tag": r.get("cp_tag"),
+            "nag": r.get("nag"),
             "color": r.get("color"),
         }
         for r in rows
@@ -806,6 +859,7 @@ async def save_game_annotations(game_id: int, request: Request):
         })
 
     updated = await update_move_annotations(game_id, normalized_annotations)
+    await _precompute_quiz_positions(game_id)
     return {
         "success": True,
         "game_id": game_id,
@@ -823,19 +877,290 @@ async def fetch_eval(fen: str):
         raise HTTPException(status_code=404, detail="Evaluation not found")
     return row
 
+def _build_eval_graph(rows: list[dict], encoding: str = "json") -> dict[str, Any]:
+    """
+    Per-ply eval arrays for a game's mainline, aligned by index with `plies`.
+
+    Plies without a stored eval are listed in `missing` (with their FEN) so the client can
+    analyse just those. With `encoding="typed"` the numeric arrays are base64 little-endian
+    Int32Arrays (missing = `missing_value`) and best moves are Uint16 packed moves (0 = none).
+    """
+    plies = [row["ply"] for row in rows]
+    cp = [row.get("score_cp") for row in rows]
+    mate = [row.get("score_mate") for row in rows]
+    depth = [row.get("depth") for row in rows]
+    best_move = [row.get("best_move") for row in rows]
+    missing = [{"ply": row["ply"], "fen": row["fen"]} for row in rows if row.get("depth") is None]
+
+    graph: dict[str, Any] = {"encoding": encoding, "count": len(rows), "missing": missing}
+    if encoding == "typed":
+        return {
+            **graph,
+            "missing_value": TYPED_ARRAY_MISSING,
+            "plies": typed_array_base64(plies),
+            "cp": typed_array_base64(cp),
+            "mate": typed_array_base64(mate),
+            "depth": typed_array_base64(depth),
+            "best_move": typed_array_base64((pack_move(move) if move else 0 for move in best_move), "H", 0),
+        }
+    return {**graph, "plies": plies, "cp": cp, "mate": mate, "depth": depth, "best_move": best_move}
+
+
+@router.get("/games/{game_id}/evals")
+async def fetch_game_evals(game_id: int, encoding: str = "json"):
+    """Eval graph for a game: every mainline ply's stored eval from one moves/evals join."""
+    if not DB_ENABLED:
+        raise HTTPException(status_code=503, detail="Database not configured. Set DATABASE_URL in .env file.")
+    if encoding not in {"json", "typed"}:
+        raise HTTPException(status_code=400, detail="encoding must be 'json' or 'typed'")
+    rows = await get_game_evals(game_id)
+    if not rows:
+        raise HTTPException(status_code=404, detail="Game not found or has no moves")
+    return {"success": True, "game_id": game_id, **_build_eval_graph(rows, encoding)}
+
+@router.get("/games/{game_id}/accuracy")
+async def fetch_game_accuracy(game_id: int, refresh: bool = False):
+    """
+    Per-side ACPL / accuracy and per-move classification for a game.
+
+    Served from `game_accuracy`; computed on first request, after deeper evals of the game's
+    positions marked it stale, or when `refresh=true`. Blunders and mistakes tag the position
+    before them as critical, so their quiz positions are queued for precomputation.
+    """
+    if not DB_ENABLED:
+        raise HTTPException(status_code=503, detail="Database not configured. Set DATABASE_URL in .env file.")
+
+    from app.backend.db.db import get_game_accuracy
+    from app.backend.services.game_accuracy import refresh_games_accuracy
+
+    report = None if refresh else await get_game_accuracy(game_id)
+    if report is None or report.get("stale"):
+        report = (await refresh_games_accuracy([game_id])).get(game_id)
+        if report is None:
+            raise HTTPException(status_code=404, detail="Game not found or has no moves")
+        await _precompute_quiz_positions(game_id)
+        report = {**report, "stale": False}
+
+    for move in report.get("moves", []):
+        move["nag_display"] = NAG_DISPLAY_MAP.get(move["nag"]) if move.get("nag") else None
+    return {"success": True, **report}
+
+def _build_player_stats(player: dict) -> dict[str, Any]:
+    stats = player["stats"]
+    games = stats["games"]
+
+    def average(total: float, count: int) -> float | None:
+        return round(total / count, 1) if count else None
+
+    return {
+        "player": stats["name"],
+        "games": games,
+        "wins": stats["wins"],
+        "draws": stats["draws"],
+        "losses": stats["losses"],
+        "score_percentage": round(100 * (stats["wins"] + stats["draws"] / 2) / games, 1) if games else None,
+        "acpl": average(stats["acpl_total"], stats["acpl_games"]),
+        "accuracy": average(stats["accuracy_total"], stats["accuracy_games"]),
+        "blunders_by_phase": {
+            phase: stats[f"blunders_{phase}"] for phase in ("opening", "middlegame", "endgame")
+        },
+        # Oldest first, ready to plot.
+        "accuracy_trend": [
+            {
+                "game_id": game["game_id"],
+                "date": game["date"],
+                "color": game["color"],
+                "result": "win" if game["wins"] else "draw" if game["draws"] else "loss" if game["losses"] else None,
+                "acpl": average(game["acpl_total"], game["acpl_games"]),
+                "accuracy": average(game["accuracy_total"], game["accuracy_games"]),
+            }
+            for game in reversed(player["recent"])
+        ],
+    }
+
+
+@router.get("/players/{name}/stats")
+async def fetch_player_stats(name: str):
+    """Per-player results, ACPL / accuracy and blunder phases over every analysed game, from the running totals."""
+    if not DB_ENABLED:
+        raise HTTPException(status_code=503, detail="Database not configured. Set DATABASE_URL in .env file.")
+
+    from app.backend.db.db import get_player_stats
+
+    player = await get_player_stats(name)
+    if not player:
+        raise HTTPException(status_code=404, detail="No analysed games for this player")
+    return {"success": True, **_build_player_stats(player)}
+
+POSITION_GAMES_DEFAULT_LIMIT = 50
+POSITION_GAMES_MAX_LIMIT = 500
+_POSITION_HASH_RE = re.compile(r"[0-9a-fA-F]{16}")
+_POSITION_CURSOR_RE = re.compile(r"(\d+):(\d+)")
+
+
+def _parse_position_key(key: str) -> int:
+    """Signed 64-bit position hash from a 16-digit hex Zobrist key or a FEN / EPD."""
+    key = key.strip()
+    if _POSITION_HASH_RE.fullmatch(key):
+        value = int(key, 16)
+        return value - (1 << 64) if value >= 1 << 63 else value
+
+    from app.backend.db.db import position_zobrist
+
+    zobrist = position_zobrist(key)
+    if zobrist is None:
+        raise HTTPException(status_code=400, detail="key must be a 16-digit hex position hash or a FEN")
+    return zobrist
+
+
+@router.get("/positions/{key:path}/games")
+async def fetch_position_games(key: str, after: str | None = None, limit: int = POSITION_GAMES_DEFAULT_LIMIT):
+    """
+    Every stored game (and ply) that reached a position, by hex Zobrist key or FEN.
+
+    Paginated by cursor: pass the response's `next_cursor` as `after` for the next page.
+    """
+    if not DB_ENABLED:
+        raise HTTPException(status_code=503, detail="Database not configured. Set DATABASE_URL in .env file.")
+
+    from app.backend.db.db import find_position_games
+
+    zobrist = _parse_position_key(key)
+    cursor = None
+    if after:
+        match = _POSITION_CURSOR_RE.fullmatch(after)
+        if not match:
+            raise HTTPException(status_code=400, detail="after must be a cursor of the form game_id:ply")
+        cursor = (int(match.group(1)), int(match.group(2)))
+    limit = max(1, min(limit, POSITION_GAMES_MAX_LIMIT))
+
+    rows = await find_position_games(zobrist, cursor, limit)
+    return {
+        "success": True,
+        "key": f"{zobrist % (1 << 64):016x}",
+        "games": rows,
+        "next_cursor": f"{rows[-1]['game_id']}:{rows[-1]['ply']}" if len(rows) == limit else None,
+    }
+
+SIMILAR_POSITIONS_MAX_DISTANCE = 8
+
+
+@router.get("/positions/similar")
+async def fetch_similar_positions(
+    fen: str,
+    max_distance: int = 0,
+    same_king_zones: bool = False,
+    limit: int = POSITION_GAMES_DEFAULT_LIMIT,
+):
+    """
+    Games (and plies) with positions structurally like `fen`: same material, pawn structure
+    at most `max_distance` squares different (0 = identical), closest first.
+    """
+    if not DB_ENABLED:
+        raise HTTPException(status_code=503, detail="Database not configured. Set DATABASE_URL in .env file.")
+
+    from app.backend.db.db import find_similar_positions
+    from app.backend.db.structures import position_structure
+
+    structure = position_structure(fen)
+    if structure is None:
+        raise HTTPException(status_code=400, detail="Invalid FEN")
+    max_distance = max(0, min(max_distance, SIMILAR_POSITIONS_MAX_DISTANCE))
+    limit = max(1, min(limit, POSITION_GAMES_MAX_LIMIT))
+
+    rows = await find_similar_positions(fen, max_distance, same_king_zones, limit)
+    return {
+        "success": True,
+        "fen": fen,
+        "structure": {
+            "white_pawns": f"{structure['white_pawns'] % (1 << 64):016x}",
+            "black_pawns": f"{structure['black_pawns'] % (1 << 64):016x}",
+            "material_key": f"{structure['material_key']:010x}",
+            "king_zones": structure["king_zones"],
+        },
+        "max_distance": max_distance,
+        "games": rows,
+    }
+
+EXPLORER_MOVE_LIMIT = 30
+
+
+def _build_explorer_moves(fen: str, rows: list[dict]) -> list[dict[str, Any]]:
+    """Explorer counters as the client shows them: SAN, result shares and average ratings."""
+    from app.backend.db.codecs import unpack_move
+
+    board = chess.Board(fen)
+    moves = []
+    for row in rows:
+        games = row["games"]
+        uci = unpack_move(row["move"])
+        try:
+            san = board.san(chess.Move.from_uci(uci))
+        except ValueError:
+            san = None
+        moves.append({
+            "uci": uci,
+            "san": san,
+            "games": games,
+            "white_wins": row["white_wins"],
+            "draws": row["draws"],
+            "black_wins": row["black_wins"],
+            "white_score_percentage": round(100 * (row["white_wins"] + row["draws"] / 2) / games, 1),
+            "average_white_elo": round(row["white_elo_total"] / row["white_elo_games"]) if row["white_elo_games"] else None,
+            "average_black_elo": round(row["black_elo_total"] / row["black_elo_games"]) if row["black_elo_games"] else None,
+        })
+    return moves
+
+
+@router.get("/explorer")
+async def fetch_explorer(fen: str, limit: int = EXPLORER_MOVE_LIMIT):
+    """Moves played from a position across stored games, with results and ratings, plus the cached engine eval."""
+    if not DB_ENABLED:
+        raise HTTPException(status_code=503, detail="Database not configured. Set DATABASE_URL in .env file.")
+    try:
+        chess.Board(fen)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid FEN: {str(e)}")
+
+    from app.backend.db.db import get_explorer_position
+
+    position = await get_explorer_position(fen, max(1, min(limit, 100)))
+    moves = _build_explorer_moves(fen, position["moves"])
+    return {
+        "success": True,
+        "fen": fen,
+        "games": position["games"],
+        "moves": moves,
+        "eval": position["eval"],
+    }
+
 @router.get("/health/db")
 async def health_db():
-    """Health check to confirm this running backend process can reach Postgres."""
+    """Health check to confirm this running backend process can reach Postgres, with analysis compaction stats."""
     if not DB_ENABLED:
         return {"ok": False, "db_enabled": False, "detail": "DATABASE_URL not configured"}
 
     try:
         from app.backend.db.db import check_connection
+        from app.backend.services.analysis_compactor import analysis_compactor
         ok = await check_connection()
-        return {"ok": bool(ok), "db_enabled": True}
+        return {"ok": bool(ok), "db_enabled": True, "compaction": analysis_compactor.metrics()}
     except Exception as e:
         return {"ok": False, "db_enabled": True, "detail": str(e)}
 
+@router.get("/health/engine")
+async def health_engine():
+    """Engine scheduler capacity, per-priority-class queue-time metrics, shared searches and early-stop savings."""
+    from app.backend.services.engine_scheduler import engine_scheduler
+    from app.backend.services.inflight_searches import inflight_searches
+    from app.backend.services.search_convergence import convergence_stats
+
+    return {
+        **engine_scheduler.metrics(),
+        "in_flight": inflight_searches.metrics(),
+        "early_stop": convergence_stats.as_dict(),
+    }
+
 @router.post("/analyze")
 async def analyze_position(request: Request):
     """
@@ -852,7 +1177,9 @@ async def analyze_position(request: Request):
         "fen": "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
         "depth": 20,              // optional, default 20
         "time_limit": 0.5,        // optional, default 0.5 seconds
-        "force_recompute": false  // optional, skip cache if true
+        "force_recompute": false, // optional, skip cache if true
+        "early_stop": true,       // optional, default off; or {"stable_depths", "score_tolerance_cp", "min_depth", "stop_on_mate"}
+        "deadline_ms": 150        // optional; answer by then with the deepest completed iteration
     }
 
     Response:
@@ -864,26 +1191,40 @@ async def analyze_position(request: Request):
         "depth": 20,
         "pv": "e2e4 e7e5 g1f3",
         "cached": true,
-        "created_at": "2026-02-21T12:00:00"  // only if cached
+        "created_at": "2026-02-21T12:00:00",  // only if cached
+        "stopped_early": "converged",         // only with early_stop; null if the full limit was searched
+        "time_saved_ms": 310.5,               // only with early_stop
+        "partial": true,                      // only when deadline_ms expired first: "depth" is the
+        "requested_depth": 20,                // depth reached so far, and the search continues in the
+        "background_search": true             // background and is served from cache once stored
     }
     """
     try:
         from app.backend.services.analyzer_service import analyze_position
+        from app.backend.services.search_convergence import ConvergencePolicy
 
         data = await request.json()
         fen = data.get("fen", "").strip()
         depth = int(data.get("depth", 20))
-        time_limit = float(data.get("time_limit", 0.5))
+        deadline_ms = int(data["deadline_ms"]) if data.get("deadline_ms") is not None else None
+        # With a deadline the background search is bounded by depth only, unless a time limit is given.
+        time_limit = float(data.get("time_limit", 0 if deadline_ms is not None else 0.5))
         force_recompute = bool(data.get("force_recompute", False))
+        convergence = ConvergencePolicy.from_payload(data.get("early_stop"), default_enabled=False)
 
         if not fen:
             raise HTTPException(status_code=400, detail="FEN is required")
 
-        result = await analyze_position(
-            fen=fen,
-            depth=depth,
-            time_limit=time_limit,
-            force_recompute=force_recompute
+        result = await _cancel_on_disconnect(
+            request,
+            analyze_position(
+                fen=fen,
+                depth=depth,
+                time_limit=time_limit,
+                force_recompute=force_recompute,
+                convergence=convergence,
+                deadline_ms=deadline_ms,
+            ),
         )
 
         if "error" in result:
@@ -916,7 +1257,8 @@ async def batch_analyze_game(game_id: int, request: Request):
     Request body (optional):
     {
         "depth": 20,
-        "time_limit": 0.5
+        "time_limit": 0.5,
+        "early_stop": true   // optional, default off; or {"stable_depths", "score_tolerance_cp", "min_depth", "stop_on_mate"}
     }
 
     Response:
@@ -927,6 +1269,8 @@ async def batch_analyze_game(game_id: int, request: Request):
         "analyzed": 45,
         "cached": 5,
         "errors": 0,
+        "early_stopped": 30,                  // 0 unless early_stop was requested
+        "time_saved_seconds": 7.8,
         "total_time_seconds": 12.5,
         "message": "Analyzed 45 new positions, 5 from cache"
     }
@@ -935,17 +1279,26 @@ async def batch_analyze_game(game_id: int, request: Request):
         raise HTTPException(status_code=503, detail="Database not configured.")
 
     try:
-        from app.backend.services.analyzer_service import analyze_position
+        from app.backend.services.analyzer_service import (
+            GameAnalysisSession,
+            analyze_position,
+            build_game_boards,
+        )
+        from app.backend.services.engine_scheduler import EnginePriority
+        from app.backend.services.search_convergence import ConvergencePolicy
 
         # Get parameters from body or query
         try:
             body = await request.json()
             depth = int(body.get("depth", 20))
             time_limit = float(body.get("time_limit", 0.5))
+            early_stop = body.get("early_stop")
         except Exception:
             # Try query params if no body
             depth = 20
             time_limit = 0.5
+            early_stop = None
+        convergence = ConvergencePolicy.from_payload(early_stop, default_enabled=False)
 
         # Fetch all moves for this game
         rows = await get_moves(game_id)
@@ -957,36 +1310,61 @@ async def batch_analyze_game(game_id: int, request: Request):
         analyzed_count = 0
         cached_count = 0
         error_count = 0
+        preempted_count = 0
+        early_stopped_count = 0
+        time_saved_seconds = 0.0
         import time
         start_time = time.time()
 
-        # Analyze each position
-        for row in rows:
-            fen = row.get("fen")
-            if not fen:
-                continue
+        # Plies share one engine and are sent with their move history, so the hash
+        # carries over between plies and repetitions are scored correctly.
+        boards = build_game_boards(rows)
+        game_session = GameAnalysisSession(game_key=game_id)
 
-            try:
-                result = await analyze_position(
-                    fen=fen,
-                    depth=depth,
-                    time_limit=time_limit,
-                    force_recompute=False  # Use cache if available
-                )
-
-                if "error" not in result:
-                    if result.get("cached"):
-                        cached_count += 1
+        try:
+            # Analyze each position
+            for row in rows:
+                fen = row.get("fen")
+                if not fen:
+                    continue
+
+                board = boards.get(row.get("ply")) if row.get("is_mainline", True) else None
+                try:
+                    # Batch searches yield to interactive requests; re-run a preempted position
+                    # once a slot frees up, keeping the partial result after a few attempts.
+                    for _ in range(BATCH_PREEMPTION_RETRIES + 1):
+                        result = await analyze_position(
+                            fen=fen,
+                            depth=depth,
+                            time_limit=time_limit,
+                            force_recompute=False,  # Use cache if available
+                            priority=EnginePriority.BATCH,
+                            board=board,
+                            game_session=game_session,
+                            convergence=convergence,
+                        )
+                        if not result.get("preempted"):
+                            break
+                        preempted_count += 1
+
+                    if "error" not in result:
+                        if result.get("cached"):
+                            cached_count += 1
+                        else:
+                            analyzed_count += 1
+                        if result.get("stopped_early"):
+                            early_stopped_count += 1
+                            time_saved_seconds += float(result.get("time_saved_ms") or 0) / 1000
+                        logger.debug(f"Analyzed FEN: {fen[:30]}...")
                     else:
-                        analyzed_count += 1
-                    logger.debug(f"Analyzed FEN: {fen[:30]}...")
-                else:
-                    error_count += 1
-                    logger.warning(f"Error analyzing FEN: {result.get('error')}")
+                        error_count += 1
+                        logger.warning(f"Error analyzing FEN: {result.get('error')}")
 
-            except Exception as e:
-                error_count += 1
-                logger.error(f"Exception analyzing FEN: {e}")
+                except Exception as e:
+                    error_count += 1
+                    logger.error(f"Exception analyzing FEN: {e}")
+        finally:
+            await asyncio.to_thread(game_session.close)
 
         elapsed = time.time() - start_time
 
@@ -1001,6 +1379,9 @@ async def batch_analyze_game(game_id: int, request: Request):
             "analyzed": analyzed_count,
             "cached": cached_count,
             "errors": error_count,
+            "preempted": preempted_count,
+            "early_stopped": early_stopped_count,
+            "time_saved_seconds": round(time_saved_seconds, 2),
             "total_time_seconds": round(elapsed, 2),
             "message": f"Analyzed {analyzed_count} new positions, {cached_count} from cache"
         }
@@ -1178,11 +1559,14 @@ async def submit_quiz_results(game_id: int, request: Request):
         logger.info(f"Evaluating quiz for game {game_id} with {len(responses)} responses")
 
         # Evaluate quiz responses
-        result = await evaluate_quiz_response(
-            game_id=game_id,
-            responses=responses,
-            depth=depth,
-            time_limit=time_limit
+        result = await _cancel_on_disconnect(
+            request,
+            evaluate_quiz_response(
+                game_id=game_id,
+                responses=responses,
+                depth=depth,
+                time_limit=time_limit
+            ),
         )
 
         if not result.get("success"):
@@ -1220,11 +1604,14 @@ async def analyze_quiz_responses(request: Request):
         logger.info(f"Evaluating freeform quiz with {len(responses)} responses")
 
         # Evaluate quiz responses (game_id=0 for freeform)
-        result = await evaluate_quiz_response(
-            game_id=0,
-            responses=responses,
-            depth=depth,
-            time_limit=time_limit
+        result = await _cancel_on_disconnect(
+            request,
+            evaluate_quiz_response(
+                game_id=0,
+                responses=responses,
+                depth=depth,
+                time_limit=time_limit
+            ),
         )
 
         if not result.get("success"):
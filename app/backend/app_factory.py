@@ -9,6 +9,7 @@ from app.backend.api.routes import router as api_router
 from app.backend.api.ws_routes import router as websocket_router
 from app.backend.logs.logger import logger
 from app.backend.runtime import FRONTEND_DIST_DIR
+from app.backend.services.analysis_compactor import analysis_compactor
 from app.backend.services.live_analysis_service import live_analysis_service
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -23,9 +24,11 @@ async def lifespan(app: FastAPI):
             )
     except Exception as exc:
         logger.warning("DB schema init failed: %s", exc)
+    analysis_compactor.start()
     try:
         yield
     finally:
+        await analysis_compactor.shutdown()
         await live_analysis_service.shutdown()
 def create_app() -> FastAPI:
     app = FastAPI(lifespan=lifespan)
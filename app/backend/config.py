@@ -17,6 +17,28 @@ DEFAULT_LIVE_ANALYSIS_CACHE_UNLOCK_DEPTH_DELTA = 3
 MAX_ANALYSIS_DEPTH = 70
 MAX_DISPLAY_LAG_DEPTH = 10
 MAX_CACHE_UNLOCK_DEPTH_DELTA = 10
+DEFAULT_ENGINE_MAX_CONCURRENCY = 4
+MAX_ENGINE_CONCURRENCY = 64
+DEFAULT_LIVE_ANALYSIS_TIME_SLICE_MS = 500
+MAX_LIVE_ANALYSIS_TIME_SLICE_MS = 10000
+DEFAULT_LIVE_ANALYSIS_PREFETCH_PLIES = 4
+MAX_LIVE_ANALYSIS_PREFETCH_PLIES = 20
+DEFAULT_LIVE_ANALYSIS_PREFETCH_DEPTH = 18
+DEFAULT_LIVE_ANALYSIS_DEEP_MULTIPV = 1
+MAX_LIVE_ANALYSIS_MULTIPV = 3
+DEFAULT_LIVE_ANALYSIS_MULTIPV_MILESTONE_STEP = 0
+DEFAULT_ANALYSIS_EARLY_STOP_STABLE_DEPTHS = 5
+DEFAULT_ANALYSIS_EARLY_STOP_SCORE_TOLERANCE_CP = 15
+DEFAULT_ANALYSIS_EARLY_STOP_MIN_DEPTH = 12
+MAX_ANALYSIS_EARLY_STOP_SCORE_TOLERANCE_CP = 1000
+DEFAULT_QUIZ_EVALUATION_CONCURRENCY = DEFAULT_ENGINE_MAX_CONCURRENCY
+DEFAULT_QUIZ_ANALYSIS_DEPTH = 20
+DEFAULT_ANALYSIS_RETENTION_LATEST_DEPTHS = 5
+DEFAULT_ANALYSIS_RETENTION_MILESTONE_STEP = 10
+DEFAULT_ANALYSIS_COMPACTION_INTERVAL_SECONDS = 3600
+MAX_ANALYSIS_COMPACTION_INTERVAL_SECONDS = 7 * 24 * 3600
+DEFAULT_ANALYSIS_COMPACTION_BATCH_SIZE = 500
+MAX_ANALYSIS_COMPACTION_BATCH_SIZE = 50000
 
 
 @lru_cache(maxsize=1)
@@ -74,3 +96,93 @@ LIVE_ANALYSIS_CACHE_UNLOCK_DEPTH_DELTA = _get_int_env(
     0,
     MAX_CACHE_UNLOCK_DEPTH_DELTA,
 )
+ENGINE_MAX_CONCURRENCY = _get_int_env(
+    "ENGINE_MAX_CONCURRENCY",
+    DEFAULT_ENGINE_MAX_CONCURRENCY,
+    1,
+    MAX_ENGINE_CONCURRENCY,
+)
+LIVE_ANALYSIS_TIME_SLICE_MS = _get_int_env(
+    "LIVE_ANALYSIS_TIME_SLICE_MS",
+    DEFAULT_LIVE_ANALYSIS_TIME_SLICE_MS,
+    0,
+    MAX_LIVE_ANALYSIS_TIME_SLICE_MS,
+)
+LIVE_ANALYSIS_PREFETCH_PLIES = _get_int_env(
+    "LIVE_ANALYSIS_PREFETCH_PLIES",
+    DEFAULT_LIVE_ANALYSIS_PREFETCH_PLIES,
+    0,
+    MAX_LIVE_ANALYSIS_PREFETCH_PLIES,
+)
+LIVE_ANALYSIS_PREFETCH_DEPTH = _get_int_env(
+    "LIVE_ANALYSIS_PREFETCH_DEPTH",
+    DEFAULT_LIVE_ANALYSIS_PREFETCH_DEPTH,
+    1,
+    MAX_ANALYSIS_DEPTH,
+)
+LIVE_ANALYSIS_DEEP_MULTIPV = _get_int_env(
+    "LIVE_ANALYSIS_DEEP_MULTIPV",
+    DEFAULT_LIVE_ANALYSIS_DEEP_MULTIPV,
+    1,
+    MAX_LIVE_ANALYSIS_MULTIPV,
+)
+LIVE_ANALYSIS_MULTIPV_MILESTONE_STEP = _get_int_env(
+    "LIVE_ANALYSIS_MULTIPV_MILESTONE_STEP",
+    DEFAULT_LIVE_ANALYSIS_MULTIPV_MILESTONE_STEP,
+    0,
+    MAX_ANALYSIS_DEPTH,
+)
+ANALYSIS_EARLY_STOP_STABLE_DEPTHS = _get_int_env(
+    "ANALYSIS_EARLY_STOP_STABLE_DEPTHS",
+    DEFAULT_ANALYSIS_EARLY_STOP_STABLE_DEPTHS,
+    0,
+    MAX_ANALYSIS_DEPTH,
+)
+ANALYSIS_EARLY_STOP_SCORE_TOLERANCE_CP = _get_int_env(
+    "ANALYSIS_EARLY_STOP_SCORE_TOLERANCE_CP",
+    DEFAULT_ANALYSIS_EARLY_STOP_SCORE_TOLERANCE_CP,
+    0,
+    MAX_ANALYSIS_EARLY_STOP_SCORE_TOLERANCE_CP,
+)
+ANALYSIS_EARLY_STOP_MIN_DEPTH = _get_int_env(
+    "ANALYSIS_EARLY_STOP_MIN_DEPTH",
+    DEFAULT_ANALYSIS_EARLY_STOP_MIN_DEPTH,
+    1,
+    MAX_ANALYSIS_DEPTH,
+)
+QUIZ_EVALUATION_CONCURRENCY = _get_int_env(
+    "QUIZ_EVALUATION_CONCURRENCY",
+    DEFAULT_QUIZ_EVALUATION_CONCURRENCY,
+    1,
+    MAX_ENGINE_CONCURRENCY,
+)
+QUIZ_ANALYSIS_DEPTH = _get_int_env(
+    "QUIZ_ANALYSIS_DEPTH",
+    DEFAULT_QUIZ_ANALYSIS_DEPTH,
+    0,
+    MAX_ANALYSIS_DEPTH,
+)
+ANALYSIS_RETENTION_LATEST_DEPTHS = _get_int_env(
+    "ANALYSIS_RETENTION_LATEST_DEPTHS",
+    DEFAULT_ANALYSIS_RETENTION_LATEST_DEPTHS,
+    1,
+    MAX_ANALYSIS_DEPTH,
+)
+ANALYSIS_RETENTION_MILESTONE_STEP = _get_int_env(
+    "ANALYSIS_RETENTION_MILESTONE_STEP",
+    DEFAULT_ANALYSIS_RETENTION_MILESTONE_STEP,
+    0,
+    MAX_ANALYSIS_DEPTH,
+)
+ANALYSIS_COMPACTION_INTERVAL_SECONDS = _get_int_env(
+    "ANALYSIS_COMPACTION_INTERVAL_SECONDS",
+    DEFAULT_ANALYSIS_COMPACTION_INTERVAL_SECONDS,
+    0,
+    MAX_ANALYSIS_COMPACTION_INTERVAL_SECONDS,
+)
+ANALYSIS_COMPACTION_BATCH_SIZE = _get_int_env(
+    "ANALYSIS_COMPACTION_BATCH_SIZE",
+    DEFAULT_ANALYSIS_COMPACTION_BATCH_SIZE,
+    1,
+    MAX_ANALYSIS_COMPACTION_BATCH_SIZE,
+)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Binary codecs for stored analysis
+
+Moves pack into 16 bits (from square, to square, promotion piece) and a PV is
+the concatenation of its packed moves. A line set, i.e. all MultiPV lines stored
+for one position at one depth, is a single byte string:
+
+    per line: line_number u8 | flags u8 | score i32 | pv length u8 | pv (u16 per move)
+
+All integers are big-endian. The flags record which score kind is present, the
+search mode that produced the line and whether only the best move (no PV) was known.
+"""
+from __future__ import annotations
+
+import base64
+import struct
+import sys
+from array import array
+from typing import Any, Iterable
+
+import chess
+
+_PROMOTIONS = (None, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN)
+_SEARCH_MODES = (None, "multipv", "deep")
+
+_LINE_HEADER = struct.Struct(">BBiB")
+_MOVE = struct.Struct(">H")
+
+FLAG_SCORE_CP = 0x01
+FLAG_SCORE_MATE = 0x02
+FLAG_BEST_MOVE_ONLY = 0x04
+SEARCH_MODE_SHIFT = 4
+MAX_PV_MOVES = 255
+# Placeholder for plies without a value in typed arrays sent to the client (Int32Array).
+TYPED_ARRAY_MISSING = -(1 << 31)
+
+
+def pack_move(uci: str) -> int:
+    """UCI move as from | to << 6 | promotion << 12; the null move packs to 0."""
+    move = chess.Move.from_uci(uci)
+    if not move:
+        return 0
+    return move.from_square | move.to_square << 6 | _PROMOTIONS.index(move.promotion) << 12
+
+
+def unpack_move(packed: int) -> str:
+    if not packed:
+        return chess.Move.null().uci()
+    return chess.Move(packed & 0x3F, packed >> 6 & 0x3F, _PROMOTIONS[packed >> 12 & 0x7]).uci()
+
+
+def pack_pv(pv: str | Iterable[str] | None) -> bytes:
+    moves = pv.split() if isinstance(pv, str) else list(pv or ())
+    return b"".join(_MOVE.pack(pack_move(move)) for move in moves[:MAX_PV_MOVES])
+
+
+def unpack_pv(data: bytes | memoryview | None) -> str:
+    data = bytes(data or b"")
+    return " ".join(unpack_move(packed) for (packed,) in _MOVE.iter_unpack(data))
+
+
+def pack_lines(lines: Iterable[dict[str, Any]]) -> bytes:
+    """Encode line dicts ({line_number, best_move, score_cp, score_mate, pv, search_mode})."""
+    chunks = []
+    for line in sorted(lines, key=lambda line: line["line_number"]):
+        search_mode = line.get("search_mode")
+        flags = (_SEARCH_MODES.index(search_mode) if search_mode in _SEARCH_MODES else 0) << SEARCH_MODE_SHIFT
+        score = 0
+        if line.get("score_mate") is not None:
+            flags |= FLAG_SCORE_MATE
+            score = int(line["score_mate"])
+        elif line.get("score_cp") is not None:
+            flags |= FLAG_SCORE_CP
+            score = int(line["score_cp"])
+
+        moves = (line.get("pv") or "").split()
+        if not moves and line.get("best_move"):
+            flags |= FLAG_BEST_MOVE_ONLY
+            moves = [line["best_move"]]
+        pv = pack_pv(moves)
+        chunks.append(_LINE_HEADER.pack(int(line["line_number"]), flags, score, len(pv) // _MOVE.size) + pv)
+    return b"".join(chunks)
+
+
+def unpack_lines(data: bytes | memoryview | None, depth: int | None = None) -> list[dict[str, Any]]:
+    """Decode a line set into the row-shaped dicts the API returns, ordered by line number."""
+    data = bytes(data or b"")
+    lines = []
+    offset = 0
+    while offset < len(data):
+        line_number, flags, score, move_count = _LINE_HEADER.unpack_from(data, offset)
+        offset += _LINE_HEADER.size
+        pv_end = offset + move_count * _MOVE.size
+        moves = unpack_pv(data[offset:pv_end]).split()
+        offset = pv_end
+
+        lines.append({
+            "depth": depth,
+            "line_number": line_number,
+            "best_move": moves[0] if moves else None,
+            "score_cp": score if flags & FLAG_SCORE_CP else None,
+            "score_mate": score if flags & FLAG_SCORE_MATE else None,
+            "pv": "" if flags & FLAG_BEST_MOVE_ONLY else " ".join(moves),
+            "search_mode": _SEARCH_MODES[flags >> SEARCH_MODE_SHIFT & 0x3],
+        })
+    return lines
+
+
+def merge_lines(existing: Iterable[dict[str, Any]], updates: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Line set after writing `updates` over `existing`, matched by line number."""
+    merged = {line["line_number"]: line for line in existing}
+    merged.update((line["line_number"], line) for line in updates)
+    return [merged[number] for number in sorted(merged)]
+
+
+def typed_array_base64(values: Iterable[int | None], typecode: str = "i", missing: int = TYPED_ARRAY_MISSING) -> str:
+    """Base64 of `values` as a little-endian typed array (`array` typecode), None stored as `missing`."""
+    packed = array(typecode, (missing if value is None else value for value in values))
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return base64.b64encode(packed.tobytes()).decode("ascii")
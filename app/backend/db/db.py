@@ -3,7 +3,12 @@ import importlib
 import os
 from typing import Optional, Any
 
+import chess
+import chess.polyglot
+
 from app.backend.config import load_project_env
+from app.backend.db.codecs import merge_lines, pack_lines, pack_move, unpack_lines
+from app.backend.db.structures import PAWN_BLOCK_COUNT, pawn_blocks, position_structure
 from app.backend.runtime import configure_windows_event_loop_policy
 
 # -------------------------------------------------------------------
@@ -74,16 +79,275 @@ async def get_connection():
     return await psycopg.AsyncConnection.connect(url, row_factory=dict_row)
 
 # -------------------------------------------------------------------
-# Schema initialization (4-table schema: games, moves, evals, analysis_lines)
+# Compact analysis storage (positions, analysis_line_sets, analysis_latest)
+# -------------------------------------------------------------------
+# Line sets are packed by app.backend.db.codecs: one row per (position_id, depth)
+# holding every MultiPV line, with PVs as 16-bit packed moves.
+
+# Fold the line set just written at (position_id, depth) into the position's analysis_latest
+# row: the deepest set, and the richest set (most lines, then deepest) for MultiPV displays.
+_REFRESH_ANALYSIS_LATEST_SQL = """
+INSERT INTO public.analysis_latest AS latest (
+    position_id, depth, line_count, lines, rich_depth, rich_line_count, rich_lines, updated_at
+)
+VALUES (%(position_id)s, %(depth)s, %(line_count)s, %(lines)s, %(depth)s, %(line_count)s, %(lines)s, NOW())
+ON CONFLICT (position_id) DO UPDATE SET
+    depth = CASE WHEN EXCLUDED.depth >= latest.depth THEN EXCLUDED.depth ELSE latest.depth END,
+    line_count = CASE WHEN EXCLUDED.depth >= latest.depth THEN EXCLUDED.line_count ELSE latest.line_count END,
+    lines = CASE WHEN EXCLUDED.depth >= latest.depth THEN EXCLUDED.lines ELSE latest.lines END,
+    rich_depth = CASE
+        WHEN (EXCLUDED.rich_line_count, EXCLUDED.rich_depth) >= (latest.rich_line_count, latest.rich_depth)
+        THEN EXCLUDED.rich_depth ELSE latest.rich_depth END,
+    rich_line_count = CASE
+        WHEN (EXCLUDED.rich_line_count, EXCLUDED.rich_depth) >= (latest.rich_line_count, latest.rich_depth)
+        THEN EXCLUDED.rich_line_count ELSE latest.rich_line_count END,
+    rich_lines = CASE
+        WHEN (EXCLUDED.rich_line_count, EXCLUDED.rich_depth) >= (latest.rich_line_count, latest.rich_depth)
+        THEN EXCLUDED.rich_lines ELSE latest.rich_lines END,
+    updated_at = NOW()
+"""
+
+# Rebuild analysis_latest from analysis_line_sets (after migrations, or when it is empty).
+REBUILD_ANALYSIS_LATEST_SQL = """
+WITH deepest AS (
+    SELECT DISTINCT ON (position_id) * FROM public.analysis_line_sets ORDER BY position_id, depth DESC
+),
+richest AS (
+    SELECT DISTINCT ON (position_id) * FROM public.analysis_line_sets
+    ORDER BY position_id, line_count DESC, depth DESC
+)
+INSERT INTO public.analysis_latest (position_id, depth, line_count, lines, rich_depth, rich_line_count, rich_lines)
+SELECT deepest.position_id, deepest.depth, deepest.line_count, deepest.lines,
+       richest.depth, richest.line_count, richest.lines
+FROM deepest JOIN richest ON richest.position_id = deepest.position_id
+ON CONFLICT (position_id) DO NOTHING
+"""
+
+
+def position_key(fen: str) -> str:
+    """Stored position key: the EPD (move clocks dropped, en passant only when capturable)."""
+    try:
+        return chess.Board(fen).epd()
+    except ValueError:
+        return " ".join(fen.split()[:4])
+
+
+def position_zobrist(fen: str) -> int | None:
+    """Polyglot Zobrist hash of `fen` as a signed 64-bit integer (Postgres BIGINT)."""
+    try:
+        key = chess.polyglot.zobrist_hash(chess.Board(fen))
+    except ValueError:
+        return None
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+async def get_position_id(cur, fen: str) -> int:
+    """Id of the position for `fen` in public.positions, inserting it on first use."""
+    await cur.execute(
+        """
+        INSERT INTO public.positions (epd, zobrist) VALUES (%s, %s)
+        ON CONFLICT (epd) DO UPDATE SET zobrist = COALESCE(positions.zobrist, EXCLUDED.zobrist)
+        RETURNING id
+        """,
+        (position_key(fen), position_zobrist(fen)),
+    )
+    row = await cur.fetchone()
+    return row["id"]
+
+
+async def resolve_position_ids(cur, fens) -> dict[str, int]:
+    """
+    Position ids for many FENs in two statements (bulk insert of new keys, then one lookup).
+
+    Keys are inserted in sorted order so concurrent imports lock positions rows consistently.
+    """
+    keys_by_fen = {fen: position_key(fen) for fen in fens if fen}
+    if not keys_by_fen:
+        return {}
+
+    zobrist_by_key = {}
+    for fen, key in keys_by_fen.items():
+        zobrist_by_key.setdefault(key, position_zobrist(fen))
+    keys = sorted(zobrist_by_key)
+
+    await cur.execute(
+        """
+        INSERT INTO public.positions (epd, zobrist)
+        SELECT * FROM UNNEST(%s::text[], %s::bigint[])
+        ON CONFLICT (epd) DO NOTHING
+        """,
+        (keys, [zobrist_by_key[key] for key in keys]),
+    )
+    await cur.execute("SELECT id, epd FROM public.positions WHERE epd = ANY(%s)", (keys,))
+    ids_by_key = {row["epd"]: row["id"] for row in await cur.fetchall()}
+    return {fen: ids_by_key[key] for fen, key in keys_by_fen.items() if key in ids_by_key}
+
+
+# -------------------------------------------------------------------
+# Legacy data upgrades (run by init_db and the maintenance scripts)
+# -------------------------------------------------------------------
+# (table, FEN column, position id column) filled in by backfill_position_ids
+POSITION_ID_COLUMNS = (
+    ("moves", "fen", "position_id"),
+    ("moves", "fen_before", "position_before_id"),
+    ("evals", "fen", "position_id"),
+)
+
+
+async def backfill_position_ids(conn, table: str, fen_column: str, id_column: str, batch_size: int = 1000) -> int:
+    """Point rows written before position ids existed at their positions, committing per batch of FENs."""
+    updated = 0
+    while True:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                f"""
+                SELECT DISTINCT {fen_column} AS fen FROM public.{table}
+                WHERE {id_column} IS NULL AND {fen_column} IS NOT NULL
+                LIMIT %s
+                """,
+                (batch_size,),
+            )
+            fens = [row["fen"] for row in await cur.fetchall()]
+            if not fens:
+                return updated
+
+            position_ids = await resolve_position_ids(cur, fens)
+            await cur.execute(
+                f"""
+                UPDATE public.{table} t SET {id_column} = resolved.position_id
+                FROM UNNEST(%s::text[], %s::bigint[]) AS resolved(fen, position_id)
+                WHERE t.{fen_column} = resolved.fen AND t.{id_column} IS NULL
+                """,
+                (list(position_ids), list(position_ids.values())),
+            )
+            updated += cur.rowcount
+        await conn.commit()
+        if len(position_ids) < len(fens):
+            # Unresolvable FENs would be selected again forever.
+            return updated
+
+
+async def backfill_pawn_blocks(conn, batch_size: int = 1000) -> int:
+    """Compute pawn_blocks for structure rows stored before the column existed, committing per batch."""
+    updated = 0
+    while True:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT position_id, white_pawns, black_pawns, material_key FROM public.position_structures
+                WHERE pawn_blocks IS NULL
+                LIMIT %s
+                """,
+                (batch_size,),
+            )
+            rows = await cur.fetchall()
+            if not rows:
+                return updated
+
+            await cur.execute(
+                """
+                UPDATE public.position_structures s
+                SET pawn_blocks = (%(blocks)s::bigint[])[(r.n - 1) * %(count)s + 1 : r.n * %(count)s]
+                FROM UNNEST(%(ids)s::bigint[]) WITH ORDINALITY AS r(position_id, n)
+                WHERE s.position_id = r.position_id
+                """,
+                {
+                    "ids": [row["position_id"] for row in rows],
+                    "blocks": [
+                        key for row in rows
+                        for key in pawn_blocks(row["white_pawns"], row["black_pawns"], row["material_key"])
+                    ],
+                    "count": PAWN_BLOCK_COUNT,
+                },
+            )
+            updated += cur.rowcount
+        await conn.commit()
+
+
+async def migrate_legacy_analysis_lines(cur, drop_legacy: bool = False) -> tuple[int, int] | None:
+    """
+    Move legacy per-line `analysis_lines` rows into packed line sets and rebuild analysis_latest.
+
+    Returns (lines, line sets) moved, or None when there is no legacy table.
+    """
+    await cur.execute("SELECT to_regclass('public.analysis_lines') AS legacy")
+    if (await cur.fetchone())["legacy"] is None:
+        return None
+
+    await cur.execute(
+        """
+        SELECT fen, depth, line_number, best_move, score_cp, score_mate, pv, search_mode
+        FROM public.analysis_lines
+        ORDER BY fen, depth, line_number
+        """
+    )
+    rows = await cur.fetchall()
+    groups: dict[tuple[str, int], list[dict]] = {}
+    for row in rows:
+        groups.setdefault((row["fen"], row["depth"]), []).append(dict(row))
+
+    for (fen, depth), lines in groups.items():
+        position_id = await get_position_id(cur, fen)
+        await cur.execute(
+            "SELECT lines FROM public.analysis_line_sets WHERE position_id = %s AND depth = %s",
+            (position_id, depth),
+        )
+        existing = await cur.fetchone()
+        line_set = merge_lines(unpack_lines(existing["lines"]) if existing else [], lines)
+        await cur.execute(
+            """
+            INSERT INTO public.analysis_line_sets (position_id, depth, line_count, lines)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (position_id, depth) DO UPDATE SET
+                line_count = EXCLUDED.line_count,
+                lines = EXCLUDED.lines
+            """,
+            (position_id, depth, len(line_set), pack_lines(line_set)),
+        )
+
+    await cur.execute("TRUNCATE public.analysis_latest")
+    await cur.execute(REBUILD_ANALYSIS_LATEST_SQL)
+    if drop_legacy:
+        await cur.execute("DROP TABLE public.analysis_lines")
+    return len(rows), len(groups)
+
+
+# -------------------------------------------------------------------
+# Schema initialization (games, moves, evals, positions, analysis_line_sets, analysis_latest)
 # -------------------------------------------------------------------
 async def init_db():
     """Create the schema used by the app.
 
     NOTE: This matches the current Postgres schema:
-      - games(id, raw_pgn, white, black, result, event, site, date, pgn_source, imported_at, updated_at)
-      - moves(id, game_id, ply, san, fen, comment, cp_tag, color generated, variation_parent_id, variation_index, is_mainline, move_number, fen_before)
-      - evals(fen pk, best_move, score_cp, score_mate, depth, pv, created_at, engine, is_tablebase, game_id)
-      - analysis_lines(fen, depth, line_number pk, best_move, score_cp, score_mate, pv, updated_at)
+      - games(id, raw_pgn, white, black, result, event, site, date, pgn_source, imported_at, updated_at,
+        white_elo, black_elo, explorer_indexed)
+      - moves(id, game_id, ply, san, fen, comment, cp_tag, color generated, variation_parent_id, variation_index, is_mainline, move_number, fen_before,
+        position_id, position_before_id, nag): nag is the accuracy classification's NAG ($6 / $2 / $4), set by save_game_accuracy
+      - evals(fen pk, best_move, score_cp, score_mate, depth, pv, created_at, engine, is_tablebase, game_id, position_id,
+        target_depth, target_time, stopped_early): the target_* limits are the search's own when it ended
+        short of its depth (time cap or convergence), so a repeat request with the same limits is a hit
+      - positions(id pk, epd unique, zobrist): one row per distinct position, referenced by integer id
+      - position_occurrences(zobrist, game_id, ply pk): every stored game ply by position hash (position search)
+      - position_structures(position_id pk, white_pawns, black_pawns, material_key, king_zones, pawn_blocks):
+        structural features of every game position (similar-position search, see app.backend.db.structures);
+        pawn_blocks has a GIN index so near neighbours are found through a shared block key
+      - explorer_moves(position_id, move pk, games, results, rating sums): opening explorer counters, kept
+        current by insert_moves for games flagged `explorer_indexed`
+      - game_accuracy(game_id pk, white/black acpl + accuracy, report, evaluated_plies, eval_depth_total, stale, updated_at)
+      - accuracy_stale_positions(position_id pk, queued_at): positions whose eval got deeper, waiting to mark
+        the games through them stale; flushed into game_accuracy.stale in batches by mark_stale_accuracy_games
+      - player_game_stats(player_key, game_id, color pk, date, PLAYER_STAT_COLUMNS): each analysed game's contribution
+        per side (a game whose sides share a name counts for that player twice)
+      - player_stats(player_key pk, name, PLAYER_STAT_COLUMNS, updated_at): running per-player sums of those contributions
+      - analysis_line_sets(position_id, depth pk, line_count, lines bytea, updated_at): every MultiPV
+        line for a position at a depth, packed by app.backend.db.codecs
+      - analysis_latest(position_id pk, depth, line_count, lines, rich_depth, rich_line_count, rich_lines,
+        updated_at): per-position deepest / richest line sets, maintained by store_analysis_lines
+
+    Upgraded databases are brought forward here, so cached analysis stays readable: a legacy
+    `analysis_lines` table is moved into line sets (and dropped), and moves / evals rows written
+    before position ids get theirs. Search and explorer indexes for older games are still filled
+    by `python -m app.backend.scripts.backfill_positions`.
 
     We use CREATE TABLE IF NOT EXISTS so it won't overwrite existing tables.
     """
@@ -146,20 +410,235 @@ async def init_db():
             )
             await cur.execute(
                 """
-                CREATE TABLE IF NOT EXISTS public.analysis_lines (
-                    fen TEXT NOT NULL,
-                    depth INT NOT NULL,
-                    line_number INT NOT NULL,
-                    best_move TEXT,
-                    score_cp INT,
-                    score_mate INT,
-                    pv TEXT,
+                CREATE TABLE IF NOT EXISTS public.positions (
+                    id BIGSERIAL PRIMARY KEY,
+                    epd TEXT NOT NULL UNIQUE,
+                    zobrist BIGINT
+                );
+                """
+            )
+            await cur.execute("ALTER TABLE public.positions ADD COLUMN IF NOT EXISTS zobrist BIGINT;")
+            await cur.execute("CREATE INDEX IF NOT EXISTS positions_zobrist_idx ON public.positions (zobrist);")
+            await cur.execute(
+                """
+                ALTER TABLE public.moves
+                    ADD COLUMN IF NOT EXISTS position_id BIGINT REFERENCES public.positions(id),
+                    ADD COLUMN IF NOT EXISTS position_before_id BIGINT REFERENCES public.positions(id),
+                    ADD COLUMN IF NOT EXISTS nag SMALLINT;
+                """
+            )
+            await cur.execute("CREATE INDEX IF NOT EXISTS moves_position_id_idx ON public.moves (position_id);")
+            await cur.execute(
+                "ALTER TABLE public.evals ADD COLUMN IF NOT EXISTS position_id BIGINT REFERENCES public.positions(id);"
+            )
+            await cur.execute("CREATE INDEX IF NOT EXISTS evals_position_id_idx ON public.evals (position_id);")
+            # Partial indexes: empty once every row has its position id, so the startup check stays cheap.
+            for table, fen_column, id_column in POSITION_ID_COLUMNS:
+                await cur.execute(
+                    f"""
+                    CREATE INDEX IF NOT EXISTS {table}_missing_{id_column}_idx
+                    ON public.{table} ({fen_column}) WHERE {id_column} IS NULL;
+                    """
+                )
+            await cur.execute(
+                """
+                ALTER TABLE public.evals
+                    ADD COLUMN IF NOT EXISTS target_depth INT,
+                    ADD COLUMN IF NOT EXISTS target_time REAL,
+                    ADD COLUMN IF NOT EXISTS stopped_early BOOLEAN;
+                """
+            )
+            await cur.execute(
+                """
+                ALTER TABLE public.games
+                    ADD COLUMN IF NOT EXISTS white_elo INT,
+                    ADD COLUMN IF NOT EXISTS black_elo INT,
+                    ADD COLUMN IF NOT EXISTS explorer_indexed BOOLEAN NOT NULL DEFAULT FALSE;
+                """
+            )
+            await cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.explorer_moves (
+                    position_id BIGINT NOT NULL REFERENCES public.positions(id),
+                    move SMALLINT NOT NULL,
+                    games INT NOT NULL,
+                    white_wins INT NOT NULL,
+                    draws INT NOT NULL,
+                    black_wins INT NOT NULL,
+                    white_elo_total BIGINT NOT NULL,
+                    white_elo_games INT NOT NULL,
+                    black_elo_total BIGINT NOT NULL,
+                    black_elo_games INT NOT NULL,
+                    PRIMARY KEY (position_id, move)
+                );
+                """
+            )
+            await cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.position_occurrences (
+                    zobrist BIGINT NOT NULL,
+                    game_id INT NOT NULL REFERENCES public.games(id),
+                    ply INT NOT NULL,
+                    PRIMARY KEY (zobrist, game_id, ply)
+                );
+                """
+            )
+            await cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.position_structures (
+                    position_id BIGINT PRIMARY KEY REFERENCES public.positions(id),
+                    white_pawns BIGINT NOT NULL,
+                    black_pawns BIGINT NOT NULL,
+                    material_key BIGINT NOT NULL,
+                    king_zones SMALLINT NOT NULL
+                );
+                """
+            )
+            await cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS position_structures_material_pawns_idx
+                ON public.position_structures (material_key, white_pawns, black_pawns);
+                """
+            )
+            await cur.execute("ALTER TABLE public.position_structures ADD COLUMN IF NOT EXISTS pawn_blocks BIGINT[];")
+            await cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS position_structures_pawn_blocks_idx
+                ON public.position_structures USING GIN (pawn_blocks);
+                """
+            )
+            await cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS position_structures_missing_pawn_blocks_idx
+                ON public.position_structures (position_id) WHERE pawn_blocks IS NULL;
+                """
+            )
+            await cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.game_accuracy (
+                    game_id INT PRIMARY KEY REFERENCES public.games(id),
+                    white_acpl REAL,
+                    black_acpl REAL,
+                    white_accuracy REAL,
+                    black_accuracy REAL,
+                    report JSONB NOT NULL,
+                    evaluated_plies INT NOT NULL,
+                    eval_depth_total INT NOT NULL,
+                    stale BOOLEAN NOT NULL DEFAULT FALSE,
+                    updated_at TIMESTAMP DEFAULT NOW()
+                );
+                """
+            )
+            await cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.accuracy_stale_positions (
+                    position_id BIGINT PRIMARY KEY REFERENCES public.positions(id),
+                    queued_at TIMESTAMP NOT NULL DEFAULT NOW()
+                );
+                """
+            )
+            await cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.player_game_stats (
+                    player_key TEXT NOT NULL,
+                    game_id INT NOT NULL REFERENCES public.games(id),
+                    color CHAR(1) NOT NULL,
+                    date TEXT,
+                    games INT NOT NULL,
+                    wins INT NOT NULL,
+                    draws INT NOT NULL,
+                    losses INT NOT NULL,
+                    acpl_total REAL NOT NULL,
+                    acpl_games INT NOT NULL,
+                    accuracy_total REAL NOT NULL,
+                    accuracy_games INT NOT NULL,
+                    blunders_opening INT NOT NULL,
+                    blunders_middlegame INT NOT NULL,
+                    blunders_endgame INT NOT NULL,
+                    PRIMARY KEY (player_key, game_id, color)
+                );
+                """
+            )
+            # Older tables were keyed by (player_key, game_id), so same-name sides overwrote each other.
+            await cur.execute(
+                """
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (
+                        SELECT 1 FROM information_schema.key_column_usage
+                        WHERE table_schema = 'public' AND table_name = 'player_game_stats'
+                          AND constraint_name = 'player_game_stats_pkey' AND column_name = 'color'
+                    ) THEN
+                        ALTER TABLE public.player_game_stats
+                            DROP CONSTRAINT player_game_stats_pkey,
+                            ADD PRIMARY KEY (player_key, game_id, color);
+                    END IF;
+                END $$;
+                """
+            )
+            await cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.player_stats (
+                    player_key TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    games INT NOT NULL,
+                    wins INT NOT NULL,
+                    draws INT NOT NULL,
+                    losses INT NOT NULL,
+                    acpl_total REAL NOT NULL,
+                    acpl_games INT NOT NULL,
+                    accuracy_total REAL NOT NULL,
+                    accuracy_games INT NOT NULL,
+                    blunders_opening INT NOT NULL,
+                    blunders_middlegame INT NOT NULL,
+                    blunders_endgame INT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT NOW()
+                );
+                """
+            )
+            await cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.analysis_line_sets (
+                    position_id BIGINT NOT NULL REFERENCES public.positions(id),
+                    depth SMALLINT NOT NULL,
+                    line_count SMALLINT NOT NULL,
+                    lines BYTEA NOT NULL,
                     updated_at TIMESTAMP DEFAULT NOW(),
-                    PRIMARY KEY (fen, depth, line_number),
-                    FOREIGN KEY (fen) REFERENCES public.evals(fen)
+                    PRIMARY KEY (position_id, depth)
                 );
                 """
             )
+            # analysis_latest is derived data: the FEN-keyed JSONB layout is rebuilt from line sets.
+            await cur.execute(
+                """
+                DO $$
+                BEGIN
+                    IF EXISTS (
+                        SELECT 1 FROM information_schema.columns
+                        WHERE table_schema = 'public' AND table_name = 'analysis_latest' AND column_name = 'fen'
+                    ) THEN
+                        DROP TABLE public.analysis_latest;
+                    END IF;
+                END $$;
+                """
+            )
+            await cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.analysis_latest (
+                    position_id BIGINT PRIMARY KEY REFERENCES public.positions(id),
+                    depth SMALLINT NOT NULL,
+                    line_count SMALLINT NOT NULL,
+                    lines BYTEA NOT NULL,
+                    rich_depth SMALLINT NOT NULL,
+                    rich_line_count SMALLINT NOT NULL,
+                    rich_lines BYTEA NOT NULL,
+                    updated_at TIMESTAMP DEFAULT NOW()
+                );
+                """
+            )
+            await cur.execute("SELECT EXISTS (SELECT 1 FROM public.analysis_latest) AS populated")
+            if not (await cur.fetchone())["populated"]:
+                await cur.execute(REBUILD_ANALYSIS_LATEST_SQL)
             await cur.execute(
                 """
                 CREATE TABLE IF NOT EXISTS public.quiz_results (
@@ -181,6 +660,21 @@ async def init_db():
             )
         await conn.commit()
 
+        import logging
+        logger = logging.getLogger("chess-analyzer")
+        async with conn.cursor() as cur:
+            migrated = await migrate_legacy_analysis_lines(cur, drop_legacy=True)
+        await conn.commit()
+        if migrated:
+            logger.info("Moved %s legacy analysis lines into %s line sets", *migrated)
+        for table, fen_column, id_column in POSITION_ID_COLUMNS:
+            filled = await backfill_position_ids(conn, table, fen_column, id_column)
+            if filled:
+                logger.info("Filled %s.%s for %s rows", table, id_column, filled)
+        filled = await backfill_pawn_blocks(conn)
+        if filled:
+            logger.info("Filled position_structures.pawn_blocks for %s rows", filled)
+
 
 # -------------------------------------------------------------------
 # Games + moves helpers
@@ -190,8 +684,8 @@ async def create_game(raw_pgn: str, headers: dict[str, str]) -> int:
         async with conn.cursor() as cur:
             await cur.execute(
                 """
-                INSERT INTO public.games (raw_pgn, white, black, result, event, site, date, pgn_source, imported_at, updated_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
+                INSERT INTO public.games (raw_pgn, white, black, result, event, site, date, pgn_source, white_elo, black_elo, imported_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
                 RETURNING id
                 """,
                 (
@@ -203,6 +697,8 @@ async def create_game(raw_pgn: str, headers: dict[str, str]) -> int:
                     headers.get("site"),
                     headers.get("date"),
                     headers.get("pgn_source"),
+                    headers.get("white_elo"),
+                    headers.get("black_elo"),
                 ),
             )
             row = await cur.fetchone()
@@ -238,24 +734,283 @@ async def insert_moves(game_id: int, moves: list[dict[str, Any]]) -> None:
 
     async with await get_connection() as conn:
         async with conn.cursor() as cur:
+            position_ids = await resolve_position_ids(
+                cur, {m["fen"] for m in moves} | {m["fen_before"] for m in moves if m.get("fen_before")}
+            )
+            records = [
+                (*record, position_ids.get(m["fen"]), position_ids.get(m.get("fen_before")))
+                for record, m in zip(records, moves)
+            ]
+            await index_explorer_game(
+                cur,
+                game_id,
+                [{**m, "position_before_id": position_ids.get(m.get("fen_before"))} for m in moves],
+            )
             # Replace all moves for this game in a single transaction.
             await cur.execute("DELETE FROM public.moves WHERE game_id = %s", (game_id,))
+            await replace_position_occurrences(cur, game_id, [(m["ply"], m["fen"]) for m in moves])
+            await index_position_structures(cur, {m["fen"]: position_ids.get(m["fen"]) for m in moves})
             await cur.executemany(
                 """
-                INSERT INTO public.moves (game_id, ply, san, fen, comment, cp_tag, variation_parent_id, variation_index, is_mainline, move_number, fen_before)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                INSERT INTO public.moves (game_id, ply, san, fen, comment, cp_tag, variation_parent_id, variation_index, is_mainline, move_number, fen_before, position_id, position_before_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 """,
                 records,
             )
         await conn.commit()
 
 
+# Additive opening-explorer counters per (position, move).
+EXPLORER_COLUMNS = (
+    "games", "white_wins", "draws", "black_wins",
+    "white_elo_total", "white_elo_games", "black_elo_total", "black_elo_games",
+)
+
+
+def _explorer_move_code(fen_before: str | None, san: str | None) -> int | None:
+    try:
+        return pack_move(chess.Board(fen_before).parse_san(san).uci())
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+def _explorer_keys(rows: list[dict[str, Any]]) -> list[tuple[int, int]]:
+    """(position_id, packed move) pairs a game contributes; a repeated pair still counts once."""
+    keys = set()
+    for row in rows:
+        if not row.get("ply") or row.get("is_mainline") is False or row.get("position_before_id") is None:
+            continue
+        code = _explorer_move_code(row.get("fen_before"), row.get("san"))
+        if code is not None:
+            keys.add((row["position_before_id"], code))
+    return sorted(keys)
+
+
+async def index_explorer_game(cur, game_id: int, rows: list[dict[str, Any]]) -> None:
+    """
+    Make explorer_moves count this game with `rows` as its moves (rows carry position_before_id).
+
+    Must run before the game's old moves are deleted: if the game was already indexed, its old
+    contribution is read from them and subtracted first, so re-imports never double count.
+    """
+    await cur.execute(
+        "SELECT result, white_elo, black_elo, explorer_indexed FROM public.games WHERE id = %s FOR UPDATE",
+        (game_id,),
+    )
+    game = await cur.fetchone()
+    if not game:
+        return
+
+    white_elo, black_elo = game["white_elo"], game["black_elo"]
+    result = (game["result"] or "").strip()
+    contribution = (
+        1,
+        int(result == "1-0"),
+        int(result == "1/2-1/2"),
+        int(result == "0-1"),
+        white_elo or 0,
+        int(white_elo is not None),
+        black_elo or 0,
+        int(black_elo is not None),
+    )
+
+    deltas: dict[tuple[int, int], int] = {}
+    if game["explorer_indexed"]:
+        await cur.execute(
+            "SELECT ply, san, fen_before, is_mainline, position_before_id FROM public.moves WHERE game_id = %s",
+            (game_id,),
+        )
+        for key in _explorer_keys(await cur.fetchall()):
+            deltas[key] = deltas.get(key, 0) - 1
+    for key in _explorer_keys(rows):
+        deltas[key] = deltas.get(key, 0) + 1
+
+    columns = ", ".join(EXPLORER_COLUMNS)
+    await cur.executemany(
+        f"""
+        INSERT INTO public.explorer_moves AS explorer (position_id, move, {columns})
+        VALUES (%s, %s, {", ".join(["%s"] * len(EXPLORER_COLUMNS))})
+        ON CONFLICT (position_id, move) DO UPDATE SET
+            {", ".join(f"{column} = explorer.{column} + EXCLUDED.{column}" for column in EXPLORER_COLUMNS)}
+        """,
+        [(*key, *(sign * value for value in contribution)) for key, sign in sorted(deltas.items()) if sign],
+    )
+    await cur.execute("UPDATE public.games SET explorer_indexed = TRUE WHERE id = %s", (game_id,))
+
+
+async def get_explorer_position(fen: str, limit: int = 30) -> dict:
+    """Top `limit` next moves from `fen` with their counters, the position's game total, and its deepest eval."""
+    async with await get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT id FROM public.positions WHERE epd = %s", (position_key(fen),))
+            position = await cur.fetchone()
+            if not position:
+                return {"games": 0, "moves": [], "eval": None}
+            await cur.execute(
+                "SELECT COALESCE(SUM(games), 0) AS games FROM public.explorer_moves WHERE position_id = %s",
+                (position["id"],),
+            )
+            total = await cur.fetchone()
+            await cur.execute(
+                f"""
+                SELECT move, {", ".join(EXPLORER_COLUMNS)}
+                FROM public.explorer_moves
+                WHERE position_id = %s AND games > 0
+                ORDER BY games DESC, move
+                LIMIT %s
+                """,
+                (position["id"], limit),
+            )
+            moves = await cur.fetchall()
+            await cur.execute(
+                """
+                SELECT best_move, score_cp, score_mate, depth, pv
+                FROM public.evals
+                WHERE position_id = %s
+                ORDER BY depth DESC NULLS LAST
+                LIMIT 1
+                """,
+                (position["id"],),
+            )
+            evaluation = await cur.fetchone()
+    return {"games": int(total["games"]), "moves": moves or [], "eval": evaluation}
+
+
+async def replace_position_occurrences(cur, game_id: int, plies: list[tuple[int, str]]) -> None:
+    """Index a game's (ply, fen) pairs by position hash, replacing what was indexed before."""
+    occurrences = sorted(
+        {(zobrist, ply) for ply, fen in plies if (zobrist := position_zobrist(fen)) is not None}
+    )
+    await cur.execute("DELETE FROM public.position_occurrences WHERE game_id = %s", (game_id,))
+    if occurrences:
+        await cur.execute(
+            """
+            INSERT INTO public.position_occurrences (zobrist, game_id, ply)
+            SELECT zobrist, %s, ply FROM UNNEST(%s::bigint[], %s::int[]) AS o(zobrist, ply)
+            """,
+            (game_id, [zobrist for zobrist, _ in occurrences], [ply for _, ply in occurrences]),
+        )
+
+
+async def find_position_games(zobrist: int, after: tuple[int, int] | None = None, limit: int = 50) -> list[dict]:
+    """
+    Games (and plies) that reached the position with this hash, ordered by (game_id, ply).
+
+    Keyset pagination: pass the last row's (game_id, ply) as `after`; each page is one
+    primary-key range scan of position_occurrences plus game lookups for that page only.
+    """
+    after_game, after_ply = after or (0, -1)
+    async with await get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT o.game_id, o.ply, g.white, g.black, g.result, g.event, g.date
+                FROM (
+                    SELECT game_id, ply FROM public.position_occurrences
+                    WHERE zobrist = %s AND (game_id, ply) > (%s, %s)
+                    ORDER BY game_id, ply
+                    LIMIT %s
+                ) o
+                JOIN public.games g ON g.id = o.game_id
+                ORDER BY o.game_id, o.ply
+                """,
+                (zobrist, after_game, after_ply, limit),
+            )
+            rows = await cur.fetchall()
+    return rows or []
+
+
+async def index_position_structures(cur, position_ids: dict[str, int | None]) -> int:
+    """Store structural features for positions ({fen: position id}) that do not have them yet; returns rows added."""
+    rows = []
+    for fen, position_id in sorted(position_ids.items(), key=lambda item: item[1] or 0):
+        structure = position_structure(fen) if position_id is not None else None
+        if structure:
+            rows.append((position_id, structure))
+    if not rows:
+        return 0
+    columns = ("white_pawns", "black_pawns", "material_key", "king_zones")
+    await cur.execute(
+        """
+        INSERT INTO public.position_structures (position_id, white_pawns, black_pawns, material_key, king_zones, pawn_blocks)
+        SELECT r.position_id, r.white_pawns, r.black_pawns, r.material_key, r.king_zones,
+               (%(blocks)s::bigint[])[(r.n - 1) * %(count)s + 1 : r.n * %(count)s]
+        FROM UNNEST(
+            %(position_id)s::bigint[], %(white_pawns)s::bigint[], %(black_pawns)s::bigint[],
+            %(material_key)s::bigint[], %(king_zones)s::smallint[]
+        ) WITH ORDINALITY AS r(position_id, white_pawns, black_pawns, material_key, king_zones, n)
+        ON CONFLICT (position_id) DO NOTHING
+        """,
+        {
+            "position_id": [position_id for position_id, _ in rows],
+            **{column: [structure[column] for _, structure in rows] for column in columns},
+            "blocks": [key for _, structure in rows for key in structure["pawn_blocks"]],
+            "count": PAWN_BLOCK_COUNT,
+        },
+    )
+    return cur.rowcount
+
+
+# Popcount of a BIGINT xor, portable to Postgres versions without bit_count().
+_PAWN_DISTANCE_SQL = """
+    length(replace(((s.white_pawns # %(white_pawns)s::bigint)::bit(64))::text, '0', ''))
+    + length(replace(((s.black_pawns # %(black_pawns)s::bigint)::bit(64))::text, '0', ''))
+"""
+
+
+async def find_similar_positions(fen: str, max_distance: int = 0, same_king_zones: bool = False, limit: int = 50) -> list[dict]:
+    """
+    Game plies whose position shares `fen`'s material and has a pawn structure at most
+    `max_distance` squares away, closest first (kings in other zones rank one step further).
+
+    With `max_distance` 0 the lookup is an exact index match on both pawn bitboards. Below
+    PAWN_BLOCK_COUNT, candidates must share a pawn block key (GIN index) before their distance
+    is computed; wider searches scan the whole material signature.
+    """
+    structure = position_structure(fen)
+    if structure is None:
+        return []
+
+    filters = ["s.material_key = %(material_key)s"]
+    if max_distance <= 0:
+        filters.append("s.white_pawns = %(white_pawns)s AND s.black_pawns = %(black_pawns)s")
+    elif max_distance < PAWN_BLOCK_COUNT:
+        filters.append("s.pawn_blocks && %(pawn_blocks)s::bigint[]")
+    if same_king_zones:
+        filters.append("s.king_zones = %(king_zones)s")
+
+    async with await get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                f"""
+                WITH candidates AS (
+                    SELECT s.position_id,
+                           {_PAWN_DISTANCE_SQL} AS pawn_distance,
+                           s.king_zones = %(king_zones)s AS same_king_zones
+                    FROM public.position_structures s
+                    WHERE {" AND ".join(filters)}
+                )
+                SELECT m.game_id, m.ply, m.fen, c.pawn_distance, c.same_king_zones,
+                       g.white, g.black, g.result, g.event, g.date
+                FROM candidates c
+                JOIN public.moves m ON m.position_id = c.position_id
+                JOIN public.games g ON g.id = m.game_id
+                WHERE c.pawn_distance <= %(max_distance)s
+                ORDER BY c.pawn_distance + (NOT c.same_king_zones)::int, m.game_id, m.ply
+                LIMIT %(limit)s
+                """,
+                {**structure, "max_distance": max(0, max_distance), "limit": limit},
+            )
+            rows = await cur.fetchall()
+    return rows or []
+
+
 async def get_moves(game_id: int) -> list[dict]:
     async with await get_connection() as conn:
         async with conn.cursor() as cur:
             await cur.execute(
                 """
-                SELECT ply, san, fen, comment, cp_tag, color, variation_parent_id, variation_index, is_mainline, move_number, fen_before
+                SELECT ply, san, fen, comment, cp_tag, nag, color, variation_parent_id, variation_index, is_mainline, move_number, fen_before
                 FROM public.moves
                 WHERE game_id = %s
                 ORDER BY ply ASC
@@ -266,6 +1021,330 @@ async def get_moves(game_id: int) -> list[dict]:
     return rows or []
 
 
+async def get_game_evals(game_id: int) -> list[dict]:
+    """Mainline moves of a game with the stored eval of the position after each move (eval graph).
+
+    Moves and evals meet on the integer position id; when several FENs of one position
+    (different move clocks) have evals, the deepest wins.
+    """
+    return (await get_games_evals([game_id])).get(game_id, [])
+
+
+async def get_games_evals(game_ids: list[int]) -> dict[int, list[dict]]:
+    """Eval-graph rows (see get_game_evals) for many games in one query, keyed by game id."""
+    async with await get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT DISTINCT ON (m.game_id, m.ply)
+                       m.game_id, m.ply, m.san, m.fen, e.score_cp, e.score_mate, e.depth, e.best_move
+                FROM public.moves m
+                LEFT JOIN public.evals e ON e.position_id = m.position_id
+                WHERE m.game_id = ANY(%s) AND m.is_mainline IS NOT FALSE
+                ORDER BY m.game_id, m.ply, e.depth DESC NULLS LAST
+                """,
+                (list(game_ids),),
+            )
+            rows = await cur.fetchall()
+
+    evals_by_game: dict[int, list[dict]] = {}
+    for row in rows or []:
+        evals_by_game.setdefault(row.pop("game_id"), []).append(row)
+    return evals_by_game
+
+
+# Additive per-player counters; player_stats holds the sum of every player_game_stats row.
+PLAYER_STAT_COLUMNS = (
+    "games", "wins", "draws", "losses",
+    "acpl_total", "acpl_games", "accuracy_total", "accuracy_games",
+    "blunders_opening", "blunders_middlegame", "blunders_endgame",
+)
+_RESULT_SCORES = {"1-0": (1.0, 0.0), "0-1": (0.0, 1.0), "1/2-1/2": (0.5, 0.5)}
+
+
+def player_key(name: str | None) -> str | None:
+    """Case- and whitespace-insensitive key for a player name (None for unknown players)."""
+    key = " ".join((name or "").split()).lower()
+    return key if key and key != "?" else None
+
+
+def _move_side(move: dict[str, Any]) -> str:
+    """Side that played an accuracy report move (ply parity for reports saved before moves carried it)."""
+    return move.get("side") or ("white" if move["ply"] % 2 == 1 else "black")
+
+
+def _player_contributions(result: dict[str, Any], game: dict[str, Any]) -> list[dict[str, Any]]:
+    """player_game_stats rows for both sides of an analysed game."""
+    rows = []
+    for color, side in (("W", "white"), ("B", "black")):
+        key = player_key(game.get(side))
+        if key is None:
+            continue
+        scores = _RESULT_SCORES.get((game.get("result") or "").strip())
+        score = scores[0 if side == "white" else 1] if scores else None
+        stats = result[side]
+        blunder_phases = [
+            move["phase"]
+            for move in result.get("moves", [])
+            if move.get("classification") == "blunder" and _move_side(move) == side
+        ]
+        rows.append({
+            "player_key": key,
+            "name": " ".join(game[side].split()),
+            "game_id": result["game_id"],
+            "color": color,
+            "date": game.get("date"),
+            "games": 1,
+            "wins": int(score == 1.0),
+            "draws": int(score == 0.5),
+            "losses": int(score == 0.0),
+            "acpl_total": stats["acpl"] or 0.0,
+            "acpl_games": int(stats["acpl"] is not None),
+            "accuracy_total": stats["accuracy"] or 0.0,
+            "accuracy_games": int(stats["accuracy"] is not None),
+            **{f"blunders_{phase}": blunder_phases.count(phase) for phase in ("opening", "middlegame", "endgame")},
+        })
+    return rows
+
+
+async def _apply_player_stats(cur, results: list[dict[str, Any]]) -> None:
+    """
+    Replace the analysed games' per-player contributions and add the difference to player_stats.
+
+    A recomputed game only moves the totals by what changed, so player_stats never needs a rescan.
+    """
+    await cur.execute(
+        "SELECT id, white, black, result, date FROM public.games WHERE id = ANY(%s)",
+        ([result["game_id"] for result in results],),
+    )
+    games = {row["id"]: row for row in await cur.fetchall()}
+    contributions = sorted(
+        (row for result in results if result["game_id"] in games for row in _player_contributions(result, games[result["game_id"]])),
+        key=lambda row: (row["player_key"], row["game_id"], row["color"]),
+    )
+
+    columns = ", ".join(PLAYER_STAT_COLUMNS)
+    for row in contributions:
+        await cur.execute(
+            f"""
+            SELECT {columns} FROM public.player_game_stats
+            WHERE player_key = %s AND game_id = %s AND color = %s
+            FOR UPDATE
+            """,
+            (row["player_key"], row["game_id"], row["color"]),
+        )
+        previous = await cur.fetchone() or {}
+        await cur.execute(
+            f"""
+            INSERT INTO public.player_game_stats (player_key, game_id, color, date, {columns})
+            VALUES (%(player_key)s, %(game_id)s, %(color)s, %(date)s, {", ".join(f"%({column})s" for column in PLAYER_STAT_COLUMNS)})
+            ON CONFLICT (player_key, game_id, color) DO UPDATE SET
+                date = EXCLUDED.date,
+                {", ".join(f"{column} = EXCLUDED.{column}" for column in PLAYER_STAT_COLUMNS)}
+            """,
+            row,
+        )
+        delta = {column: row[column] - previous.get(column, 0) for column in PLAYER_STAT_COLUMNS}
+        await cur.execute(
+            f"""
+            INSERT INTO public.player_stats AS stats (player_key, name, {columns}, updated_at)
+            VALUES (%(player_key)s, %(name)s, {", ".join(f"%({column})s" for column in PLAYER_STAT_COLUMNS)}, NOW())
+            ON CONFLICT (player_key) DO UPDATE SET
+                name = EXCLUDED.name,
+                {", ".join(f"{column} = stats.{column} + EXCLUDED.{column}" for column in PLAYER_STAT_COLUMNS)},
+                updated_at = NOW()
+            """,
+            {"player_key": row["player_key"], "name": row["name"], **delta},
+        )
+
+
+async def get_player_stats(name: str, trend_games: int = 20) -> Optional[dict]:
+    """A player's running totals plus their most recent analysed games (two primary-key lookups)."""
+    key = player_key(name)
+    if key is None:
+        return None
+
+    async with await get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT * FROM public.player_stats WHERE player_key = %s", (key,))
+            stats = await cur.fetchone()
+            if not stats:
+                return None
+            await cur.execute(
+                """
+                SELECT game_id, color, date, wins, draws, losses, acpl_total, acpl_games, accuracy_total, accuracy_games
+                FROM public.player_game_stats
+                WHERE player_key = %s
+                ORDER BY game_id DESC, color DESC
+                LIMIT %s
+                """,
+                (key, trend_games),
+            )
+            recent = await cur.fetchall()
+    return {"stats": stats, "recent": recent or []}
+
+
+async def save_game_accuracy(results: list[dict[str, Any]]) -> int:
+    """
+    Store accuracy reports (from services.game_accuracy), tag their critical plies, write each
+    move's classification NAG and fold them into the players' running stats, all in one transaction.
+
+    Tags are only ever added (`cp_tag = TRUE`), so annotations made by hand survive a recompute;
+    NAGs are engine-derived and follow the latest report.
+    """
+    if not results:
+        return 0
+
+    import json
+    records = [
+        (
+            result["game_id"],
+            result["white"]["acpl"],
+            result["black"]["acpl"],
+            result["white"]["accuracy"],
+            result["black"]["accuracy"],
+            json.dumps({key: value for key, value in result.items() if key != "critical_plies"}),
+            result["evaluated_plies"],
+            result["eval_depth_total"],
+        )
+        for result in results
+    ]
+
+    async with await get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.executemany(
+                """
+                INSERT INTO public.game_accuracy (
+                    game_id, white_acpl, black_acpl, white_accuracy, black_accuracy, report,
+                    evaluated_plies, eval_depth_total, stale, updated_at
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, FALSE, NOW())
+                ON CONFLICT (game_id) DO UPDATE SET
+                    white_acpl = EXCLUDED.white_acpl,
+                    black_acpl = EXCLUDED.black_acpl,
+                    white_accuracy = EXCLUDED.white_accuracy,
+                    black_accuracy = EXCLUDED.black_accuracy,
+                    report = EXCLUDED.report,
+                    evaluated_plies = EXCLUDED.evaluated_plies,
+                    eval_depth_total = EXCLUDED.eval_depth_total,
+                    stale = FALSE,
+                    updated_at = NOW()
+                """,
+                records,
+            )
+            await cur.executemany(
+                """
+                UPDATE public.moves SET cp_tag = TRUE
+                WHERE game_id = %s AND ply = ANY(%s) AND cp_tag IS NOT TRUE
+                """,
+                [(result["game_id"], result["critical_plies"]) for result in results if result.get("critical_plies")],
+            )
+            await cur.executemany(
+                """
+                UPDATE public.moves m SET nag = v.nag
+                FROM unnest(%s::int[], %s::smallint[]) AS v(ply, nag)
+                WHERE m.game_id = %s AND m.ply = v.ply AND m.nag IS DISTINCT FROM v.nag
+                """,
+                [
+                    (
+                        [move["ply"] for move in result["moves"]],
+                        [move.get("nag") for move in result["moves"]],
+                        result["game_id"],
+                    )
+                    for result in results if result.get("moves")
+                ],
+            )
+            await _apply_player_stats(cur, results)
+        await conn.commit()
+    return len(records)
+
+
+async def get_game_accuracy(game_id: int) -> Optional[dict]:
+    """
+    Stored accuracy report for a game, with its `stale` flag; None if never computed.
+
+    A game is also stale while one of its mainline positions waits in accuracy_stale_positions.
+    """
+    async with await get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT a.report, a.updated_at,
+                       a.stale OR EXISTS (
+                           SELECT 1
+                           FROM public.moves m
+                           JOIN public.accuracy_stale_positions q ON q.position_id = m.position_id
+                           WHERE m.game_id = a.game_id AND m.is_mainline IS NOT FALSE AND q.queued_at > a.updated_at
+                       ) AS stale
+                FROM public.game_accuracy a
+                WHERE a.game_id = %s
+                """,
+                (game_id,),
+            )
+            row = await cur.fetchone()
+    if not row:
+        return None
+    return {**row["report"], "stale": row["stale"], "updated_at": row["updated_at"]}
+
+
+async def mark_stale_accuracy_games(batch_size: int = 1000) -> int:
+    """
+    Flush up to `batch_size` queued positions: mark the games whose mainline passes through
+    them stale and drop them from the queue. Returns the number of positions flushed.
+    """
+    async with await get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                WITH queued AS (
+                    DELETE FROM public.accuracy_stale_positions
+                    WHERE position_id IN (
+                        SELECT position_id FROM public.accuracy_stale_positions
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING position_id, queued_at
+                ),
+                marked AS (
+                    UPDATE public.game_accuracy a SET stale = TRUE
+                    FROM (
+                        SELECT m.game_id, MAX(q.queued_at) AS queued_at
+                        FROM public.moves m
+                        JOIN queued q ON q.position_id = m.position_id
+                        WHERE m.is_mainline IS NOT FALSE
+                        GROUP BY m.game_id
+                    ) g
+                    WHERE a.game_id = g.game_id AND NOT a.stale AND a.updated_at < g.queued_at
+                )
+                SELECT COUNT(*) AS flushed FROM queued
+                """,
+                (batch_size,),
+            )
+            row = await cur.fetchone()
+        await conn.commit()
+    return int(row["flushed"])
+
+
+async def get_stale_accuracy_game_ids(limit: int) -> list[int]:
+    """Games with moves whose accuracy was never computed or went stale, oldest first."""
+    async with await get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT g.id
+                FROM public.games g
+                LEFT JOIN public.game_accuracy a ON a.game_id = g.id
+                WHERE (a.game_id IS NULL OR a.stale)
+                  AND EXISTS (SELECT 1 FROM public.moves m WHERE m.game_id = g.id)
+                ORDER BY g.id
+                LIMIT %s
+                """,
+                (limit,),
+            )
+            rows = await cur.fetchall()
+    return [row["id"] for row in rows or []]
+
+
 async def update_move_annotations(game_id: int, annotations: list[dict[str, Any]]) -> int:
     """Persist mainline move comments / critical-position tags for a game."""
     if not annotations:
@@ -329,6 +1408,9 @@ async def upsert_eval(
     engine: str | None = None,
     is_tablebase: bool | None = None,
     game_id: int | None = None,
+    target_depth: int | None = None,
+    target_time: float | None = None,
+    stopped_early: bool | None = None,
 ) -> None:
     """
     Insert or update evaluation for a FEN position.
@@ -337,7 +1419,9 @@ async def upsert_eval(
     - FEN not in table (new), OR
     - New depth >= existing depth (deeper or equal analysis)
 
-    Never overwrites with shallower analysis.
+    Never overwrites with shallower analysis. `target_depth` / `target_time` / `stopped_early`
+    record the limits of a search that ended below its requested depth; when the stored row is
+    deeper than such a result, it still takes over those limits (see stored_result_covers).
     """
     import logging
     logger = logging.getLogger("chess-analyzer")
@@ -359,15 +1443,29 @@ async def upsert_eval(
 
                     if existing_depth and depth and depth < existing_depth:
                         logger.info(f"Skipping update: new depth {depth} < existing depth {existing_depth}")
+                        if target_depth is not None:
+                            # The deeper stored row answers whatever this search was asked for.
+                            await cur.execute(
+                                """
+                                UPDATE public.evals
+                                SET target_depth = %s, target_time = %s, stopped_early = %s
+                                WHERE fen = %s AND depth < %s AND COALESCE(target_depth, 0) <= %s
+                                """,
+                                (target_depth, target_time or None, stopped_early, fen, target_depth, target_depth),
+                            )
+                            await conn.commit()
                         return
 
                     logger.info(f"Updating eval: new depth {depth} >= existing {existing_depth}")
 
+                position_id = await get_position_id(cur, fen)
+
                 # Insert or update
                 await cur.execute(
                     """
-                    INSERT INTO public.evals (fen, best_move, score_cp, score_mate, depth, pv, engine, is_tablebase, game_id)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    INSERT INTO public.evals (fen, best_move, score_cp, score_mate, depth, pv, engine, is_tablebase, game_id, position_id,
+                                              target_depth, target_time, stopped_early)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                     ON CONFLICT (fen) DO UPDATE SET
                         best_move = EXCLUDED.best_move,
                         score_cp = EXCLUDED.score_cp,
@@ -377,10 +1475,26 @@ async def upsert_eval(
                         engine = EXCLUDED.engine,
                         is_tablebase = EXCLUDED.is_tablebase,
                         game_id = EXCLUDED.game_id,
+                        position_id = EXCLUDED.position_id,
+                        target_depth = EXCLUDED.target_depth,
+                        target_time = EXCLUDED.target_time,
+                        stopped_early = EXCLUDED.stopped_early,
                         created_at = NOW()
                     """,
-                    (fen, best_move, score_cp, score_mate, depth, pv, engine, is_tablebase, game_id),
+                    (
+                        fen, best_move, score_cp, score_mate, depth, pv, engine, is_tablebase, game_id, position_id,
+                        target_depth, target_time or None, stopped_early,
+                    ),
                 )
+                if position_id is not None and (not existing or not existing["depth"] or (depth or 0) > existing["depth"]):
+                    # Deeper eval: queue the position; its games are marked stale in batches off this path.
+                    await cur.execute(
+                        """
+                        INSERT INTO public.accuracy_stale_positions (position_id) VALUES (%s)
+                        ON CONFLICT (position_id) DO UPDATE SET queued_at = NOW()
+                        """,
+                        (position_id,),
+                    )
                 logger.info("[OK] Upsert query executed")
             await conn.commit()
             logger.info("[OK] Changes committed to DB")
@@ -397,41 +1511,57 @@ async def store_analysis_lines(
     """
     Store multiple analysis lines (e.g., top 3 variations) for a position at a specific depth.
 
+    The lines are merged by line number into the position's packed line set at that depth,
+    and the position's analysis_latest row is refreshed in the same transaction.
+
     Args:
         fen: FEN position
         depth: Analysis depth
-        lines: List of dicts with {best_move, score_cp, score_mate, pv}
+        lines: List of dicts with {best_move, score_cp, score_mate, pv} and optionally the
+            `search_mode` that produced them (e.g. "multipv" or "deep")
     """
     import logging
     logger = logging.getLogger("chess-analyzer")
 
+    updates = [
+        {**line_data, "line_number": line_num}
+        for line_num, line_data in enumerate(lines[:3], 1)
+    ]
+
     try:
         async with await get_connection() as conn:
             async with conn.cursor() as cur:
-                for line_num, line_data in enumerate(lines[:3], 1):
-                    await cur.execute(
-                        """
-                        INSERT INTO public.analysis_lines (fen, depth, line_number, best_move, score_cp, score_mate, pv)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (fen, depth, line_number) DO UPDATE SET
-                            best_move = EXCLUDED.best_move,
-                            score_cp = EXCLUDED.score_cp,
-                            score_mate = EXCLUDED.score_mate,
-                            pv = EXCLUDED.pv,
-                            updated_at = NOW()
-                        """,
-                        (
-                            fen,
-                            depth,
-                            line_num,
-                            line_data.get('best_move'),
-                            line_data.get('score_cp'),
-                            line_data.get('score_mate'),
-                            line_data.get('pv')
-                        ),
-                    )
+                position_id = await get_position_id(cur, fen)
+                await cur.execute(
+                    """
+                    SELECT lines FROM public.analysis_line_sets
+                    WHERE position_id = %s AND depth = %s
+                    FOR UPDATE
+                    """,
+                    (position_id, depth),
+                )
+                existing = await cur.fetchone()
+                line_set = merge_lines(unpack_lines(existing["lines"]) if existing else [], updates)
+                params = {
+                    "position_id": position_id,
+                    "depth": depth,
+                    "line_count": len(line_set),
+                    "lines": pack_lines(line_set),
+                }
+                await cur.execute(
+                    """
+                    INSERT INTO public.analysis_line_sets (position_id, depth, line_count, lines)
+                    VALUES (%(position_id)s, %(depth)s, %(line_count)s, %(lines)s)
+                    ON CONFLICT (position_id, depth) DO UPDATE SET
+                        line_count = EXCLUDED.line_count,
+                        lines = EXCLUDED.lines,
+                        updated_at = NOW()
+                    """,
+                    params,
+                )
+                await cur.execute(_REFRESH_ANALYSIS_LATEST_SQL, params)
 
-                logger.info(f"Stored {len(lines[:3])} analysis lines at depth {depth}")
+                logger.info(f"Stored {len(updates)} analysis lines at depth {depth}")
 
             await conn.commit()
             logger.info(f"Analysis lines committed to DB")
@@ -449,33 +1579,27 @@ async def get_analysis_lines(fen: str, depth: int | None = None) -> list[dict]:
         depth: Optional - if specified, get lines at this depth only
 
     Returns:
-        List of analysis lines sorted by line_number
+        List of analysis lines sorted by depth (deepest first), then line_number
     """
     try:
         async with await get_connection() as conn:
             async with conn.cursor() as cur:
-                if depth:
-                    await cur.execute(
-                        """
-                        SELECT fen, depth, line_number, best_move, score_cp, score_mate, pv, updated_at
-                        FROM public.analysis_lines
-                        WHERE fen = %s AND depth = %s
-                        ORDER BY line_number ASC
-                        """,
-                        (fen, depth),
-                    )
-                else:
-                    await cur.execute(
-                        """
-                        SELECT fen, depth, line_number, best_move, score_cp, score_mate, pv, updated_at
-                        FROM public.analysis_lines
-                        WHERE fen = %s
-                        ORDER BY depth DESC, line_number ASC
-                        """,
-                        (fen,),
-                    )
+                await cur.execute(
+                    """
+                    SELECT s.depth, s.lines, s.updated_at
+                    FROM public.analysis_line_sets s
+                    JOIN public.positions p ON p.id = s.position_id
+                    WHERE p.epd = %(epd)s AND (%(depth)s::int IS NULL OR s.depth = %(depth)s::int)
+                    ORDER BY s.depth DESC
+                    """,
+                    {"epd": position_key(fen), "depth": depth or None},
+                )
                 rows = await cur.fetchall()
-        return rows or []
+        return [
+            {"fen": fen, **line, "updated_at": row["updated_at"]}
+            for row in rows or []
+            for line in unpack_lines(row["lines"], row["depth"])
+        ]
     except Exception as e:
         import logging
         logger = logging.getLogger("chess-analyzer")
@@ -483,6 +1607,63 @@ async def get_analysis_lines(fen: str, depth: int | None = None) -> list[dict]:
         return []
 
 
+# Delete, for one batch of positions after the keyset cursor, every line set that is neither
+# among the position's latest `keep_latest` depths nor on a milestone depth.
+_PRUNE_ANALYSIS_LINE_SETS_SQL = """
+WITH batch AS (
+    SELECT id FROM public.positions WHERE id > %(after)s ORDER BY id LIMIT %(batch_size)s
+),
+ranked AS (
+    SELECT s.position_id, s.depth,
+           ROW_NUMBER() OVER (PARTITION BY s.position_id ORDER BY s.depth DESC) AS depth_rank
+    FROM public.analysis_line_sets s
+    JOIN batch ON batch.id = s.position_id
+),
+deleted AS (
+    DELETE FROM public.analysis_line_sets s
+    USING ranked r
+    WHERE s.position_id = r.position_id AND s.depth = r.depth
+      AND r.depth_rank > %(keep_latest)s
+      AND NOT (%(milestone_step)s > 0 AND r.depth %% GREATEST(%(milestone_step)s, 1) = 0)
+    RETURNING pg_column_size(s.*) AS row_bytes
+)
+SELECT (SELECT MAX(id) FROM batch) AS last_position_id,
+       (SELECT COUNT(*) FROM deleted) AS line_sets,
+       (SELECT COALESCE(SUM(row_bytes), 0) FROM deleted) AS bytes
+"""
+
+
+async def prune_analysis_line_sets(
+    after_position_id: int,
+    keep_latest: int,
+    milestone_step: int,
+    batch_size: int,
+) -> dict:
+    """
+    Apply the depth retention policy to the next `batch_size` positions after `after_position_id`.
+
+    Each call is its own short transaction, so live writers only ever wait on one batch.
+
+    Returns:
+        {"last_position_id": cursor for the next batch, or None once every position was visited,
+         "line_sets": line sets deleted, "bytes": row bytes they occupied}
+    """
+    async with await get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                _PRUNE_ANALYSIS_LINE_SETS_SQL,
+                {
+                    "after": after_position_id,
+                    "keep_latest": max(1, keep_latest),
+                    "milestone_step": max(0, milestone_step),
+                    "batch_size": max(1, batch_size),
+                },
+            )
+            row = await cur.fetchone()
+        await conn.commit()
+    return {"last_position_id": row["last_position_id"], "line_sets": row["line_sets"], "bytes": int(row["bytes"])}
+
+
 async def get_latest_analysis_snapshot(
     fen: str,
     target_depth: int | None = None,
@@ -491,72 +1672,72 @@ async def get_latest_analysis_snapshot(
     """Return the best available stored snapshot for a FEN.
 
     Preference order:
-    1. Stored `analysis_lines` snapshot (deepest by default, or richest/deepest when `prefer_richer_lines=True`)
+    1. Stored line set snapshot (deepest by default, or richest/deepest when `prefer_richer_lines=True`)
     2. Fallback to the top line from `evals`
+
+    One query, driven by the position's EPD: its `analysis_latest` row plus its deepest eval
+    (the exact FEN's on a tie), so a FEN differing only in move clocks still finds the shared
+    line sets. An exact-FEN evals row is still found when no positions row exists for it. Only when a `target_depth` cap excludes the stored deepest/richest set is the
+    capped set read from `analysis_line_sets` (still within the same statement).
     """
-    eval_row = await get_eval(fen)
+    depth_column, lines_column = ("rich_depth", "rich_lines") if prefer_richer_lines else ("depth", "lines")
+    capped_order = "line_count DESC, depth DESC" if prefer_richer_lines else "depth DESC"
 
     async with await get_connection() as conn:
         async with conn.cursor() as cur:
-            if prefer_richer_lines:
-                if target_depth is not None:
-                    await cur.execute(
-                        """
-                        SELECT depth, COUNT(*) AS line_count
-                        FROM public.analysis_lines
-                        WHERE fen = %s AND depth <= %s
-                        GROUP BY depth
-                        ORDER BY line_count DESC, depth DESC
-                        LIMIT 1
-                        """,
-                        (fen, target_depth),
-                    )
-                else:
-                    await cur.execute(
-                        """
-                        SELECT depth, COUNT(*) AS line_count
-                        FROM public.analysis_lines
-                        WHERE fen = %s
-                        GROUP BY depth
-                        ORDER BY line_count DESC, depth DESC
+            await cur.execute(
+                f"""
+                WITH snapshot AS (
+                    SELECT e.fen, e.best_move, e.score_cp, e.score_mate, e.depth AS eval_depth, e.pv, e.created_at,
+                           e.target_depth, e.target_time, e.stopped_early,
+                           p.id AS position_id, l.{depth_column} AS lines_depth, l.{lines_column} AS lines
+                    FROM (SELECT 1) AS anchor
+                    LEFT JOIN public.positions p ON p.epd = %(epd)s
+                    LEFT JOIN public.analysis_latest l ON l.position_id = p.id
+                    LEFT JOIN LATERAL (
+                        SELECT fen, best_move, score_cp, score_mate, depth, pv, created_at,
+                               target_depth, target_time, stopped_early
+                        FROM public.evals
+                        WHERE position_id = p.id OR fen = %(fen)s
+                        ORDER BY depth DESC NULLS LAST, (fen = %(fen)s) DESC
                         LIMIT 1
-                        """,
-                        (fen,),
-                    )
-            elif target_depth is not None:
-                await cur.execute(
-                    """
-                    SELECT MAX(depth) AS depth
-                    FROM public.analysis_lines
-                    WHERE fen = %s AND depth <= %s
-                    """,
-                    (fen, target_depth),
-                )
-            else:
-                await cur.execute(
-                    """
-                    SELECT MAX(depth) AS depth
-                    FROM public.analysis_lines
-                    WHERE fen = %s
-                    """,
-                    (fen,),
+                    ) e ON TRUE
+                    WHERE l.position_id IS NOT NULL OR e.fen IS NOT NULL
+                ),
+                capped AS (
+                    SELECT s.depth AS lines_depth, s.lines
+                    FROM public.analysis_line_sets s, snapshot
+                    WHERE s.position_id = snapshot.position_id
+                      AND s.depth <= %(target_depth)s
+                      AND NOT (snapshot.lines_depth <= %(target_depth)s)
+                    ORDER BY {capped_order}
+                    LIMIT 1
                 )
-            depth_row = await cur.fetchone()
-            lines_depth = depth_row.get("depth") if depth_row else None
+                SELECT snapshot.*,
+                       capped.lines_depth AS capped_depth,
+                       capped.lines AS capped_lines
+                FROM snapshot
+                LEFT JOIN capped ON TRUE
+                """,
+                {"fen": fen, "epd": position_key(fen), "target_depth": target_depth},
+            )
+            row = await cur.fetchone()
 
-            if lines_depth is not None:
-                await cur.execute(
-                    """
-                    SELECT depth, line_number, best_move, score_cp, score_mate, pv
-                    FROM public.analysis_lines
-                    WHERE fen = %s AND depth = %s
-                    ORDER BY line_number ASC
-                    """,
-                    (fen, lines_depth),
-                )
-                lines = await cur.fetchall()
-            else:
-                lines = []
+    if not row:
+        return None
+
+    if target_depth is None or (row.get("lines_depth") is not None and row["lines_depth"] <= target_depth):
+        lines_depth, packed_lines = row.get("lines_depth"), row.get("lines")
+    else:
+        lines_depth, packed_lines = row.get("capped_depth"), row.get("capped_lines")
+    lines = unpack_lines(packed_lines, lines_depth) if packed_lines else []
+    # Limits of the search behind the eval row (see upsert_eval); callers compare them with eval_depth.
+    limits = {
+        "eval_depth": row.get("eval_depth"),
+        "target_depth": row.get("target_depth"),
+        "target_time": row.get("target_time"),
+        "stopped_early": row.get("stopped_early"),
+    }
 
     if lines:
         best_line = lines[0]
@@ -568,30 +1749,30 @@ async def get_latest_analysis_snapshot(
             "score_mate": best_line.get("score_mate"),
             "pv": best_line.get("pv"),
             "lines": list(lines),
-            "created_at": eval_row.get("created_at") if eval_row else None,
+            "search_mode": best_line.get("search_mode"),
+            "created_at": row.get("created_at"),
+            **limits,
         }
 
-    if not eval_row:
-        return None
-
     return {
         "fen": fen,
-        "depth": eval_row.get("depth"),
-        "best_move": eval_row.get("best_move"),
-        "score_cp": eval_row.get("score_cp"),
-        "score_mate": eval_row.get("score_mate"),
-        "pv": eval_row.get("pv"),
+        "depth": row.get("eval_depth"),
+        "best_move": row.get("best_move"),
+        "score_cp": row.get("score_cp"),
+        "score_mate": row.get("score_mate"),
+        "pv": row.get("pv"),
         "lines": [
             {
-                "depth": eval_row.get("depth"),
+                "depth": row.get("eval_depth"),
                 "line_number": 1,
-                "best_move": eval_row.get("best_move"),
-                "score_cp": eval_row.get("score_cp"),
-                "score_mate": eval_row.get("score_mate"),
-                "pv": eval_row.get("pv"),
+                "best_move": row.get("best_move"),
+                "score_cp": row.get("score_cp"),
+                "score_mate": row.get("score_mate"),
+                "pv": row.get("pv"),
             }
         ],
-        "created_at": eval_row.get("created_at"),
+        "created_at": row.get("created_at"),
+        **limits,
     }
 
 
@@ -600,7 +1781,8 @@ async def get_eval(fen: str) -> Optional[dict]:
         async with conn.cursor() as cur:
             await cur.execute(
                 """
-                SELECT fen, best_move, score_cp, score_mate, depth, pv, created_at, engine, is_tablebase, game_id
+                SELECT fen, best_move, score_cp, score_mate, depth, pv, created_at, engine, is_tablebase, game_id,
+                       target_depth, target_time, stopped_early
                 FROM public.evals
                 WHERE fen = %s
                 """,
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Structural position features for "positions like this one" search
+
+Each stored game position gets:
+
+    white_pawns / black_pawns  pawn bitboards (a1 = bit 0) as signed 64-bit integers
+                               (Postgres BIGINT); a set-up FEN may still put a pawn on h8
+    material_key               piece counts per side, 4 bits each (Q R B N P, White then Black)
+    king_zones                 White king zone * 8 + Black king zone
+    pawn_blocks                one index key per side and file pair (a-b, c-d, e-f, g-h):
+                               the material key, the block number and that block's pawns
+
+Positions with the same material key and pawn bitboards share a structure; near
+neighbours share the material key and differ in few pawn squares (Hamming distance).
+Structures fewer than PAWN_BLOCK_COUNT squares apart leave at least one block
+untouched, so a near-neighbour search only has to look at rows sharing a block key.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+import chess
+
+_MATERIAL_PIECES = (chess.QUEEN, chess.ROOK, chess.BISHOP, chess.KNIGHT, chess.PAWN)
+_BITBOARD_MASK = (1 << 64) - 1
+PAWN_BLOCK_COUNT = 8
+
+
+def _signed64(bitboard: int) -> int:
+    return bitboard - (1 << 64) if bitboard >= 1 << 63 else bitboard
+
+
+def material_key(board: chess.Board) -> int:
+    key = 0
+    for color in (chess.WHITE, chess.BLACK):
+        for piece_type in _MATERIAL_PIECES:
+            key = key << 4 | min(15, len(board.pieces(piece_type, color)))
+    return key
+
+
+def king_zone(board: chess.Board, color: chess.Color) -> int:
+    """0-5: queenside (a-c) / centre (d-e) / kingside (f-h), on its home two ranks or advanced."""
+    square = board.king(color)
+    if square is None:
+        return 6
+    file_zone = 0 if chess.square_file(square) <= 2 else 1 if chess.square_file(square) <= 4 else 2
+    relative_rank = chess.square_rank(square) if color == chess.WHITE else 7 - chess.square_rank(square)
+    return file_zone + (3 if relative_rank >= 2 else 0)
+
+
+def pawn_blocks(white_pawns: int, black_pawns: int, material: int) -> list[int]:
+    """Block keys (material << 19 | block << 16 | 16 block bits), all below 2**59."""
+    keys = []
+    for side, bitboard in enumerate((white_pawns & _BITBOARD_MASK, black_pawns & _BITBOARD_MASK)):
+        for pair in range(4):
+            bits = 0
+            for rank in range(8):
+                bits |= (bitboard >> (rank * 8 + pair * 2) & 0b11) << rank * 2
+            keys.append(material << 19 | (side * 4 + pair) << 16 | bits)
+    return keys
+
+
+def position_structure(fen: str) -> dict[str, Any] | None:
+    """Structure columns for `fen`, or None if it does not parse."""
+    try:
+        board = chess.Board(fen)
+    except ValueError:
+        return None
+    white_pawns = int(board.pieces(chess.PAWN, chess.WHITE))
+    black_pawns = int(board.pieces(chess.PAWN, chess.BLACK))
+    material = material_key(board)
+    return {
+        "white_pawns": _signed64(white_pawns),
+        "black_pawns": _signed64(black_pawns),
+        "material_key": material,
+        "king_zones": king_zone(board, chess.WHITE) * 8 + king_zone(board, chess.BLACK),
+        "pawn_blocks": pawn_blocks(white_pawns, black_pawns, material),
+    }
+
+
+def pawn_distance(first: dict[str, Any], second: dict[str, Any]) -> int:
+    """Squares on which the two pawn structures differ (mirrors the SQL ranking)."""
+    return (
+        bin((first["white_pawns"] ^ second["white_pawns"]) & _BITBOARD_MASK).count("1")
+        + bin((first["black_pawns"] ^ second["black_pawns"]) & _BITBOARD_MASK).count("1")
+    )
@@ -0,0 +1,237 @@
+"""CLI to point existing moves and evals rows at the shared positions table and index them.
+
+Usage:
+  python -m app.backend.scripts.backfill_positions [--batch-size N]
+
+Rows written before position ids existed have NULL position_id columns. This walks
+moves and evals in batches of distinct FENs, resolves their position ids in bulk and
+fills them in, committing after every batch (init_db does the same at startup).
+Positions created before Zobrist keys were stored get their key as well, and games
+imported before the position search index or the opening explorer get their
+position_occurrences rows and explorer counters (ratings are read from the stored PGN
+headers), and game positions without structural features get their position_structures
+row (older rows get their pawn block keys). Safe to re-run: only missing data is filled.
+
+Exit codes:
+  0  success
+  2  database misconfigured (.env missing)
+  3  backfill failed
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import sys
+
+import chess.pgn
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _ensure_windows_selector_loop() -> None:
+    # psycopg async is incompatible with ProactorEventLoop on Windows.
+    if sys.platform.startswith("win"):
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+
+async def _backfill_zobrist(conn, position_zobrist, batch_size: int) -> int:
+    updated = 0
+    after = 0
+    while True:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT id, epd FROM public.positions WHERE zobrist IS NULL AND id > %s ORDER BY id LIMIT %s",
+                (after, batch_size),
+            )
+            rows = await cur.fetchall()
+            if not rows:
+                return updated
+
+            after = rows[-1]["id"]
+            keys = [(row["id"], position_zobrist(row["epd"])) for row in rows]
+            keys = [(position_id, key) for position_id, key in keys if key is not None]
+            await cur.execute(
+                """
+                UPDATE public.positions p SET zobrist = resolved.zobrist
+                FROM UNNEST(%s::bigint[], %s::bigint[]) AS resolved(id, zobrist)
+                WHERE p.id = resolved.id
+                """,
+                ([position_id for position_id, _ in keys], [key for _, key in keys]),
+            )
+            updated += cur.rowcount
+        await conn.commit()
+
+
+async def _backfill_occurrences(conn, replace_position_occurrences, batch_size: int) -> int:
+    indexed = 0
+    after = 0
+    while True:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT g.id FROM public.games g
+                WHERE g.id > %s
+                  AND NOT EXISTS (SELECT 1 FROM public.position_occurrences o WHERE o.game_id = g.id)
+                ORDER BY g.id
+                LIMIT %s
+                """,
+                (after, batch_size),
+            )
+            game_ids = [row["id"] for row in await cur.fetchall()]
+            if not game_ids:
+                return indexed
+
+            after = game_ids[-1]
+            await cur.execute(
+                "SELECT game_id, ply, fen FROM public.moves WHERE game_id = ANY(%s) ORDER BY game_id, ply",
+                (game_ids,),
+            )
+            plies_by_game: dict[int, list[tuple[int, str]]] = {}
+            for row in await cur.fetchall():
+                plies_by_game.setdefault(row["game_id"], []).append((row["ply"], row["fen"]))
+            for game_id, plies in plies_by_game.items():
+                await replace_position_occurrences(cur, game_id, plies)
+            indexed += len(plies_by_game)
+        await conn.commit()
+
+
+async def _backfill_structures(conn, index_position_structures, batch_size: int) -> int:
+    indexed = 0
+    after = 0
+    while True:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT p.id, p.epd FROM public.positions p
+                WHERE p.id > %s
+                  AND EXISTS (SELECT 1 FROM public.moves m WHERE m.position_id = p.id)
+                  AND NOT EXISTS (SELECT 1 FROM public.position_structures s WHERE s.position_id = p.id)
+                ORDER BY p.id
+                LIMIT %s
+                """,
+                (after, batch_size),
+            )
+            rows = await cur.fetchall()
+            if not rows:
+                return indexed
+
+            after = rows[-1]["id"]
+            indexed += await index_position_structures(cur, {row["epd"]: row["id"] for row in rows})
+        await conn.commit()
+
+
+def _pgn_elos(raw_pgn: str | None) -> tuple[int | None, int | None]:
+    headers = chess.pgn.read_headers(io.StringIO(raw_pgn or "")) if raw_pgn else None
+    elos = []
+    for name in ("WhiteElo", "BlackElo"):
+        try:
+            elo = int((headers or {}).get(name, "").strip())
+        except ValueError:
+            elo = 0
+        elos.append(elo if elo > 0 else None)
+    return elos[0], elos[1]
+
+
+async def _backfill_explorer(conn, index_explorer_game, batch_size: int) -> int:
+    indexed = 0
+    after = 0
+    while True:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT id, raw_pgn, white_elo, black_elo FROM public.games
+                WHERE id > %s AND NOT explorer_indexed
+                ORDER BY id
+                LIMIT %s
+                """,
+                (after, batch_size),
+            )
+            games = await cur.fetchall()
+            if not games:
+                return indexed
+
+            after = games[-1]["id"]
+            await cur.execute(
+                """
+                SELECT game_id, ply, san, fen_before, is_mainline, position_before_id
+                FROM public.moves WHERE game_id = ANY(%s)
+                """,
+                ([game["id"] for game in games],),
+            )
+            rows_by_game: dict[int, list[dict]] = {}
+            for row in await cur.fetchall():
+                rows_by_game.setdefault(row["game_id"], []).append(row)
+
+            for game in games:
+                if game["white_elo"] is None and game["black_elo"] is None:
+                    white_elo, black_elo = _pgn_elos(game["raw_pgn"])
+                    await cur.execute(
+                        "UPDATE public.games SET white_elo = %s, black_elo = %s WHERE id = %s",
+                        (white_elo, black_elo, game["id"]),
+                    )
+                await index_explorer_game(cur, game["id"], rows_by_game.get(game["id"], []))
+            indexed += len(games)
+        await conn.commit()
+
+
+async def _amain(batch_size: int) -> int:
+    print("backfill_positions: starting", flush=True)
+
+    try:
+        from app.backend.db.db import (
+            DB_ENABLED,
+            POSITION_ID_COLUMNS,
+            backfill_pawn_blocks,
+            backfill_position_ids,
+            get_connection,
+            index_explorer_game,
+            index_position_structures,
+            init_db,
+            position_zobrist,
+            replace_position_occurrences,
+        )
+    except Exception as e:
+        print(f"Failed to import database module: {e}", flush=True)
+        return 3
+
+    if not DB_ENABLED:
+        print("Database is not configured.", flush=True)
+        print("Set DATABASE_URL in .env (repo root or app/backend/) to enable DB features.", flush=True)
+        return 2
+
+    try:
+        await init_db()
+        async with await get_connection() as conn:
+            for table, fen_column, id_column in POSITION_ID_COLUMNS:
+                updated = await backfill_position_ids(conn, table, fen_column, id_column, batch_size)
+                print(f"{table}.{id_column}: filled {updated} rows", flush=True)
+            updated = await _backfill_zobrist(conn, position_zobrist, batch_size)
+            print(f"positions.zobrist: filled {updated} rows", flush=True)
+            indexed = await _backfill_occurrences(conn, replace_position_occurrences, batch_size)
+            print(f"position_occurrences: indexed {indexed} games", flush=True)
+            indexed = await _backfill_explorer(conn, index_explorer_game, batch_size)
+            print(f"explorer_moves: indexed {indexed} games", flush=True)
+            indexed = await _backfill_structures(conn, index_position_structures, batch_size)
+            print(f"position_structures: indexed {indexed} positions", flush=True)
+            updated = await backfill_pawn_blocks(conn, batch_size)
+            print(f"position_structures.pawn_blocks: filled {updated} rows", flush=True)
+        print("OK: position ids backfilled", flush=True)
+        return 0
+    except Exception as e:
+        print(f"FAILED: could not backfill position ids: {e}", flush=True)
+        return 3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="distinct FENs per transaction")
+    args = parser.parse_args()
+
+    _ensure_windows_selector_loop()
+    raise SystemExit(asyncio.run(_amain(max(1, args.batch_size))))
+
+
+if __name__ == "__main__":
+    main()
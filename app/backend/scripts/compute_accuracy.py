@@ -0,0 +1,65 @@
+"""CLI to compute game accuracy in bulk.
+
+Usage:
+  python -m app.backend.scripts.compute_accuracy [--batch-size N]
+
+Recomputes every game that has no accuracy row yet or whose row was marked stale by
+deeper evals, `--batch-size` games per query and vectorized pass.
+
+Exit codes:
+  0  success
+  2  database misconfigured (.env missing)
+  3  computation failed
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+
+
+def _ensure_windows_selector_loop() -> None:
+    # psycopg async is incompatible with ProactorEventLoop on Windows.
+    if sys.platform.startswith("win"):
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+
+async def _amain(batch_size: int) -> int:
+    print("compute_accuracy: starting", flush=True)
+
+    try:
+        from app.backend.db.db import DB_ENABLED, init_db
+        from app.backend.services.game_accuracy import refresh_stale_accuracy
+    except Exception as e:
+        print(f"Failed to import accuracy modules: {e}", flush=True)
+        return 3
+
+    if not DB_ENABLED:
+        print("Database is not configured.", flush=True)
+        print("Set DATABASE_URL in .env (repo root or app/backend/) to enable DB features.", flush=True)
+        return 2
+
+    try:
+        await init_db()
+        refreshed = await refresh_stale_accuracy(batch_size)
+        print(f"OK: computed accuracy for {refreshed} games", flush=True)
+        return 0
+    except Exception as e:
+        print(f"FAILED: could not compute accuracy: {e}", flush=True)
+        return 3
+
+
+def main() -> None:
+    from app.backend.services.game_accuracy import DEFAULT_BULK_BATCH_SIZE
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BULK_BATCH_SIZE, help="games per pass")
+    args = parser.parse_args()
+
+    _ensure_windows_selector_loop()
+    raise SystemExit(asyncio.run(_amain(max(1, args.batch_size))))
+
+
+if __name__ == "__main__":
+    main()
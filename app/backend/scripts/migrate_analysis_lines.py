@@ -0,0 +1,75 @@
+"""CLI to move legacy per-line `analysis_lines` rows into packed `analysis_line_sets`.
+
+Usage:
+  python -m app.backend.scripts.migrate_analysis_lines [--drop-legacy]
+
+Each (fen, depth) group becomes one line set keyed by the position's EPD; FENs that
+differ only in move clocks merge into the same position. `analysis_latest` is rebuilt
+afterwards. With --drop-legacy the old table is dropped once everything has moved.
+init_db runs the same migration (dropping the old table) at startup, so this is only
+needed to migrate by hand.
+
+Exit codes:
+  0  success (or nothing to migrate)
+  2  database misconfigured (.env missing)
+  3  migration failed
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+
+
+def _ensure_windows_selector_loop() -> None:
+    # psycopg async is incompatible with ProactorEventLoop on Windows.
+    if sys.platform.startswith("win"):
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+
+async def _amain(drop_legacy: bool) -> int:
+    print("migrate_analysis_lines: starting", flush=True)
+
+    try:
+        from app.backend.db.db import DB_ENABLED, get_connection, init_db, migrate_legacy_analysis_lines
+    except Exception as e:
+        print(f"Failed to import database module: {e}", flush=True)
+        return 3
+
+    if not DB_ENABLED:
+        print("Database is not configured.", flush=True)
+        print("Set DATABASE_URL in .env (repo root or app/backend/) to enable DB features.", flush=True)
+        return 2
+
+    try:
+        # init_db already migrates (and drops) a legacy table it finds; this is for doing it by hand.
+        await init_db()
+        async with await get_connection() as conn:
+            async with conn.cursor() as cur:
+                migrated = await migrate_legacy_analysis_lines(cur, drop_legacy)
+            await conn.commit()
+
+        if migrated is None:
+            print("OK: no legacy analysis_lines table", flush=True)
+            return 0
+        print(f"OK: moved {migrated[0]} lines into {migrated[1]} line sets", flush=True)
+        if drop_legacy:
+            print("Dropped legacy analysis_lines", flush=True)
+        return 0
+    except Exception as e:
+        print(f"FAILED: could not migrate analysis lines: {e}", flush=True)
+        return 3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--drop-legacy", action="store_true", help="drop analysis_lines after migrating it")
+    args = parser.parse_args()
+
+    _ensure_windows_selector_loop()
+    raise SystemExit(asyncio.run(_amain(args.drop_legacy)))
+
+
+if __name__ == "__main__":
+    main()
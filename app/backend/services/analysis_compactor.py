@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Analysis Compactor: depth-milestone retention for stored line sets
+
+Live workers persist every depth they reach, but readers only want the deepest
+set, lag-capped sets a few depths back and the cached display / quiz depths.
+The compactor keeps each position's latest `keep_latest` depths plus every
+milestone depth (multiples of `milestone_step`) and deletes the rest, walking
+the positions table in keyset batches so each transaction stays short.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from app.backend.config import (
+    ANALYSIS_COMPACTION_BATCH_SIZE,
+    ANALYSIS_COMPACTION_INTERVAL_SECONDS,
+    ANALYSIS_RETENTION_LATEST_DEPTHS,
+    ANALYSIS_RETENTION_MILESTONE_STEP,
+)
+from app.backend.logs.logger import logger
+
+try:
+    from app.backend.db.db import DB_ENABLED, prune_analysis_line_sets
+except Exception:  # pragma: no cover - DB layer is optional in some environments
+    DB_ENABLED = False
+
+    async def prune_analysis_line_sets(after_position_id, keep_latest, milestone_step, batch_size):
+        return {"last_position_id": None, "line_sets": 0, "bytes": 0}
+
+
+PruneBatch = Callable[[int, int, int, int], Awaitable[dict[str, Any]]]
+
+
+def retained_depths(depths: list[int], keep_latest: int, milestone_step: int) -> list[int]:
+    """Depths the retention policy keeps out of `depths` (mirrors the prune query)."""
+    latest = set(sorted(depths, reverse=True)[:max(1, keep_latest)])
+    return sorted(
+        depth for depth in depths
+        if depth in latest or (milestone_step > 0 and depth % milestone_step == 0)
+    )
+
+
+@dataclass
+class CompactionRun:
+    batches: int = 0
+    line_sets: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "line_sets_deleted": self.line_sets,
+            "bytes_reclaimed": self.bytes,
+            "seconds": round(self.seconds, 3),
+        }
+
+
+class AnalysisCompactor:
+    def __init__(
+        self,
+        keep_latest: int = ANALYSIS_RETENTION_LATEST_DEPTHS,
+        milestone_step: int = ANALYSIS_RETENTION_MILESTONE_STEP,
+        batch_size: int = ANALYSIS_COMPACTION_BATCH_SIZE,
+        interval_seconds: float = ANALYSIS_COMPACTION_INTERVAL_SECONDS,
+        prune_batch: PruneBatch | None = None,
+        batch_pause_seconds: float = 0.05,
+    ) -> None:
+        self.keep_latest = max(1, int(keep_latest))
+        self.milestone_step = max(0, int(milestone_step))
+        self.batch_size = max(1, int(batch_size))
+        self.interval_seconds = max(0.0, float(interval_seconds))
+        self._prune_batch = prune_batch or prune_analysis_line_sets
+        self._batch_pause_seconds = max(0.0, batch_pause_seconds)
+        self._task: asyncio.Task[None] | None = None
+        self._runs = 0
+        self._totals = CompactionRun()
+        self._last_run: CompactionRun | None = None
+
+    async def run_once(self) -> CompactionRun:
+        """One full pass over every position; returns what it deleted."""
+        run = CompactionRun()
+        started = time.monotonic()
+        cursor = 0
+        while True:
+            result = await self._prune_batch(cursor, self.keep_latest, self.milestone_step, self.batch_size)
+            if result.get("last_position_id") is None:
+                break
+            run.batches += 1
+            run.line_sets += int(result.get("line_sets") or 0)
+            run.bytes += int(result.get("bytes") or 0)
+            cursor = int(result["last_position_id"])
+            # Yield between batches so live writers and readers interleave with the pass.
+            await asyncio.sleep(self._batch_pause_seconds)
+        run.seconds = time.monotonic() - started
+
+        self._runs += 1
+        self._last_run = run
+        self._totals.batches += run.batches
+        self._totals.line_sets += run.line_sets
+        self._totals.bytes += run.bytes
+        self._totals.seconds += run.seconds
+        logger.info(
+            "Analysis compaction deleted %s line sets (%s bytes) in %s batches, %.2fs",
+            run.line_sets,
+            run.bytes,
+            run.batches,
+            run.seconds,
+        )
+        return run
+
+    def start(self) -> None:
+        if not DB_ENABLED or not self.interval_seconds or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run_forever())
+
+    async def shutdown(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "keep_latest_depths": self.keep_latest,
+            "milestone_step": self.milestone_step,
+            "interval_seconds": self.interval_seconds,
+            "runs": self._runs,
+            "last_run": self._last_run.as_dict() if self._last_run else None,
+            "total": self._totals.as_dict(),
+        }
+
+    async def _run_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Analysis compaction failed: %s", exc)
+
+
+analysis_compactor = AnalysisCompactor()
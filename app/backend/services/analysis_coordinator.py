@@ -3,7 +3,8 @@ from __future__ import annotations
 
 import asyncio
 import json
-from dataclasses import dataclass, replace
+import re
+from dataclasses import dataclass, field, replace
 from typing import Any
 
 import chess
@@ -11,16 +12,25 @@ from fastapi import WebSocket, WebSocketDisconnect
 
 from app.backend.config import (
     LIVE_ANALYSIS_CACHE_UNLOCK_DEPTH_DELTA,
+    LIVE_ANALYSIS_DEEP_MULTIPV,
     LIVE_ANALYSIS_DISPLAY_LAG_DEPTH,
     LIVE_ANALYSIS_DISPLAY_TARGET_DEPTH,
+    LIVE_ANALYSIS_MULTIPV_MILESTONE_STEP,
+    LIVE_ANALYSIS_PREFETCH_DEPTH,
+    LIVE_ANALYSIS_PREFETCH_PLIES,
+    LIVE_ANALYSIS_TIME_SLICE_MS,
     LIVE_ANALYSIS_WORKER_TARGET_DEPTH,
     MAX_ANALYSIS_DEPTH,
     MAX_DISPLAY_LAG_DEPTH,
 )
 from app.backend.logs.logger import logger
 from app.backend.runtime import get_stockfish_path
+from app.backend.services.engine_scheduler import EngineLease, EnginePriority, engine_scheduler
+from app.backend.services.engine_time_slicer import EngineTimeSlicer
+from app.backend.services.inflight_searches import InFlightSearch, SearchProgress, inflight_searches
+from app.backend.services.live_protocol import ProtocolWebSocket
 from app.backend.services.stockfish_parser import parse_stockfish_line
-from app.engine.stockfish_session import StockfishSession
+from app.engine.stockfish_session import AsyncStockfishSession, StockfishSession, uci_position_command
 
 DEFAULT_DISPLAY_TARGET_DEPTH = LIVE_ANALYSIS_DISPLAY_TARGET_DEPTH
 DEFAULT_WORKER_DEPTH_OFFSET = 6
@@ -28,6 +38,10 @@ DEFAULT_WORKER_TARGET_DEPTH = max(LIVE_ANALYSIS_WORKER_TARGET_DEPTH, DEFAULT_DIS
 DEFAULT_DISPLAY_LAG_DEPTH = LIVE_ANALYSIS_DISPLAY_LAG_DEPTH
 DEFAULT_MULTIPV = 3
 DEFAULT_CACHE_UNLOCK_DEPTH_DELTA = LIVE_ANALYSIS_CACHE_UNLOCK_DEPTH_DELTA
+# `search_mode` stored with each analysis line: all display lines, or the narrower deep phase.
+SEARCH_MODE_MULTIPV = "multipv"
+SEARCH_MODE_DEEP = "deep"
+INFO_DEPTH_PATTERN = re.compile(r"\bdepth (\d+)")
 
 
 @dataclass(frozen=True)
@@ -36,6 +50,24 @@ class AnalysisRequest:
     display_target_depth: int
     worker_target_depth: int
     display_lag_depth: int
+    game_id: int | None = None
+    ply: int | None = None
+    prefetch_fens: tuple[str, ...] = ()
+    root_fen: str | None = None
+    moves: tuple[str, ...] = ()
+
+
+@dataclass
+class JobSearchState:
+    fen: str
+    lines_by_depth: dict[int, dict[int, dict[str, Any]]] = field(default_factory=dict)
+    last_persisted_signature: tuple[int, tuple[int, ...]] | None = None
+    depth: int = 0
+    multipv: int = DEFAULT_MULTIPV
+
+    @property
+    def search_mode(self) -> str:
+        return SEARCH_MODE_MULTIPV if self.multipv >= DEFAULT_MULTIPV else SEARCH_MODE_DEEP
 
 
 @dataclass
@@ -44,22 +76,103 @@ class AnalysisJob:
     worker_target_depth: int
     multipv: int
     task: asyncio.Task[None]
+    priority: EnginePriority = EnginePriority.LIVE
+    lease: EngineLease | None = None
+    position_command: str | None = None
+    progress: SearchProgress = field(default_factory=SearchProgress)
+    inflight: InFlightSearch | None = None
+
+
+@dataclass(eq=False)
+class LiveConnection:
+    """Per-websocket state; the leased engine (and its warm hash) is kept between requests.
+
+    While no search runs the lease is parked as BACKGROUND, so an idle connection gives
+    its engine up to any waiting workload and re-acquires a LIVE lease on its next request.
+    """
+
+    engine: AsyncStockfishSession | None = None
+    lease: EngineLease | None = None
+    game_fens: dict[int, list[tuple[int, str]]] = field(default_factory=dict)
+    prefetched: set[str] = field(default_factory=set)
+    _closing: asyncio.Task[None] | None = field(default=None, repr=False)
+
+    def park(self) -> None:
+        lease = self.lease
+        if lease is None or lease.stop_requested:
+            return
+        engine_scheduler.set_priority(lease, EnginePriority.BACKGROUND)
+        lease.add_stop_callback(self._yield_engine)
+
+    async def resume(self) -> None:
+        """Take a parked lease back to LIVE; a preempted one has already been dropped."""
+        if self._closing is not None:
+            await asyncio.gather(self._closing, return_exceptions=True)
+            self._closing = None
+        if self.lease is not None:
+            self.lease.remove_stop_callback(self._yield_engine)
+            engine_scheduler.set_priority(self.lease, EnginePriority.LIVE)
+
+    def _yield_engine(self) -> None:
+        # Preempted while parked: free the slot at once and shut the idle engine down behind it.
+        engine, lease = self.engine, self.lease
+        self.engine = None
+        self.lease = None
+        if lease is not None:
+            engine_scheduler.release(lease)
+        if engine is not None:
+            self._closing = asyncio.get_running_loop().create_task(engine.close())
+
+    async def close(self) -> None:
+        engine, lease = self.engine, self.lease
+        self.engine = None
+        self.lease = None
+        try:
+            if engine is not None:
+                await engine.close()
+            if self._closing is not None:
+                await asyncio.gather(self._closing, return_exceptions=True)
+                self._closing = None
+        finally:
+            if lease is not None:
+                engine_scheduler.release(lease)
 
 
 class AnalysisCoordinator:
-    def __init__(self, poll_interval: float = 0.35) -> None:
+    def __init__(
+        self,
+        poll_interval: float = 0.35,
+        time_slice_ms: int = LIVE_ANALYSIS_TIME_SLICE_MS,
+        prefetch_plies: int = LIVE_ANALYSIS_PREFETCH_PLIES,
+        prefetch_depth: int = LIVE_ANALYSIS_PREFETCH_DEPTH,
+        deep_multipv: int = LIVE_ANALYSIS_DEEP_MULTIPV,
+        multipv_milestone_step: int = LIVE_ANALYSIS_MULTIPV_MILESTONE_STEP,
+    ) -> None:
         self._jobs: dict[str, AnalysisJob] = {}
         self._jobs_lock = asyncio.Lock()
         self._poll_interval = poll_interval
+        self._time_slicer = EngineTimeSlicer(time_slice_ms / 1000, DEFAULT_MULTIPV)
+        self._prefetch_plies = max(0, int(prefetch_plies))
+        self._prefetch_depth = max(1, min(int(prefetch_depth), MAX_ANALYSIS_DEPTH))
+        self._deep_multipv = max(1, min(int(deep_multipv), DEFAULT_MULTIPV))
+        self._multipv_milestone_step = max(0, int(multipv_milestone_step))
 
     async def handle_websocket(self, websocket: WebSocket) -> None:
         await websocket.accept()
+        # Events go out through the connection's negotiated encoding / delta protocol (JSON by default).
+        websocket = ProtocolWebSocket(websocket)
         request_queue: asyncio.Queue[AnalysisRequest] = asyncio.Queue()
+        connection = LiveConnection()
 
         async def listen_for_requests():
             try:
                 while True:
                     payload = await websocket.receive_text()
+                    replies = websocket.protocol.handle_control(payload)
+                    if replies is not None:
+                        for reply in replies:
+                            await websocket.send_json(reply)
+                        continue
                     try:
                         request = self.parse_request_payload(payload)
                         chess.Board(request.fen)
@@ -99,7 +212,7 @@ class AnalysisCoordinator:
                         pass
 
                 # Start new stream for the new request
-                stream_task = asyncio.create_task(self._process_single_request(websocket, request))
+                stream_task = asyncio.create_task(self._process_single_request(websocket, request, connection))
 
         except WebSocketDisconnect:
             logger.info("WebSocket disconnected during analysis stream")
@@ -111,11 +224,19 @@ class AnalysisCoordinator:
                 await asyncio.gather(reader_task, stream_task, return_exceptions=True) if stream_task else await asyncio.gather(reader_task, return_exceptions=True)
             except Exception:
                 pass
+            await self.cancel_prefetch(connection.prefetched)
+            connection.prefetched.clear()
+            await connection.close()
 
-    async def _process_single_request(self, websocket: WebSocket, request: AnalysisRequest) -> None:
+    async def _process_single_request(
+        self,
+        websocket: WebSocket,
+        request: AnalysisRequest,
+        connection: LiveConnection | None = None,
+    ) -> None:
         try:
             if not self._db_enabled():
-                await self._stream_direct_engine(websocket, request)
+                await self._stream_direct_engine(websocket, request, connection)
                 return
 
             latest_snapshot = await self.get_snapshot(request.fen)
@@ -157,7 +278,12 @@ class AnalysisCoordinator:
                 )
                 return
 
-            started = await self.ensure_analysis(request.fen, request.worker_target_depth)
+            started = await self.ensure_analysis(
+                request.fen,
+                request.worker_target_depth,
+                position_command=self.position_command(request),
+            )
+            await self._prefetch_safely(request, connection)
             worker_running = await self._job_is_running(request.fen)
             status = "analysis_started" if started else "analysis_running"
             status_message = None
@@ -194,6 +320,7 @@ class AnalysisCoordinator:
 
         if jobs:
             await asyncio.gather(*(job.task for job in jobs), return_exceptions=True)
+        await self._time_slicer.shutdown()
 
     @staticmethod
     def parse_request_payload(payload: str) -> AnalysisRequest:
@@ -201,6 +328,11 @@ class AnalysisCoordinator:
         display_target_depth = DEFAULT_DISPLAY_TARGET_DEPTH
         worker_target_depth = DEFAULT_WORKER_TARGET_DEPTH
         display_lag_depth = DEFAULT_DISPLAY_LAG_DEPTH
+        game_id = None
+        ply = None
+        prefetch_fens: tuple[str, ...] = ()
+        root_fen = None
+        moves: tuple[str, ...] = ()
 
         if not fen:
             raise ValueError("FEN is required")
@@ -219,6 +351,15 @@ class AnalysisCoordinator:
             display_lag_depth = AnalysisCoordinator._clamp_lag(
                 data.get("display_lag_depth", data.get("lag_depth", DEFAULT_DISPLAY_LAG_DEPTH))
             )
+            game_id = AnalysisCoordinator._optional_int(data.get("game_id"))
+            ply = AnalysisCoordinator._optional_int(data.get("ply"))
+            raw_prefetch = data.get("prefetch_fens") or []
+            if isinstance(raw_prefetch, list):
+                prefetch_fens = tuple(str(item).strip() for item in raw_prefetch if str(item or "").strip())
+            root_fen = str(data.get("root_fen") or "").strip() or None
+            raw_moves = data.get("moves") or []
+            if isinstance(raw_moves, list):
+                moves = tuple(str(item).strip() for item in raw_moves if str(item or "").strip())
         else:
             display_target_depth = AnalysisCoordinator._clamp_depth(display_target_depth, DEFAULT_DISPLAY_TARGET_DEPTH)
             worker_target_depth = AnalysisCoordinator._clamp_depth(
@@ -235,8 +376,35 @@ class AnalysisCoordinator:
             display_target_depth=display_target_depth,
             worker_target_depth=worker_target_depth,
             display_lag_depth=display_lag_depth,
+            game_id=game_id,
+            ply=ply,
+            prefetch_fens=prefetch_fens,
+            root_fen=root_fen,
+            moves=moves,
         )
 
+    @staticmethod
+    def position_command(request: AnalysisRequest) -> str:
+        """`position` command for a request; game-bound requests carry their move history."""
+        if request.moves:
+            try:
+                board = chess.Board(request.root_fen or chess.STARTING_FEN)
+                for move in request.moves:
+                    board.push_uci(move)
+                if board.fen().split()[:4] == request.fen.split()[:4]:
+                    return uci_position_command(board)
+            except ValueError:
+                pass
+            logger.debug("Ignoring move history that does not lead to fen %s", request.fen)
+        return f"position fen {request.fen}"
+
+    @staticmethod
+    def _optional_int(value: Any) -> int | None:
+        try:
+            return int(value) if value is not None and value != "" else None
+        except (TypeError, ValueError):
+            return None
+
     @staticmethod
     def _with_effective_worker_target(request: AnalysisRequest, cached_depth: int) -> AnalysisRequest:
         if cached_depth < request.worker_target_depth or cached_depth >= MAX_ANALYSIS_DEPTH:
@@ -352,6 +520,7 @@ class AnalysisCoordinator:
             "score_mate": snapshot.get("score_mate"),
             "pv": snapshot.get("pv"),
             "lines": snapshot.get("lines", []),
+            "search_mode": snapshot.get("search_mode"),
         }
 
     async def get_snapshot(
@@ -364,22 +533,129 @@ class AnalysisCoordinator:
 
         return await get_latest_analysis_snapshot(fen, target_depth, prefer_richer_lines=prefer_richer_lines)
 
-    async def ensure_analysis(self, fen: str, worker_target_depth: int, multipv: int = DEFAULT_MULTIPV) -> bool:
+    async def ensure_analysis(
+        self,
+        fen: str,
+        worker_target_depth: int,
+        multipv: int = DEFAULT_MULTIPV,
+        priority: EnginePriority = EnginePriority.LIVE,
+        position_command: str | None = None,
+    ) -> bool:
         async with self._jobs_lock:
             existing = self._jobs.get(fen)
             if existing and not existing.task.done():
                 existing.worker_target_depth = max(existing.worker_target_depth, worker_target_depth)
-                return False
+                if existing.inflight is not None:
+                    existing.inflight.depth = existing.worker_target_depth
+                position_command = position_command or existing.position_command
+                if priority >= existing.priority:
+                    return False
+                if existing.lease is not None:
+                    # A prefetch already searching this position: keep its engine, raise its class.
+                    existing.priority = priority
+                    engine_scheduler.set_priority(existing.lease, priority)
+                    return False
+                # Still queued at low priority: requeue the position in the requested class.
+                existing.task.cancel()
+                worker_target_depth = existing.worker_target_depth
 
             task = asyncio.create_task(self._run_analysis_job(fen))
-            self._jobs[fen] = AnalysisJob(
+            job = AnalysisJob(
                 fen=fen,
                 worker_target_depth=worker_target_depth,
                 multipv=multipv,
                 task=task,
+                priority=priority,
+                position_command=position_command,
             )
+            # REST and quiz requests for this position join the live search instead of starting their own.
+            job.inflight = inflight_searches.register(
+                fen, worker_target_depth, multipv, task, progress=job.progress, source="live", owned=False
+            )
+            self._jobs[fen] = job
             return True
 
+    async def prefetch_upcoming(self, request: AnalysisRequest, connection: LiveConnection | None = None) -> list[str]:
+        """Queue depth-capped background jobs for the next mainline plies of the request's game."""
+        if self._prefetch_plies <= 0 or not self._db_enabled():
+            return []
+
+        upcoming = await self._upcoming_fens(request, connection)
+        if connection is not None:
+            # The user moved elsewhere in the game: drop prefetches that fell out of the window.
+            stale = connection.prefetched - set(upcoming) - {request.fen}
+            await self.cancel_prefetch(stale)
+            connection.prefetched -= stale
+
+        scheduled: list[str] = []
+        for fen in upcoming:
+            if fen == request.fen or await self._job_is_running(fen):
+                continue
+            if self._snapshot_depth(await self.get_snapshot(fen)) >= self._prefetch_depth:
+                continue
+            await self.ensure_analysis(fen, self._prefetch_depth, priority=EnginePriority.BACKGROUND)
+            scheduled.append(fen)
+            if connection is not None:
+                connection.prefetched.add(fen)
+        return scheduled
+
+    async def cancel_prefetch(self, fens: set[str] | list[str]) -> None:
+        """Cancel background prefetch jobs; jobs promoted by a live request are left running."""
+        if not fens:
+            return
+
+        async with self._jobs_lock:
+            for fen in fens:
+                job = self._jobs.get(fen)
+                if job and job.priority == EnginePriority.BACKGROUND and not job.task.done():
+                    job.task.cancel()
+
+    async def _prefetch_safely(self, request: AnalysisRequest, connection: LiveConnection | None) -> None:
+        if not (request.prefetch_fens or request.game_id is not None):
+            return
+        try:
+            await self.prefetch_upcoming(request, connection)
+        except Exception as exc:
+            logger.warning("Prefetch failed for game %s ply %s: %s", request.game_id, request.ply, exc)
+
+    async def _upcoming_fens(self, request: AnalysisRequest, connection: LiveConnection | None) -> list[str]:
+        if request.prefetch_fens:
+            candidates = list(request.prefetch_fens)
+        elif request.game_id is not None and request.ply is not None:
+            mainline = await self._game_mainline_fens(request.game_id, connection)
+            candidates = [fen for ply, fen in mainline if ply > request.ply]
+        else:
+            return []
+
+        upcoming: list[str] = []
+        for fen in candidates:
+            try:
+                chess.Board(fen)
+            except ValueError:
+                continue
+            if fen not in upcoming:
+                upcoming.append(fen)
+            if len(upcoming) >= self._prefetch_plies:
+                break
+        return upcoming
+
+    async def _game_mainline_fens(self, game_id: int, connection: LiveConnection | None) -> list[tuple[int, str]]:
+        if connection is not None and game_id in connection.game_fens:
+            return connection.game_fens[game_id]
+
+        from app.backend.db.db import get_moves
+
+        rows = await get_moves(game_id)
+        mainline = [
+            (int(row["ply"]), str(row["fen"]))
+            for row in rows
+            if row.get("fen") and row.get("is_mainline", True)
+        ]
+        if connection is not None:
+            # Moves of an uploaded game do not change while it is browsed; load them once per socket.
+            connection.game_fens[game_id] = mainline
+        return mainline
+
     async def _stream_database_updates(
         self,
         websocket: WebSocket,
@@ -502,53 +778,97 @@ class AnalysisCoordinator:
             await asyncio.sleep(self._poll_interval)
 
     async def _run_analysis_job(self, fen: str) -> None:
+        try:
+            priority, position_command = await self._get_job_search_setup(fen)
+            state = JobSearchState(fen=fen)
+            if priority == EnginePriority.LIVE and self._time_slicer.enabled and not engine_scheduler.has_capacity():
+                # Every engine is busy: share one engine in round-robin slices instead of queueing.
+                logger.info("All engines busy; time-slicing live analysis for fen %s", fen)
+                lease = await self._time_slicer.analyze(
+                    fen,
+                    lambda line: self._record_job_line(state, line),
+                    position_command=position_command,
+                )
+                if lease is None:
+                    return
+                logger.info("Engine slot freed; moving live analysis for fen %s off the time slicer", fen)
+            else:
+                lease = await engine_scheduler.acquire(priority, label=fen)
+
+            try:
+                await self._attach_job_lease(fen, lease)
+                await self._search_analysis_job(fen, lease, position_command, state)
+            except asyncio.CancelledError:
+                engine_scheduler.cancel(lease)
+                raise
+            finally:
+                engine_scheduler.release(lease)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # pragma: no cover - integration path
+            logger.error("Background analysis job failed for fen %s: %s", fen, exc, exc_info=True)
+        finally:
+            async with self._jobs_lock:
+                job = self._jobs.get(fen)
+                if job and job.task is asyncio.current_task():
+                    self._jobs.pop(fen, None)
+
+    async def _search_analysis_job(
+        self,
+        fen: str,
+        lease: EngineLease,
+        position_command: str | None = None,
+        state: JobSearchState | None = None,
+    ) -> None:
         session = StockfishSession(get_stockfish_path())
-        lines_by_depth: dict[int, dict[int, dict[str, Any]]] = {}
-        last_persisted_signature: tuple[int, tuple[int, ...]] | None = None
+        # A job moved off the time slicer keeps its state, so depths it already stored are skipped.
+        state = state or JobSearchState(fen=fen)
+
+        def stop_search() -> None:
+            session.send("stop")
+
+        async def search(multipv: int) -> None:
+            state.multipv = multipv
+            self._set_job_search_multipv(fen, multipv)
+            session.send(f"setoption name MultiPV value {multipv}")
+            session.send(position_command or f"position fen {fen}")
+            session.send("go infinite")
 
         try:
+            lease.add_stop_callback(stop_search)
             session.send("uci")
             session.send("ucinewgame")
             session.send("setoption name UCI_AnalyseMode value true")
-            session.send(f"setoption name MultiPV value {DEFAULT_MULTIPV}")
-            session.send(f"position fen {fen}")
-            session.send("go infinite")
+            await search(self._multipv_for_depth(state.depth + 1))
 
             while True:
                 line = await asyncio.to_thread(session.process.stdout.readline)
-                if not line:
+                if not line or line.startswith("bestmove"):
                     break
 
-                parsed = parse_stockfish_line(fen, line.strip())
-                if not parsed or "pv" not in parsed:
+                depth = self._info_line_depth(line)
+                if depth > state.depth and self._multipv_for_depth(depth) != state.multipv:
+                    # Entering a new phase: restart on the warm hash with the phase's MultiPV;
+                    # the replayed shallow iterations are skipped by the line recorder.
+                    if not await self._drain_to_bestmove(session):
+                        break
+                    if lease.stop_requested:
+                        return
+                    await search(self._multipv_for_depth(depth))
                     continue
 
-                depth = int(parsed.get("depth", 0) or 0)
-                multipv = int(parsed.get("multipv", 1) or 1)
-                if depth < 1 or multipv < 1 or multipv > DEFAULT_MULTIPV:
-                    continue
-
-                depth_bucket = lines_by_depth.setdefault(depth, {})
-                depth_bucket[multipv] = {
-                    "best_move": parsed.get("best_move"),
-                    "score_cp": parsed.get("score_cp"),
-                    "score_mate": parsed.get("score_mate"),
-                    "pv": parsed.get("pv"),
-                }
-
-                signature = (depth, tuple(sorted(depth_bucket)))
-                if signature != last_persisted_signature:
-                    await self._persist_depth_snapshot(fen, depth, depth_bucket)
-                    last_persisted_signature = signature
+                if await self._record_job_line(state, line):
+                    return
 
-                worker_target_depth = await self._get_job_worker_target_depth(fen)
-                if depth >= worker_target_depth and 1 in depth_bucket:
+                if state.depth > DEFAULT_DISPLAY_TARGET_DEPTH and lease.priority == EnginePriority.LIVE:
+                    # Past the display target the worker is only deepening the cache. It yields to
+                    # interactive work but not to batch jobs: a preempted live job is not resumed.
+                    engine_scheduler.set_priority(lease, EnginePriority.BATCH)
+                if lease.stop_requested:
+                    logger.info("Live analysis worker for fen %s preempted at depth %s", fen, state.depth)
                     return
-        except asyncio.CancelledError:
-            raise
-        except Exception as exc:  # pragma: no cover - integration path
-            logger.error("Background analysis job failed for fen %s: %s", fen, exc, exc_info=True)
         finally:
+            lease.remove_stop_callback(stop_search)
             try:
                 session.send("stop")
                 session.send("quit")
@@ -563,10 +883,90 @@ class AnalysisCoordinator:
                     session.process.kill()
                 except Exception:
                     pass
-            async with self._jobs_lock:
-                job = self._jobs.get(fen)
-                if job and job.task is asyncio.current_task():
-                    self._jobs.pop(fen, None)
+
+    async def _record_job_line(self, state: JobSearchState, line: str) -> bool:
+        """Persist one engine info line for a background job; True once its worker target is reached."""
+        parsed = parse_stockfish_line(state.fen, line.strip())
+        if not parsed or "pv" not in parsed:
+            return False
+
+        depth = int(parsed.get("depth", 0) or 0)
+        multipv = int(parsed.get("multipv", 1) or 1)
+        if depth < 1 or multipv < 1 or multipv > DEFAULT_MULTIPV:
+            return False
+        if depth < state.depth:
+            # A resumed search replays shallow iterations; pick up from the depth already stored.
+            return False
+
+        state.depth = depth
+        depth_bucket = state.lines_by_depth.setdefault(depth, {})
+        depth_bucket[multipv] = {
+            "best_move": parsed.get("best_move"),
+            "score_cp": parsed.get("score_cp"),
+            "score_mate": parsed.get("score_mate"),
+            "pv": parsed.get("pv"),
+            "search_mode": state.search_mode,
+        }
+
+        signature = (depth, tuple(sorted(depth_bucket)))
+        if signature != state.last_persisted_signature:
+            await self._persist_depth_snapshot(state.fen, depth, depth_bucket)
+            state.last_persisted_signature = signature
+
+        worker_target_depth = await self._get_job_worker_target_depth(state.fen)
+        finished = depth >= worker_target_depth and 1 in depth_bucket
+        self._publish_job_progress(state.fen, depth, depth_bucket, finished)
+        return finished
+
+    def _publish_job_progress(
+        self, fen: str, depth: int, depth_bucket: dict[int, dict[str, Any]], finished: bool
+    ) -> None:
+        """Expose the job's latest iteration to callers attached to it through the in-flight registry."""
+        job = self._jobs.get(fen)
+        if job is None or 1 not in depth_bucket:
+            return
+
+        lines = [
+            {**depth_bucket[idx], "depth": depth, "multipv": idx}
+            for idx in range(1, DEFAULT_MULTIPV + 1)
+            if idx in depth_bucket
+        ]
+        snapshot = {**lines[0], "lines": lines}
+        if finished:
+            job.progress.finish(snapshot)
+        else:
+            job.progress.observe(snapshot)
+
+    def _set_job_search_multipv(self, fen: str, multipv: int) -> None:
+        """Keep the job's in-flight registration in step with its phase so callers needing more lines don't attach."""
+        job = self._jobs.get(fen)
+        if job is not None and job.inflight is not None:
+            job.inflight.multipv = multipv
+
+    def _multipv_for_depth(self, depth: int) -> int:
+        """All display lines up to the display target (and on milestone depths), fewer lines beyond."""
+        if depth <= DEFAULT_DISPLAY_TARGET_DEPTH:
+            return DEFAULT_MULTIPV
+        if self._multipv_milestone_step and depth % self._multipv_milestone_step == 0:
+            return DEFAULT_MULTIPV
+        return self._deep_multipv
+
+    @staticmethod
+    def _info_line_depth(line: str) -> int:
+        if not line.startswith("info") or " pv " not in line:
+            return 0
+        match = INFO_DEPTH_PATTERN.search(line)
+        return int(match.group(1)) if match else 0
+
+    @staticmethod
+    async def _drain_to_bestmove(session: StockfishSession) -> bool:
+        session.send("stop")
+        while True:
+            line = await asyncio.to_thread(session.process.stdout.readline)
+            if not line:
+                return False
+            if line.startswith("bestmove"):
+                return True
 
     async def _persist_depth_snapshot(self, fen: str, depth: int, depth_bucket: dict[int, dict[str, Any]]) -> None:
         from app.backend.db.db import store_analysis_lines, upsert_eval
@@ -586,19 +986,62 @@ class AnalysisCoordinator:
         )
         await store_analysis_lines(fen=fen, depth=depth, lines=ordered_lines)
 
-    async def _stream_direct_engine(self, websocket: WebSocket, request: AnalysisRequest) -> None:
-        session = StockfishSession(get_stockfish_path())
+    async def _stream_direct_engine(
+        self,
+        websocket: WebSocket,
+        request: AnalysisRequest,
+        connection: LiveConnection | None = None,
+    ) -> None:
+        if connection is not None:
+            await self._stream_direct_engine_session(websocket, request, connection)
+            return
+
+        connection = LiveConnection()
+        try:
+            await self._stream_direct_engine_session(websocket, request, connection)
+        finally:
+            await connection.close()
+
+    async def _lease_connection_engine(self, connection: LiveConnection) -> AsyncStockfishSession:
+        await connection.resume()
+        if connection.engine is not None:
+            return connection.engine
+
+        if connection.lease is None:
+            connection.lease = await engine_scheduler.acquire(EnginePriority.LIVE, label="websocket connection")
+        engine = AsyncStockfishSession.open(get_stockfish_path())
+        try:
+            await engine.start({"UCI_AnalyseMode": "true", "MultiPV": DEFAULT_MULTIPV})
+        except BaseException:
+            await engine.close()
+            raise
+        connection.engine = engine
+        return engine
+
+    async def _stream_direct_engine_session(
+        self,
+        websocket: WebSocket,
+        request: AnalysisRequest,
+        connection: LiveConnection,
+    ) -> None:
         lines_by_depth: dict[int, dict[int, dict[str, Any]]] = {}
+        # Search mode of the phase each depth's lines came from (see _multipv_for_depth).
+        modes_by_depth: dict[int, str] = {}
         last_sent_signature: tuple[int, tuple[tuple[int, str | None], ...]] | None = None
         last_sent_depth = 0
+        phase_depth = 1
+
+        engine = await self._lease_connection_engine(connection)
+
+        async def search(multipv: int) -> None:
+            # Switching positions on the leased engine stops the previous search and keeps the hash warm.
+            await engine.stop()
+            engine.set_option("MultiPV", multipv)
+            await engine.go(self.position_command(request))
 
         try:
-            session.send("uci")
-            session.send("ucinewgame")
-            session.send("setoption name UCI_AnalyseMode value true")
-            session.send(f"setoption name MultiPV value {DEFAULT_MULTIPV}")
-            session.send(f"position fen {request.fen}")
-            session.send("go infinite")
+            multipv_setting = self._multipv_for_depth(phase_depth)
+            await search(multipv_setting)
             await websocket.send_json(
                 self.build_status_event(
                     request,
@@ -610,9 +1053,9 @@ class AnalysisCoordinator:
             )
 
             while True:
-                line = await asyncio.to_thread(session.process.stdout.readline)
-                if not line:
-                    break
+                line = await engine.readline()
+                if line is None:
+                    raise RuntimeError("Stockfish exited during live analysis")
 
                 parsed = parse_stockfish_line(request.fen, line.strip())
                 if not parsed or "pv" not in parsed:
@@ -620,9 +1063,17 @@ class AnalysisCoordinator:
 
                 depth = int(parsed.get("depth", 0) or 0)
                 multipv = int(parsed.get("multipv", 1) or 1)
-                if depth < 1 or multipv < 1 or multipv > DEFAULT_MULTIPV:
+                if depth < phase_depth or multipv < 1 or multipv > multipv_setting:
+                    # Replayed shallow iterations of a restarted phase.
+                    continue
+                if depth not in lines_by_depth and self._multipv_for_depth(depth) != multipv_setting:
+                    # Entering a new phase: restart on the warm hash with the phase's MultiPV.
+                    phase_depth = depth
+                    multipv_setting = self._multipv_for_depth(depth)
+                    await search(multipv_setting)
                     continue
 
+                modes_by_depth[depth] = SEARCH_MODE_MULTIPV if multipv_setting >= DEFAULT_MULTIPV else SEARCH_MODE_DEEP
                 depth_bucket = lines_by_depth.setdefault(depth, {})
                 depth_bucket[multipv] = {
                     "line_number": multipv,
@@ -646,6 +1097,7 @@ class AnalysisCoordinator:
                     "score_mate": display_bucket[min(display_bucket)].get("score_mate"),
                     "pv": display_bucket[min(display_bucket)].get("pv"),
                     "lines": [display_bucket[idx] for idx in range(1, DEFAULT_MULTIPV + 1) if idx in display_bucket],
+                    "search_mode": modes_by_depth[display_depth],
                 }
                 signature = self._snapshot_signature(snapshot)
                 snapshot_depth = self._snapshot_depth(snapshot)
@@ -673,6 +1125,7 @@ class AnalysisCoordinator:
                         "score_mate": final_bucket[min(final_bucket)].get("score_mate"),
                         "pv": final_bucket[min(final_bucket)].get("pv"),
                         "lines": [final_bucket[idx] for idx in range(1, DEFAULT_MULTIPV + 1) if idx in final_bucket],
+                        "search_mode": modes_by_depth[depth],
                     }
                     final_signature = self._snapshot_signature(final_snapshot)
                     if final_signature != last_sent_signature:
@@ -696,22 +1149,17 @@ class AnalysisCoordinator:
                             cached_depth=None,
                         )
                     )
+                    await engine.stop()
+                    connection.park()
                     return
-        finally:
-            try:
-                session.send("stop")
-                session.send("quit")
-            except Exception:
-                pass
-            try:
-                if session.process.poll() is None:
-                    session.process.terminate()
-                    await asyncio.to_thread(session.process.wait, 2)
-            except Exception:
-                try:
-                    session.process.kill()
-                except Exception:
-                    pass
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Drop a broken engine so the next request on this connection spawns a fresh one.
+            connection.engine = None
+            await engine.close()
+            connection.park()
+            raise
 
     async def _resolve_display_snapshot(
         self,
@@ -768,6 +1216,17 @@ class AnalysisCoordinator:
             job = self._jobs.get(fen)
             return job.worker_target_depth if job else DEFAULT_WORKER_TARGET_DEPTH
 
+    async def _get_job_search_setup(self, fen: str) -> tuple[EnginePriority, str | None]:
+        async with self._jobs_lock:
+            job = self._jobs.get(fen)
+            return (job.priority, job.position_command) if job else (EnginePriority.LIVE, None)
+
+    async def _attach_job_lease(self, fen: str, lease: EngineLease) -> None:
+        async with self._jobs_lock:
+            job = self._jobs.get(fen)
+            if job and job.task is asyncio.current_task():
+                job.lease = lease
+
     async def _job_is_running(self, fen: str) -> bool:
         async with self._jobs_lock:
             job = self._jobs.get(fen)
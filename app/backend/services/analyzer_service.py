@@ -9,13 +9,17 @@ Implements a cache-then-compute pattern:
 """
 
 import asyncio
+import time
 import chess
 import chess.engine
-from typing import Dict, Optional
+from typing import Any, Dict, Iterable, Optional
 from app.backend.logs.logger import logger
 from app.backend.runtime import get_stockfish_path
+from app.backend.services.engine_scheduler import EngineLease, EnginePriority, engine_scheduler
+from app.backend.services.inflight_searches import SearchProgress, inflight_searches, stored_result_covers
+from app.backend.services.search_convergence import ConvergencePolicy, ConvergenceTracker
 from app.backend.services.stockfish_parser import parse_stockfish_line
-from app.engine.stockfish_session import StockfishSession
+from app.engine.stockfish_session import StockfishSession, uci_position_command
 
 # Try to import DB functions; gracefully degrade if not available
 try:
@@ -31,6 +35,10 @@ except Exception as e:
         pass
 
 
+# Deadline-mode searches that outlived their request; referenced here so they run to completion.
+_background_searches: set[asyncio.Task] = set()
+
+
 def _normalize_analysis_result(raw_result: Dict, requested_depth: int) -> Dict:
     return {
         "best_move": raw_result.get("best_move"),
@@ -50,67 +58,168 @@ def _build_go_command(depth: int, time_limit: float) -> str:
 
 
 
-def _analyze_with_simple_engine(fen: str, depth: int, time_limit: float, stockfish_path: str) -> Dict:
-    board = chess.Board(fen)
-
+def _analyze_with_simple_engine(
+    fen: str,
+    depth: int,
+    time_limit: float,
+    stockfish_path: str,
+    lease: Optional[EngineLease] = None,
+    convergence: Optional[ConvergencePolicy] = None,
+    progress: Optional[SearchProgress] = None,
+) -> Dict:
     with chess.engine.SimpleEngine.popen_uci(stockfish_path) as engine:
-        limit = chess.engine.Limit(time=time_limit, depth=depth)
-        info = engine.analyse(board, limit, multipv=1)
+        return _analyze_board_with_engine(
+            engine, chess.Board(fen), depth, time_limit, lease, convergence=convergence, progress=progress
+        )
 
-        logger.info(f"Stockfish returned: {len(info) if info else 0} infos")
 
-        if not info:
-            logger.warning(f"No analysis returned for FEN: {fen}")
-            return {}
 
-        entry = info[0]
-        pv_moves = entry.get("pv", [])
-        score = entry.get("score")
+def _analyze_board_with_engine(
+    engine: chess.engine.SimpleEngine,
+    board: chess.Board,
+    depth: int,
+    time_limit: float,
+    lease: Optional[EngineLease] = None,
+    game: Any = None,
+    convergence: Optional[ConvergencePolicy] = None,
+    progress: Optional[SearchProgress] = None,
+) -> Dict:
+    limit = chess.engine.Limit(time=time_limit if time_limit and time_limit > 0 else None, depth=depth)
+    tracker = ConvergenceTracker(convergence) if convergence else None
+    started = time.monotonic()
+    with engine.analysis(board, limit, multipv=1, game=game) as analysis:
+        if lease is not None:
+            lease.add_stop_callback(analysis.stop)
+        try:
+            if tracker is not None or progress is not None:
+                for update in analysis:
+                    if not _is_principal_update(update):
+                        continue
+                    result = _engine_info_result(update, depth)
+                    if progress is not None:
+                        progress.observe(result)
+                    if tracker is not None and tracker.observe(
+                        result["depth"], result["best_move"], result["score_cp"], result["score_mate"]
+                    ):
+                        analysis.stop()
+                        break
+            analysis.wait()
+        finally:
+            if lease is not None:
+                lease.remove_stop_callback(analysis.stop)
+        info = analysis.multipv
+
+    logger.info(f"Stockfish returned: {len(info) if info else 0} infos")
+
+    if not info:
+        logger.warning(f"No analysis returned for FEN: {board.fen()}")
+        return {}
 
-        logger.info(f"PV length: {len(pv_moves)}, Score: {score}")
+    logger.info(f"PV length: {len(info[0].get('pv', []))}, Score: {info[0].get('score')}")
+    result = _engine_info_result(info[0], depth)
+    logger.info(
+        f"Analysis result: best_move={result['best_move']}, score_cp={result['score_cp']}, depth={result['depth']}"
+    )
 
-        score_cp = None
-        score_mate = None
-        if score:
-            white_score = score.white()
-            if white_score.is_mate():
-                score_mate = white_score.mate()
-            else:
-                score_cp = white_score.score()
+    if progress is not None:
+        progress.finish(result)
+    if tracker is not None:
+        result.update(tracker.summary(time_limit, time.monotonic() - started))
+    return result
 
-        best_move = pv_moves[0].uci() if pv_moves else None
-        pv_str = " ".join(move.uci() for move in pv_moves[:10]) if pv_moves else ""
-        actual_depth = entry.get("depth", depth)
 
-        logger.info(f"Analysis result: best_move={best_move}, score_cp={score_cp}, depth={actual_depth}")
 
-        return {
-            "best_move": best_move,
-            "score_cp": score_cp,
-            "score_mate": score_mate,
-            "depth": actual_depth,
-            "pv": pv_str,
-        }
+def _is_principal_update(info: Dict) -> bool:
+    """A first-line update with a PV and an exact score (bound updates are provisional)."""
+    return (
+        info.get("multipv", 1) == 1
+        and bool(info.get("pv"))
+        and info.get("score") is not None
+        and "depth" in info
+        and not info.get("lowerbound")
+        and not info.get("upperbound")
+    )
+
 
 
+def _engine_info_result(info: Dict, default_depth: int) -> Dict:
+    pv_moves = info.get("pv", [])
+    score = info.get("score")
 
-def _analyze_with_stockfish_session(fen: str, depth: int, time_limit: float, stockfish_path: str) -> Dict:
+    score_cp = None
+    score_mate = None
+    if score:
+        white_score = score.white()
+        if white_score.is_mate():
+            score_mate = white_score.mate()
+        else:
+            score_cp = white_score.score()
+
+    return {
+        "best_move": pv_moves[0].uci() if pv_moves else None,
+        "score_cp": score_cp,
+        "score_mate": score_mate,
+        "depth": info.get("depth", default_depth),
+        "pv": " ".join(move.uci() for move in pv_moves[:10]) if pv_moves else "",
+    }
+
+
+
+def _analyze_with_stockfish_session(
+    fen: str,
+    depth: int,
+    time_limit: float,
+    stockfish_path: str,
+    lease: Optional[EngineLease] = None,
+    convergence: Optional[ConvergencePolicy] = None,
+    progress: Optional[SearchProgress] = None,
+) -> Dict:
     session = StockfishSession(stockfish_path)
+    try:
+        _start_session(session)
+        return _search_session(session, fen, f"position fen {fen}", depth, time_limit, lease, convergence, progress)
+    finally:
+        _close_session(session)
+
+
+
+def _start_session(session: StockfishSession) -> None:
+    session.send("uci")
+    session.send("isready")
+    for line in session.read_lines():
+        if line == "readyok":
+            break
+
+    session.send("ucinewgame")
+    session.send("setoption name UCI_AnalyseMode value true")
+    session.send("setoption name MultiPV value 1")
+
+
+
+def _search_session(
+    session: StockfishSession,
+    fen: str,
+    position_command: str,
+    depth: int,
+    time_limit: float,
+    lease: Optional[EngineLease] = None,
+    convergence: Optional[ConvergencePolicy] = None,
+    progress: Optional[SearchProgress] = None,
+) -> Dict:
     latest_result: Dict = {}
+    tracker = ConvergenceTracker(convergence) if convergence else None
+    started = time.monotonic()
+    stop_sent = False
 
-    try:
-        session.send("uci")
-        session.send("isready")
-        for line in session.read_lines():
-            if line == "readyok":
-                break
+    def stop_search() -> None:
+        session.send("stop")
 
-        session.send("ucinewgame")
-        session.send("setoption name UCI_AnalyseMode value true")
-        session.send("setoption name MultiPV value 1")
-        session.send(f"position fen {fen}")
-        session.send(_build_go_command(depth, time_limit))
+    session.send(position_command)
+    session.send(_build_go_command(depth, time_limit))
+    if lease is not None:
+        lease.add_stop_callback(stop_search)
 
+    try:
         for line in session.read_lines():
             if line.startswith("bestmove"):
                 break
@@ -118,41 +227,187 @@ def _analyze_with_stockfish_session(fen: str, depth: int, time_limit: float, sto
             parsed = parse_stockfish_line(fen, line)
             if parsed.get("pv"):
                 latest_result = parsed
+                principal = int(parsed.get("multipv", 1) or 1) == 1 and "bound" not in line
+                if progress is not None and principal:
+                    progress.observe(_normalize_analysis_result(parsed, depth))
+                if (
+                    tracker is not None
+                    and not stop_sent
+                    and principal
+                    and tracker.observe(
+                        int(parsed.get("depth", 0) or 0),
+                        parsed.get("best_move"),
+                        parsed.get("score_cp"),
+                        parsed.get("score_mate"),
+                    )
+                ):
+                    session.send("stop")
+                    stop_sent = True
+    finally:
+        if lease is not None:
+            lease.remove_stop_callback(stop_search)
 
-        if latest_result:
-            normalized = _normalize_analysis_result(latest_result, depth)
-            logger.info(
-                "Fallback Stockfish session result: best_move=%s, score_cp=%s, depth=%s",
-                normalized.get("best_move"),
-                normalized.get("score_cp"),
-                normalized.get("depth"),
-            )
-            return normalized
+    if latest_result:
+        normalized = _normalize_analysis_result(latest_result, depth)
+        if progress is not None:
+            progress.finish(normalized)
+        if tracker is not None:
+            normalized.update(tracker.summary(time_limit, time.monotonic() - started))
+        logger.info(
+            "Fallback Stockfish session result: best_move=%s, score_cp=%s, depth=%s",
+            normalized.get("best_move"),
+            normalized.get("score_cp"),
+            normalized.get("depth"),
+        )
+        return normalized
 
-        logger.warning("Fallback Stockfish session produced no PV for FEN: %s", fen)
-        return {}
-    finally:
-        try:
-            session.send("stop")
-        except Exception:
-            pass
+    logger.warning("Fallback Stockfish session produced no PV for FEN: %s", fen)
+    return {}
+
+
+
+def _close_session(session: StockfishSession) -> None:
+    try:
+        session.send("stop")
+    except Exception:
+        pass
+    try:
+        session.send("quit")
+    except Exception:
+        pass
+    try:
+        if session.process.poll() is None:
+            session.process.terminate()
+            session.process.wait(timeout=2)
+    except Exception:
         try:
-            session.send("quit")
+            session.process.kill()
         except Exception:
             pass
+
+
+
+class GameAnalysisSession:
+    """
+    One engine kept open across the consecutive plies of a game.
+
+    Each ply is sent as the game's root plus its moves, so repetitions are
+    scored from real history, and `ucinewgame` is sent only once so the hash
+    table built on one ply is reused by the next.
+    """
+
+    def __init__(self, game_key: Any, stockfish_path: Optional[str] = None) -> None:
+        self._game_key = game_key
+        self._stockfish_path = stockfish_path
+        self._engine: Optional[chess.engine.SimpleEngine] = None
+        self._session: Optional[StockfishSession] = None
+        self.positions = 0
+
+    def analyze(
+        self,
+        board: chess.Board,
+        depth: int,
+        time_limit: float,
+        lease: Optional[EngineLease] = None,
+        convergence: Optional[ConvergencePolicy] = None,
+        progress: Optional[SearchProgress] = None,
+    ) -> Dict:
+        """Blocking; run through `asyncio.to_thread`. Returns {} if the engine fails."""
         try:
-            if session.process.poll() is None:
-                session.process.terminate()
-                session.process.wait(timeout=2)
-        except Exception:
+            self.positions += 1
+            if self._session is None:
+                try:
+                    if self._engine is None:
+                        self._engine = chess.engine.SimpleEngine.popen_uci(self._path())
+                    return _analyze_board_with_engine(
+                        self._engine,
+                        board,
+                        depth,
+                        time_limit,
+                        lease,
+                        game=self._game_key,
+                        convergence=convergence,
+                        progress=progress,
+                    )
+                except NotImplementedError:
+                    logger.warning("python-chess engine launch is not supported in this runtime; using direct UCI session")
+                    self._session = StockfishSession(self._path())
+                    _start_session(self._session)
+            return _search_session(
+                self._session, board.fen(), uci_position_command(board), depth, time_limit, lease, convergence, progress
+            )
+        except Exception as e:
+            logger.error(f"Game analysis failed for FEN '{board.fen()}': {e}", exc_info=True)
+            # Start from a fresh engine on the next ply rather than reusing a broken one.
+            self.close()
+            return {}
+
+    def close(self) -> None:
+        engine, session = self._engine, self._session
+        self._engine = None
+        self._session = None
+        if engine is not None:
             try:
-                session.process.kill()
+                engine.quit()
             except Exception:
                 pass
+        if session is not None:
+            _close_session(session)
 
+    def _path(self) -> str:
+        if not self._stockfish_path:
+            self._stockfish_path = get_stockfish_path()
+        return self._stockfish_path
 
 
-def _analyze_with_stockfish(fen: str, depth: int = 20, time_limit: float = 0.5) -> Dict:
+
+def build_game_boards(rows: Iterable[Dict]) -> Dict[int, chess.Board]:
+    """
+    Replay a game's mainline move rows (ordered by ply) into boards that keep the move stack.
+
+    Returns {ply: board}. A row whose stored FEN disagrees with the replay restarts
+    from that FEN, so a damaged row costs history, never correctness.
+    """
+    boards: Dict[int, chess.Board] = {}
+    board: Optional[chess.Board] = None
+    for row in rows:
+        fen = row.get("fen")
+        if not fen or row.get("is_mainline") is False or row.get("ply") is None:
+            continue
+
+        san = row.get("san")
+        fen_before = row.get("fen_before")
+        try:
+            if san:
+                if board is None or (fen_before and _position_key(board.fen()) != _position_key(fen_before)):
+                    board = chess.Board(fen_before) if fen_before else None
+                if board is None:
+                    raise ValueError("missing position before move")
+                board.push_san(san)
+                if _position_key(board.fen()) != _position_key(fen):
+                    raise ValueError("replayed position does not match stored FEN")
+            else:
+                board = chess.Board(fen)
+        except ValueError:
+            board = chess.Board(fen)
+        boards[int(row["ply"])] = board.copy()
+    return boards
+
+
+
+def _position_key(fen: str) -> str:
+    return " ".join(fen.split()[:4])
+
+
+
+def _analyze_with_stockfish(
+    fen: str,
+    depth: int = 20,
+    time_limit: float = 0.5,
+    lease: Optional[EngineLease] = None,
+    convergence: Optional[ConvergencePolicy] = None,
+    progress: Optional[SearchProgress] = None,
+) -> Dict:
     """
     Run Stockfish analysis on a position.
 
@@ -160,9 +415,13 @@ def _analyze_with_stockfish(fen: str, depth: int = 20, time_limit: float = 0.5)
         fen: FEN string
         depth: Search depth (default 20)
         time_limit: Time in seconds to search (default 0.5)
+        lease: Scheduler lease; a stop request on it (e.g. preemption) ends the search early
+        convergence: Early-stop policy; the search ends once its result has converged
+        progress: Receives each completed iteration while the search runs
 
     Returns:
         Dict with: best_move, score_cp, score_mate, depth, pv
+        (plus stopped_early, search_time_ms, time_saved_ms when a convergence policy is set)
     """
     try:
         chess.Board(fen)
@@ -171,12 +430,14 @@ def _analyze_with_stockfish(fen: str, depth: int = 20, time_limit: float = 0.5)
         logger.info(f"Starting Stockfish analysis: depth={depth}, time={time_limit}s")
 
         try:
-            return _analyze_with_simple_engine(fen, depth, time_limit, stockfish_path)
+            return _analyze_with_simple_engine(fen, depth, time_limit, stockfish_path, lease, convergence, progress)
         except NotImplementedError:
             logger.warning(
                 "python-chess engine launch is not supported in this runtime; falling back to direct UCI session"
             )
-            return _analyze_with_stockfish_session(fen, depth, time_limit, stockfish_path)
+            return _analyze_with_stockfish_session(
+                fen, depth, time_limit, stockfish_path, lease, convergence, progress
+            )
     except Exception as e:
         logger.error(f"Stockfish analysis failed for FEN '{fen}': {e}", exc_info=True)
         return {}
@@ -186,7 +447,12 @@ async def analyze_position(
     fen: str,
     depth: int = 20,
     time_limit: float = 0.5,
-    force_recompute: bool = False
+    force_recompute: bool = False,
+    priority: EnginePriority = EnginePriority.REST,
+    board: Optional[chess.Board] = None,
+    game_session: Optional[GameAnalysisSession] = None,
+    convergence: Optional[ConvergencePolicy] = None,
+    deadline_ms: Optional[int] = None,
 ) -> Dict:
     """
     Analyze a single chess position with caching.
@@ -202,9 +468,18 @@ async def analyze_position(
         depth: Search depth (default 20)
         time_limit: Time limit in seconds (default 0.5)
         force_recompute: If True, skip cache and always run Stockfish
+        priority: Engine scheduler class (REST by default, BATCH for whole-game runs)
+        board: Board for `fen` carrying its move history (used with game_session)
+        game_session: Shared engine for sequential plies of one game
+        convergence: Early-stop policy (see search_convergence); None searches the full limit
+        deadline_ms: Answer within this budget; on a cache miss that outlasts it, return the
+            deepest completed iteration (partial=True) while the search finishes and is cached
 
     Returns:
         Dict with: fen, best_move, score_cp, score_mate, depth, pv, cached
+        (plus preempted=True when a higher-priority request cut a batch search short, and
+        stopped_early / search_time_ms / time_saved_ms for searches run with a convergence policy;
+        shared_search=True when the answer came from another caller's in-flight search)
     """
 
     logger.info(f"Analyzing FEN (depth={depth}, time={time_limit}s, force={force_recompute})")
@@ -228,8 +503,9 @@ async def analyze_position(
             if cached_eval:
                 cached_depth = cached_eval.get('depth', 0)
 
-                # Only use cache if it's at least as deep as requested
-                if cached_depth >= depth:
+                # Only use cache if it's at least as deep as requested, or is what a search with
+                # these limits already produced (it stopped early on convergence / its time cap)
+                if stored_result_covers(cached_eval, depth, time_limit, early_stop=convergence is not None):
                     logger.info(f"Cache hit for FEN at depth {cached_depth} (requested {depth})")
                     return {
                         "fen": fen,
@@ -243,14 +519,100 @@ async def analyze_position(
                 else:
                     # Cached is shallower than requested, need deeper analysis
                     logger.info(f"Cache found but too shallow: cached_depth={cached_depth} < requested_depth={depth}, will analyze deeper")
-                    cached_eval = None  # Don't use shallow cache
+                    # Don't use shallow cache, except as a last-resort answer at a deadline
         except Exception as e:
             logger.error(f"Error checking cache: {e}")
             logger.warning(f"Error checking cache: {e}")
+            cached_eval = None
 
-    # Cache miss or DB disabled: run Stockfish
+    # Cache miss or DB disabled: run Stockfish, or join a search of this position already in flight
     logger.info(f"Cache miss or DB disabled, running Stockfish analysis...")
-    eval_result = await asyncio.to_thread(_analyze_with_stockfish, fen, depth, time_limit)
+
+    def start(progress: SearchProgress):
+        return _compute_and_store(fen, depth, time_limit, priority, board, game_session, convergence, progress)
+
+    search = inflight_searches.run(
+        fen,
+        depth,
+        1,
+        start,
+        time_limit=time_limit,
+        early_stop=convergence is not None,
+        source=priority.name.lower(),
+    )
+    if deadline_ms is None:
+        return _search_response(fen, await search)
+
+    search = asyncio.create_task(search)
+    _background_searches.add(search)
+    search.add_done_callback(_background_searches.discard)
+    try:
+        return _search_response(fen, await asyncio.wait_for(asyncio.shield(search), max(0, deadline_ms) / 1000))
+    except (asyncio.TimeoutError, TimeoutError):
+        candidates = [candidate for candidate in (inflight_searches.completed(fen), cached_eval) if candidate]
+        best_so_far = max(candidates, key=lambda candidate: int(candidate.get("depth") or 0), default=None)
+        return _deadline_result(fen, depth, best_so_far)
+
+
+def _search_response(fen: str, result: Dict) -> Dict:
+    """`/analyze` shape for a result that came from another caller's in-flight search."""
+    if not result.get("shared"):
+        return result
+    return {
+        "fen": fen,
+        "best_move": result.get("best_move"),
+        "score_cp": result.get("score_cp"),
+        "score_mate": result.get("score_mate"),
+        "depth": result.get("depth"),
+        "pv": result.get("pv"),
+        "cached": False,
+        "shared_search": True,
+    }
+
+
+def _deadline_result(fen: str, requested_depth: int, best_so_far: Optional[Dict]) -> Dict:
+    """Anytime answer at a deadline: the deepest completed iteration (or a shallower cached eval)."""
+    best_so_far = best_so_far or {}
+    logger.info(
+        "Deadline reached for FEN %s...; returning depth %s while the search continues to depth %s",
+        fen[:40],
+        best_so_far.get("depth"),
+        requested_depth,
+    )
+    return {
+        "fen": fen,
+        "best_move": best_so_far.get("best_move"),
+        "score_cp": best_so_far.get("score_cp"),
+        "score_mate": best_so_far.get("score_mate"),
+        "depth": best_so_far.get("depth") or 0,
+        "pv": best_so_far.get("pv"),
+        "cached": False,
+        "partial": True,
+        "requested_depth": requested_depth,
+        "background_search": True,
+    }
+
+
+async def _compute_and_store(
+    fen: str,
+    depth: int,
+    time_limit: float,
+    priority: EnginePriority,
+    board: Optional[chess.Board],
+    game_session: Optional[GameAnalysisSession],
+    convergence: Optional[ConvergencePolicy],
+    progress: Optional[SearchProgress] = None,
+) -> Dict:
+    async with engine_scheduler.lease(priority, label=fen) as lease:
+        if game_session is not None:
+            eval_result = await engine_scheduler.run_in_thread(
+                lease, game_session.analyze, board or chess.Board(fen), depth, time_limit, lease, convergence, progress
+            )
+        else:
+            eval_result = await engine_scheduler.run_in_thread(
+                lease, _analyze_with_stockfish, fen, depth, time_limit, lease, convergence, progress
+            )
+        preempted = lease.preempted
 
     if not eval_result:
         logger.warning(f"Stockfish returned empty result for FEN: {fen[:40]}...")
@@ -266,19 +628,28 @@ async def analyze_position(
     if DB_ENABLED:
         try:
             logger.info(f"Storing evaluation to DB...")
+            limits = {}
+            if int(eval_result.get("depth") or 0) < depth and not preempted:
+                # Ended short of the requested depth on its own: remember the limits it ran with.
+                limits = {
+                    "target_depth": depth,
+                    "target_time": time_limit or None,
+                    "stopped_early": bool(eval_result.get("stopped_early")),
+                }
             await upsert_eval(
                 fen=fen,
                 best_move=eval_result.get("best_move"),
                 score_cp=eval_result.get("score_cp"),
                 score_mate=eval_result.get("score_mate"),
                 depth=eval_result.get("depth"),
-                pv=eval_result.get("pv")
+                pv=eval_result.get("pv"),
+                **limits,
             )
             logger.info("[OK] Stored evaluation in DB for FEN: %s...", fen[:40])
         except Exception as e:
             logger.error(f"Error storing evaluation in DB: {e}", exc_info=True)
 
-    return {
+    result = {
         "fen": fen,
         "best_move": eval_result.get("best_move"),
         "score_cp": eval_result.get("score_cp"),
@@ -287,3 +658,9 @@ async def analyze_position(
         "pv": eval_result.get("pv"),
         "cached": False
     }
+    if preempted:
+        result["preempted"] = True
+    for key in ("stopped_early", "search_time_ms", "time_saved_ms"):
+        if key in eval_result:
+            result[key] = eval_result[key]
+    return result
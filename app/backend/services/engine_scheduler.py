@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+Engine Scheduler: central owner of Stockfish capacity
+
+Every workload that launches an engine (live websocket jobs, `/analyze`,
+quiz evaluation, batch game analysis, background deepening) acquires a lease
+here first. Waiters are served by priority class, then FIFO, and a waiting
+higher-priority request asks the lowest-priority preemptible search to stop.
+Blocking engine calls go through `run_in_thread`, so a cancelled request (e.g.
+a client that disconnected) stops its engine and frees its slot at once.
+The live time slicer's shared engine, which only runs once every slot is taken,
+gets its lease through `acquire_overflow`: granted at once, but counted like any
+other, so the next slot to free up pays it back instead of going to a waiter.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, AsyncIterator, Callable
+
+from app.backend.config import ENGINE_MAX_CONCURRENCY
+from app.backend.logs.logger import logger
+
+
+class EnginePriority(IntEnum):
+    """Lower value wins. Batch and background searches can be preempted."""
+
+    LIVE = 0
+    REST = 1
+    QUIZ = 2
+    BATCH = 3
+    BACKGROUND = 4
+
+
+PREEMPTIBLE_PRIORITIES = frozenset({EnginePriority.BATCH, EnginePriority.BACKGROUND})
+
+
+@dataclass
+class EngineClassMetrics:
+    acquired: int = 0
+    waiting: int = 0
+    active: int = 0
+    preempted: int = 0
+    cancelled: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    cancelled_seconds: float = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        average_wait = self.total_wait_seconds / self.acquired if self.acquired else 0.0
+        return {
+            "acquired": self.acquired,
+            "waiting": self.waiting,
+            "active": self.active,
+            "preempted": self.preempted,
+            "cancelled": self.cancelled,
+            "cancelled_seconds": round(self.cancelled_seconds, 3),
+            "avg_wait_ms": round(average_wait * 1000, 2),
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 2),
+            "total_wait_seconds": round(self.total_wait_seconds, 3),
+        }
+
+
+@dataclass(eq=False)
+class EngineLease:
+    priority: EnginePriority
+    label: str = ""
+    acquired_at: float = 0.0
+    preempted: bool = False
+    cancelled: bool = False
+    stop_event: threading.Event = field(default_factory=threading.Event)
+    _stop_callbacks: list[Callable[[], Any]] = field(default_factory=list, repr=False)
+    _callbacks_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def preemptible(self) -> bool:
+        return self.priority in PREEMPTIBLE_PRIORITIES
+
+    @property
+    def stop_requested(self) -> bool:
+        return self.stop_event.is_set()
+
+    def add_stop_callback(self, callback: Callable[[], Any]) -> None:
+        """Register a hook (e.g. sending `stop` to the engine); runs at once if already stopped."""
+        with self._callbacks_lock:
+            if not self.stop_event.is_set():
+                self._stop_callbacks.append(callback)
+                return
+        self._run_callback(callback)
+
+    def remove_stop_callback(self, callback: Callable[[], Any]) -> None:
+        with self._callbacks_lock:
+            if callback in self._stop_callbacks:
+                self._stop_callbacks.remove(callback)
+
+    def request_stop(self) -> None:
+        with self._callbacks_lock:
+            if self.stop_event.is_set():
+                return
+            self.stop_event.set()
+            callbacks = list(self._stop_callbacks)
+            self._stop_callbacks.clear()
+
+        for callback in callbacks:
+            self._run_callback(callback)
+
+    def _run_callback(self, callback: Callable[[], Any]) -> None:
+        try:
+            callback()
+        except Exception as exc:
+            logger.warning("Engine lease stop callback failed for %s: %s", self.label, exc)
+
+
+class EngineScheduler:
+    def __init__(self, max_concurrency: int = ENGINE_MAX_CONCURRENCY) -> None:
+        self._max_concurrency = max(1, int(max_concurrency))
+        self._active: set[EngineLease] = set()
+        self._waiters: list[tuple[int, int, asyncio.Future[None], EngineLease]] = []
+        self._sequence = itertools.count()
+        self._metrics = {priority: EngineClassMetrics() for priority in EnginePriority}
+
+    @property
+    def max_concurrency(self) -> int:
+        return self._max_concurrency
+
+    def has_capacity(self) -> bool:
+        return len(self._active) < self._max_concurrency and not self._waiters
+
+    @asynccontextmanager
+    async def lease(self, priority: EnginePriority, label: str = "") -> AsyncIterator[EngineLease]:
+        lease = await self.acquire(priority, label)
+        try:
+            yield lease
+        finally:
+            self.release(lease)
+
+    async def acquire(self, priority: EnginePriority, label: str = "") -> EngineLease:
+        priority = EnginePriority(priority)
+        lease = EngineLease(priority=priority, label=label)
+        metrics = self._metrics[priority]
+        enqueued_at = time.monotonic()
+
+        if self.has_capacity():
+            self._grant(lease, enqueued_at)
+            return lease
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._sequence), future, lease))
+        metrics.waiting += 1
+        self._preempt_for(priority)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            metrics.waiting -= 1
+            if future.done() and not future.cancelled():
+                # Granted just before the waiter was cancelled: hand the slot back.
+                self.release(lease)
+            else:
+                self._discard_waiter(future)
+            raise
+
+        metrics.waiting -= 1
+        self._record_wait(lease, enqueued_at)
+        return lease
+
+    def acquire_overflow(self, priority: EnginePriority, label: str = "") -> EngineLease | None:
+        """Grant a lease now even if every slot is taken (at most one over capacity); None if that one is out."""
+        if len(self._active) > self._max_concurrency:
+            return None
+        lease = EngineLease(priority=EnginePriority(priority), label=label)
+        self._grant(lease, time.monotonic())
+        return lease
+
+    async def run_in_thread(self, lease: EngineLease, func: Callable[..., Any], *args: Any) -> Any:
+        """Run blocking engine work under `lease`; if the caller is cancelled, stop the engine and free the slot."""
+        try:
+            return await asyncio.to_thread(func, *args)
+        except asyncio.CancelledError:
+            self.cancel(lease)
+            raise
+
+    def cancel(self, lease: EngineLease) -> None:
+        """Abandon a search whose requester went away; its engine time so far is counted as cancelled."""
+        if lease.cancelled or lease not in self._active:
+            return
+
+        lease.cancelled = True
+        metrics = self._metrics[lease.priority]
+        metrics.cancelled += 1
+        metrics.cancelled_seconds += max(0.0, time.monotonic() - lease.acquired_at)
+        logger.info("Cancelling %s engine search %s", lease.priority.name.lower(), lease.label)
+        lease.request_stop()
+        self.release(lease)
+
+    def release(self, lease: EngineLease) -> None:
+        if lease not in self._active:
+            return
+
+        self._active.discard(lease)
+        self._metrics[lease.priority].active -= 1
+        self._grant_waiters()
+
+    def set_priority(self, lease: EngineLease, priority: EnginePriority) -> None:
+        """Move an active lease to another class, e.g. live search turning into background deepening."""
+        priority = EnginePriority(priority)
+        if lease.priority == priority:
+            return
+
+        if lease in self._active:
+            self._metrics[lease.priority].active -= 1
+            self._metrics[priority].active += 1
+        lease.priority = priority
+
+        if self._waiters:
+            self._preempt_for(EnginePriority(self._waiters[0][0]))
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "max_concurrency": self._max_concurrency,
+            "active": len(self._active),
+            "waiting": len(self._waiters),
+            "classes": {priority.name.lower(): self._metrics[priority].as_dict() for priority in EnginePriority},
+        }
+
+    def _grant(self, lease: EngineLease, enqueued_at: float) -> None:
+        self._active.add(lease)
+        self._metrics[lease.priority].active += 1
+        self._record_wait(lease, enqueued_at)
+
+    def _record_wait(self, lease: EngineLease, enqueued_at: float) -> None:
+        now = time.monotonic()
+        waited = now - enqueued_at
+        metrics = self._metrics[lease.priority]
+        metrics.acquired += 1
+        metrics.total_wait_seconds += waited
+        metrics.max_wait_seconds = max(metrics.max_wait_seconds, waited)
+        lease.acquired_at = now
+
+    def _grant_waiters(self) -> None:
+        while self._waiters and len(self._active) < self._max_concurrency:
+            _, _, future, lease = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._active.add(lease)
+            self._metrics[lease.priority].active += 1
+            future.set_result(None)
+
+    def _discard_waiter(self, future: asyncio.Future[None]) -> None:
+        self._waiters = [entry for entry in self._waiters if entry[2] is not future]
+        heapq.heapify(self._waiters)
+
+    def _preempt_for(self, priority: EnginePriority) -> None:
+        if len(self._active) < self._max_concurrency:
+            return
+
+        stopping = sum(1 for lease in self._active if lease.stop_requested)
+        higher_waiters = sum(1 for entry in self._waiters if entry[0] <= int(priority))
+        if stopping >= higher_waiters:
+            return
+
+        candidates = [
+            lease
+            for lease in self._active
+            if lease.preemptible and lease.priority > priority and not lease.stop_requested
+        ]
+        if not candidates:
+            return
+
+        victim = max(candidates, key=lambda lease: (lease.priority, -lease.acquired_at))
+        victim.preempted = True
+        self._metrics[victim.priority].preempted += 1
+        logger.info(
+            "Preempting %s engine search %s for waiting %s request",
+            victim.priority.name.lower(),
+            victim.label,
+            priority.name.lower(),
+        )
+        victim.request_stop()
+
+
+engine_scheduler = EngineScheduler()
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Engine Time Slicer: several live positions multiplexed onto one engine
+
+When every scheduler slot is busy, new live positions join a round-robin
+rotation on a single shared engine instead of waiting for a slot. Each slice
+switches positions with stop + position + go and never sends `ucinewgame`, so
+the engine keeps one hash table and a resumed position quickly climbs back to
+the depth it reached in its previous slice.
+
+Rotation only starts when every slot is taken, so the shared engine takes an
+overflow lease (see EngineScheduler.acquire_overflow) rather than queueing behind
+the searches it is meant to avoid waiting for; the next slot to free up pays it
+back. Whenever a slot is free at a slice boundary, the next position in the
+rotation is handed a lease of its own and leaves for a dedicated engine.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from app.backend.logs.logger import logger
+from app.backend.runtime import get_stockfish_path
+from app.backend.services.engine_scheduler import EngineLease, EnginePriority, engine_scheduler
+from app.engine.stockfish_session import AsyncStockfishSession
+
+LineHandler = Callable[[str], Awaitable[bool]]
+
+
+@dataclass(eq=False)
+class SlicedPosition:
+    fen: str
+    position_command: str
+    on_line: LineHandler
+    done: asyncio.Future[EngineLease | None]
+    slices: int = 0
+    # Info lines since the last `go`; a search that ends without any is not restarted.
+    lines_since_go: int = 0
+
+
+class EngineTimeSlicer:
+    def __init__(
+        self,
+        slice_seconds: float,
+        multipv: int,
+        session_factory: Callable[[], AsyncStockfishSession] | None = None,
+    ) -> None:
+        self._slice_seconds = max(0.0, float(slice_seconds))
+        self._multipv = multipv
+        self._session_factory = session_factory or (lambda: AsyncStockfishSession.open(get_stockfish_path()))
+        self._rotation: deque[SlicedPosition] = deque()
+        self._runner: asyncio.Task[None] | None = None
+        self._current: SlicedPosition | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._slice_seconds > 0
+
+    def positions(self) -> list[str]:
+        return [position.fen for position in self._rotation]
+
+    async def analyze(self, fen: str, on_line: LineHandler, position_command: str | None = None) -> EngineLease | None:
+        """
+        Join the rotation until `on_line` reports the position finished (returns True): None then.
+        If a scheduler slot frees up first, returns the lease the caller continues on instead.
+        """
+        position = SlicedPosition(
+            fen=fen,
+            position_command=position_command or f"position fen {fen}",
+            on_line=on_line,
+            done=asyncio.get_running_loop().create_future(),
+        )
+        self._rotation.append(position)
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+        try:
+            return await position.done
+        except asyncio.CancelledError:
+            if position.done.done() and not position.done.cancelled() and position.done.exception() is None:
+                # Handed a lease just before the caller went away: give the slot back.
+                if position.done.result() is not None:
+                    engine_scheduler.release(position.done.result())
+            raise
+        finally:
+            self._leave(position)
+
+    async def shutdown(self) -> None:
+        runner = self._runner
+        for position in list(self._rotation):
+            self._leave(position)
+            if not position.done.done():
+                position.done.cancel()
+        if runner and not runner.done():
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+
+    def _leave(self, position: SlicedPosition) -> None:
+        if position in self._rotation:
+            self._rotation.remove(position)
+
+    async def _hand_off(self) -> None:
+        """While slots are free, move the next waiting position onto a lease of its own."""
+        while len(self._rotation) > 1 and engine_scheduler.has_capacity():
+            position = self._rotation[0]
+            self._leave(position)
+            if position.done.done():
+                continue
+            lease = await engine_scheduler.acquire(EnginePriority.LIVE, label=position.fen)
+            position.done.set_result(lease)
+            if self._current is position:
+                self._current = None
+
+    async def _run(self) -> None:
+        session: AsyncStockfishSession | None = None
+        lease = engine_scheduler.acquire_overflow(EnginePriority.LIVE, label="time-sliced live analysis")
+        try:
+            if lease is None:
+                lease = await engine_scheduler.acquire(EnginePriority.LIVE, label="time-sliced live analysis")
+            session = self._session_factory()
+            await session.start({"UCI_AnalyseMode": "true", "MultiPV": self._multipv})
+            while self._rotation:
+                await self._hand_off()
+                position = self._rotation[0]
+                self._rotation.rotate(-1)
+                await self._run_slice(session, position)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.error("Time-sliced engine failed: %s", exc, exc_info=True)
+            for position in list(self._rotation):
+                self._leave(position)
+                if not position.done.done():
+                    position.done.set_exception(exc)
+        finally:
+            self._current = None
+            if session is not None:
+                await session.close()
+            if lease is not None:
+                engine_scheduler.release(lease)
+            if self._rotation and self._runner is asyncio.current_task():
+                # A position joined while the engine was shutting down.
+                self._runner = asyncio.create_task(self._run())
+
+    async def _run_slice(self, session: AsyncStockfishSession, position: SlicedPosition) -> None:
+        loop = asyncio.get_running_loop()
+        if not (session.searching and self._current is position):
+            await session.go(position.position_command)
+            position.lines_since_go = 0
+        self._current = position
+        position.slices += 1
+        deadline = loop.time() + self._slice_seconds
+
+        while position in self._rotation:
+            contended = len(self._rotation) > 1
+            remaining = deadline - loop.time()
+            if contended and remaining <= 0:
+                return
+
+            try:
+                line = await session.readline(timeout=remaining if contended else self._slice_seconds)
+            except (asyncio.TimeoutError, TimeoutError):
+                continue
+
+            if line is None:
+                raise RuntimeError("Stockfish exited during time-sliced analysis")
+            if line.startswith("bestmove"):
+                # `go infinite` only ends by itself with nothing left to search: `bestmove (none)` on
+                # mate / stalemate, or no progress since the last `go`. Restarting would just spin.
+                if "(none)" in line or not position.lines_since_go:
+                    self._finish(position)
+                    return
+                await session.go(position.position_command)
+                position.lines_since_go = 0
+                continue
+            if not line.startswith("info"):
+                continue
+            position.lines_since_go += 1
+
+            try:
+                finished = await position.on_line(line)
+            except Exception as exc:
+                self._leave(position)
+                if not position.done.done():
+                    position.done.set_exception(exc)
+                return
+
+            if finished:
+                self._finish(position)
+                await session.stop()
+                return
+
+    def _finish(self, position: SlicedPosition) -> None:
+        self._leave(position)
+        if not position.done.done():
+            position.done.set_result(None)
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Game Accuracy: centipawn loss, win-probability accuracy and move classes
+
+Works on the per-ply eval arrays served by the eval graph (White-POV scores,
+ply 0 = start position); the side to move is read from each row's FEN, so games
+set up with Black to move are scored for the right player. Every game in a batch
+is flattened into one set of NumPy arrays, so a thousand games cost a handful of
+vector operations rather than a Python loop per move. Results are stored per game in `game_accuracy`;
+evals landing deeper on any of a game's positions queue that position, the bulk
+run marks the games through queued positions stale in batches, and the next
+read (or bulk run) recomputes just those games. Every classified move
+stores its NAG on the move row, and blunders and mistakes tag the position
+before them as critical (`cp_tag`) so they show up in the quiz.
+"""
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+import numpy as np
+
+from app.backend.logs.logger import logger
+
+try:
+    from app.backend.db.db import (
+        get_games_evals,
+        get_stale_accuracy_game_ids,
+        mark_stale_accuracy_games,
+        save_game_accuracy,
+    )
+except Exception:  # pragma: no cover - DB layer is optional in some environments
+    async def get_games_evals(game_ids):
+        return {}
+
+    async def mark_stale_accuracy_games(batch_size=1000):
+        return 0
+
+    async def get_stale_accuracy_game_ids(limit):
+        return []
+
+    async def save_game_accuracy(results):
+        return 0
+
+# Evaluations are capped here before losses are taken; mate scores count as the cap.
+EVAL_CAP_CP = 1000
+# Win% = 50 + 50 * (2 / (1 + exp(-k * cp)) - 1) and move accuracy from the mover's win% drop.
+WIN_PROBABILITY_K = 0.00368208
+ACCURACY_SCALE = 103.1668
+ACCURACY_DECAY = 0.04354
+ACCURACY_OFFSET = 3.1669
+# Win% drop (mover's point of view) at which a move becomes an inaccuracy / mistake / blunder.
+INACCURACY_DROP = 5.0
+MISTAKE_DROP = 10.0
+BLUNDER_DROP = 15.0
+
+CLASSIFICATIONS = (None, "inaccuracy", "mistake", "blunder")
+CLASSIFICATION_NAGS = {"inaccuracy": 6, "mistake": 2, "blunder": 4}
+CLASSIFICATION_TOTALS = {"inaccuracy": "inaccuracies", "mistake": "mistakes", "blunder": "blunders"}
+CRITICAL_CLASSIFICATIONS = frozenset({"mistake", "blunder"})
+# Phase of the position a move is played from: endgame once both sides' non-pawn material
+# (N/B 3, R 5, Q 9) sums to at most ENDGAME_MATERIAL, otherwise opening for the first plies.
+PHASES = ("opening", "middlegame", "endgame")
+OPENING_PLIES = 24
+ENDGAME_MATERIAL = 26
+_PIECE_VALUES = {"n": 3, "b": 3, "r": 5, "q": 9}
+DEFAULT_BULK_BATCH_SIZE = 500
+
+
+def white_to_move(rows: list[dict[str, Any]], plies: np.ndarray) -> np.ndarray:
+    """Whether White is to move in every row's position (ply parity when a row has no FEN)."""
+    return np.array([
+        fen.split()[1] == "w" if (fen := row.get("fen")) and len(fen.split()) > 1 else ply % 2 == 0
+        for row, ply in zip(rows, plies.tolist())
+    ], dtype=bool)
+
+
+def white_pov_cp(white_moves: np.ndarray, cp: np.ndarray, mate: np.ndarray) -> np.ndarray:
+    """Capped White-POV centipawns per ply (NaN where no eval is stored)."""
+    mated_side_sign = np.where(white_moves, -1.0, 1.0)  # mate 0: side to move is mated
+    mate_cp = np.where(mate == 0, mated_side_sign, np.sign(mate)) * EVAL_CAP_CP
+    return np.clip(np.where(np.isnan(mate), cp, mate_cp), -EVAL_CAP_CP, EVAL_CAP_CP)
+
+
+def win_percent(cp: np.ndarray) -> np.ndarray:
+    return 50 + 50 * (2 / (1 + np.exp(-WIN_PROBABILITY_K * cp)) - 1)
+
+
+def _non_pawn_material(fen: str | None) -> int:
+    if not fen:
+        return 62  # unknown position: count as full material
+    placement = fen.split(" ", 1)[0].lower()
+    return sum(value * placement.count(piece) for piece, value in _PIECE_VALUES.items())
+
+
+def phase_codes(rows: list[dict[str, Any]], plies: np.ndarray) -> np.ndarray:
+    """Index into PHASES for every row's position."""
+    material = np.array([_non_pawn_material(row.get("fen")) for row in rows])
+    return np.where(material <= ENDGAME_MATERIAL, 2, np.where(plies <= OPENING_PLIES, 0, 1))
+
+
+def _column(rows: Iterable[dict[str, Any]], key: str) -> list[float]:
+    return [np.nan if row.get(key) is None else row[key] for row in rows]
+
+
+def compute_games_accuracy(evals_by_game: dict[int, list[dict[str, Any]]]) -> dict[int, dict[str, Any]]:
+    """
+    Accuracy report for every game in `evals_by_game` ({game_id: eval-graph rows sorted by ply}).
+
+    Moves whose position before or after has no eval are left unclassified and
+    excluded from the per-side averages.
+    """
+    game_ids = [game_id for game_id, rows in evals_by_game.items() if rows]
+    if not game_ids:
+        return {}
+
+    rows = [row for game_id in game_ids for row in evals_by_game[game_id]]
+    lengths = np.array([len(evals_by_game[game_id]) for game_id in game_ids])
+    game_index = np.repeat(np.arange(len(game_ids)), lengths)
+    plies = np.array([row["ply"] for row in rows], dtype=np.int64)
+    depth = np.array(_column(rows, "depth"), dtype=float)
+    white_moves = white_to_move(rows, plies)
+    evals = white_pov_cp(white_moves, np.array(_column(rows, "score_cp"), dtype=float), np.array(_column(rows, "score_mate"), dtype=float))
+
+    # A move is every element after the first of its game: position before = previous element.
+    is_move = np.ones(len(rows), dtype=bool)
+    is_move[np.cumsum(lengths) - lengths] = False
+    move_at = np.flatnonzero(is_move)
+    mover_sign = np.where(white_moves[move_at - 1], 1.0, -1.0)
+    phases = phase_codes(rows, plies)[move_at - 1]
+    before = evals[move_at - 1] * mover_sign
+    after = evals[move_at] * mover_sign
+    valid = ~(np.isnan(before) | np.isnan(after))
+
+    cpl = np.maximum(0.0, before - after)
+    win_drop = np.maximum(0.0, win_percent(before) - win_percent(after))
+    accuracy = np.clip(ACCURACY_SCALE * np.exp(-ACCURACY_DECAY * win_drop) - ACCURACY_OFFSET, 0.0, 100.0)
+    classes = np.where(valid, 0, -1)
+    classes[valid] = np.searchsorted([INACCURACY_DROP, MISTAKE_DROP, BLUNDER_DROP], win_drop[valid], side="right")
+
+    # Per-side totals: group = game * 2 + (0 white, 1 black).
+    groups = game_index[move_at] * 2 + (mover_sign < 0)
+    group_count = len(game_ids) * 2
+    counted = np.bincount(groups[valid], minlength=group_count)
+    totals = {
+        "cpl": np.bincount(groups[valid], weights=cpl[valid], minlength=group_count),
+        "accuracy": np.bincount(groups[valid], weights=accuracy[valid], minlength=group_count),
+    }
+    class_counts = {
+        name: np.bincount(groups, weights=classes == code, minlength=group_count)
+        for code, name in enumerate(CLASSIFICATIONS) if name
+    }
+
+    move_bounds = np.cumsum(lengths - 1)[:-1]
+    per_game_moves = zip(
+        np.split(plies[move_at], move_bounds),
+        np.split(np.where(valid, cpl, np.nan), move_bounds),
+        np.split(np.where(valid, accuracy, np.nan), move_bounds),
+        np.split(classes, move_bounds),
+        np.split(phases, move_bounds),
+        np.split(mover_sign > 0, move_bounds),
+    )
+    depth_totals = np.bincount(game_index, weights=np.nan_to_num(depth), minlength=len(game_ids))
+    evaluated = np.bincount(game_index, weights=~np.isnan(depth), minlength=len(game_ids))
+
+    results: dict[int, dict[str, Any]] = {}
+    for index, (game_id, (move_plies, move_cpl, move_accuracy, move_classes, move_phases, move_white)) in enumerate(
+        zip(game_ids, per_game_moves)
+    ):
+        sides = {}
+        for offset, side in enumerate(("white", "black")):
+            group = index * 2 + offset
+            moves = int(counted[group])
+            sides[side] = {
+                "moves": moves,
+                "acpl": round(float(totals["cpl"][group] / moves), 1) if moves else None,
+                "accuracy": round(float(totals["accuracy"][group] / moves), 1) if moves else None,
+                **{CLASSIFICATION_TOTALS[name]: int(counts[group]) for name, counts in class_counts.items()},
+            }
+        results[game_id] = {
+            "game_id": game_id,
+            **sides,
+            "plies": int(lengths[index]),
+            "evaluated_plies": int(evaluated[index]),
+            "eval_depth_total": int(depth_totals[index]),
+            "moves": [
+                _move_entry(ply, "white" if white else "black", loss, move_score, code, PHASES[phase])
+                for ply, white, loss, move_score, code, phase in zip(
+                    move_plies.tolist(),
+                    move_white.tolist(),
+                    move_cpl.tolist(),
+                    move_accuracy.tolist(),
+                    move_classes.tolist(),
+                    move_phases.tolist(),
+                )
+            ],
+        }
+    return results
+
+
+def _move_entry(ply: int, side: str, cpl: float, accuracy: float, code: int, phase: str) -> dict[str, Any]:
+    if code < 0:
+        return {
+            "ply": ply, "side": side, "phase": phase, "cpl": None, "accuracy": None, "classification": None, "nag": None,
+        }
+    classification = CLASSIFICATIONS[code]
+    return {
+        "ply": ply,
+        "side": side,
+        "phase": phase,
+        "cpl": int(round(cpl)),
+        "accuracy": round(accuracy, 1),
+        "classification": classification,
+        "nag": CLASSIFICATION_NAGS.get(classification),
+    }
+
+
+def critical_plies(result: dict[str, Any]) -> list[int]:
+    """Plies to tag `cp_tag`: the position before each blunder or mistake (quiz asks for the better move)."""
+    return [
+        move["ply"] - 1
+        for move in result["moves"]
+        if move["classification"] in CRITICAL_CLASSIFICATIONS and move["ply"] >= 2
+    ]
+
+
+async def refresh_games_accuracy(game_ids: list[int]) -> dict[int, dict[str, Any]]:
+    """Recompute and store accuracy for `game_ids` from one eval query and one vectorized pass."""
+    if not game_ids:
+        return {}
+    results = compute_games_accuracy(await get_games_evals(game_ids))
+    await save_game_accuracy([{**result, "critical_plies": critical_plies(result)} for result in results.values()])
+    return results
+
+
+async def refresh_stale_accuracy(batch_size: int = DEFAULT_BULK_BATCH_SIZE) -> int:
+    """Recompute every game without a current accuracy row, `batch_size` games at a time."""
+    while await mark_stale_accuracy_games(batch_size):
+        pass
+    refreshed = 0
+    while True:
+        game_ids = await get_stale_accuracy_game_ids(batch_size)
+        if not game_ids:
+            break
+        results = await refresh_games_accuracy(game_ids)
+        refreshed += len(results)
+        if len(results) < len(game_ids):
+            # Games without moves never get a row; stop rather than revisit them forever.
+            break
+    logger.info("Recomputed accuracy for %s games", refreshed)
+    return refreshed
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+In-flight Searches: one engine per position, shared by every caller
+
+`/analyze`, quiz evaluation and live websocket jobs register the searches they
+start here, keyed by canonical position (EPD), target depth / time limit and
+MultiPV. A caller asking for a position that is already being searched with
+limits covering its own attaches to that search instead of launching a second
+engine: it gets the search's result, or returns early with an intermediate
+snapshot once the search has completed an iteration at its requested depth.
+A search started through the registry is cancelled (stopping its engine) only
+when every attached caller has gone away. Callers that need particular root
+moves scored (quiz partial credit) hand them to the search they attach to, so
+its owner can score them in the same engine session before it finishes.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Sequence
+
+import chess
+
+from app.backend.logs.logger import logger
+
+SNAPSHOT_POLL_SECONDS = 0.05
+
+
+class SearchProgress:
+    """
+    Deepest completed iteration of a running search.
+
+    Written from the engine thread (or the live job loop) and read by callers
+    waiting on the search; an iteration counts as completed once the next depth
+    starts or the search ends.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._current: dict[str, Any] | None = None
+        self._completed: dict[str, Any] | None = None
+        self._requested_moves: dict[str, None] = {}
+
+    def observe(self, result: dict[str, Any]) -> None:
+        with self._lock:
+            if self._current is not None and int(result.get("depth") or 0) > int(self._current.get("depth") or 0):
+                self._completed = self._current
+            self._current = dict(result)
+
+    def finish(self, result: dict[str, Any]) -> None:
+        with self._lock:
+            self._current = None
+            self._completed = dict(result)
+
+    def completed(self) -> dict[str, Any] | None:
+        with self._lock:
+            return dict(self._completed) if self._completed else None
+
+    def request_moves(self, moves: Sequence[str]) -> None:
+        """Ask the search's owner to score these root moves (UCI) too; owners that cannot simply ignore it."""
+        with self._lock:
+            self._requested_moves.update(dict.fromkeys(moves))
+
+    def requested_moves(self) -> list[str]:
+        with self._lock:
+            return list(self._requested_moves)
+
+
+def canonical_position(fen: str) -> str:
+    """EPD of `fen`: move clocks dropped and en passant only when capturable."""
+    try:
+        return chess.Board(fen).epd()
+    except ValueError:
+        return " ".join(fen.split()[:4])
+
+
+def _snapshot_covers(snapshot: dict[str, Any] | None, depth: int | None, multipv: int) -> bool:
+    if not snapshot:
+        return False
+    if depth is not None and int(snapshot.get("depth") or 0) < depth:
+        return False
+    return multipv <= 1 or len(snapshot.get("lines") or ()) >= multipv
+
+
+def _limits_cover(
+    limit_time: float | None, limit_early_stop: bool, time_limit: float | None, early_stop: bool
+) -> bool:
+    """A search with these limits answers a caller's: no earlier stop, and no shorter time budget."""
+    if limit_early_stop and not early_stop:
+        return False
+    return limit_time is None or (time_limit is not None and limit_time >= time_limit)
+
+
+def stored_result_covers(
+    result: dict[str, Any] | None, depth: int, time_limit: float | None = None, early_stop: bool = False
+) -> bool:
+    """
+    Whether a stored result (evals row or snapshot) answers a request: it reached `depth`, or it is
+    what a search with limits at least as generous as the request's produced (`target_depth`,
+    `target_time`, `stopped_early` as written by upsert_eval) and re-running would end the same way.
+    """
+    if not result:
+        return False
+    if int(result.get("depth") or 0) >= depth:
+        return True
+    if int(result.get("target_depth") or 0) < depth:
+        return False
+    return _limits_cover(result.get("target_time") or None, bool(result.get("stopped_early")), time_limit or None, early_stop)
+
+
+@dataclass(eq=False)
+class InFlightSearch:
+    position: str
+    depth: int
+    multipv: int
+    task: asyncio.Future[Any]
+    time_limit: float | None = None
+    early_stop: bool = False
+    progress: SearchProgress | None = None
+    source: str = ""
+    owned: bool = True
+    attached: int = 0
+
+    def covers(self, depth: int, multipv: int, time_limit: float | None, early_stop: bool) -> bool:
+        if self.task.done() or self.depth < depth or self.multipv < multipv:
+            return False
+        return _limits_cover(self.time_limit, self.early_stop, time_limit, early_stop)
+
+    def snapshot(self) -> dict[str, Any] | None:
+        return self.progress.completed() if self.progress is not None else None
+
+
+class InFlightSearches:
+    def __init__(self, poll_seconds: float = SNAPSHOT_POLL_SECONDS) -> None:
+        self._poll_seconds = max(0.001, float(poll_seconds))
+        self._searches: dict[str, list[InFlightSearch]] = {}
+        self._started = 0
+        self._attached = 0
+        self._snapshot_answers = 0
+
+    def register(
+        self,
+        fen: str,
+        depth: int,
+        multipv: int,
+        task: asyncio.Future[Any],
+        time_limit: float | None = None,
+        early_stop: bool = False,
+        progress: SearchProgress | None = None,
+        source: str = "",
+        owned: bool = True,
+    ) -> InFlightSearch:
+        """
+        Publish a running search. `owned=False` marks searches whose lifetime is
+        managed elsewhere (live jobs): the registry never cancels those.
+        """
+        search = InFlightSearch(
+            position=canonical_position(fen),
+            depth=int(depth),
+            multipv=max(1, int(multipv)),
+            task=task,
+            time_limit=time_limit or None,
+            early_stop=early_stop,
+            progress=progress,
+            source=source,
+            owned=owned,
+        )
+        self._searches.setdefault(search.position, []).append(search)
+        self._started += 1
+        task.add_done_callback(lambda _: self._discard(search))
+        return search
+
+    def find(
+        self,
+        fen: str,
+        depth: int,
+        multipv: int = 1,
+        time_limit: float | None = None,
+        early_stop: bool = False,
+    ) -> InFlightSearch | None:
+        """Shallowest running search of `fen` whose limits cover the request."""
+        candidates = [
+            search
+            for search in self._searches.get(canonical_position(fen), ())
+            if search.covers(depth, multipv, time_limit or None, early_stop)
+        ]
+        return min(candidates, key=lambda search: (search.depth, search.multipv), default=None)
+
+    def completed(self, fen: str, multipv: int = 1) -> dict[str, Any] | None:
+        """Deepest completed iteration across every running search of `fen`."""
+        snapshots = [
+            snapshot
+            for search in self._searches.get(canonical_position(fen), ())
+            if search.multipv >= multipv and _snapshot_covers(snapshot := search.snapshot(), None, multipv)
+        ]
+        return max(snapshots, key=lambda snapshot: int(snapshot.get("depth") or 0), default=None)
+
+    async def run(
+        self,
+        fen: str,
+        depth: int,
+        multipv: int,
+        start: Callable[[SearchProgress], Awaitable[dict[str, Any]]],
+        time_limit: float | None = None,
+        early_stop: bool = False,
+        source: str = "",
+        score_moves: Sequence[str] = (),
+    ) -> dict[str, Any]:
+        """
+        Result of searching `fen`: attached to a covering in-flight search when
+        there is one, otherwise from `start(progress)`, published for others to join.
+        Attached answers carry `shared=True`; `score_moves` are requested from the
+        search joined (see SearchProgress.request_moves).
+        """
+        existing = self.find(fen, depth, multipv, time_limit, early_stop)
+        if existing is not None:
+            logger.info("Attaching %s request to in-flight %s search of %s", source, existing.source, existing.position)
+            result = await self.attach(existing, depth, multipv, time_limit, score_moves)
+            if result is not None:
+                return result
+
+        progress = SearchProgress()
+        search = self.register(
+            fen,
+            depth,
+            multipv,
+            asyncio.ensure_future(start(progress)),
+            time_limit=time_limit,
+            early_stop=early_stop,
+            progress=progress,
+            source=source,
+        )
+        return await self._wait(search)
+
+    async def attach(
+        self,
+        search: InFlightSearch,
+        depth: int,
+        multipv: int = 1,
+        time_limit: float | None = None,
+        score_moves: Sequence[str] = (),
+    ) -> dict[str, Any] | None:
+        """
+        Wait on someone else's search until it finishes or completes an iteration at
+        `depth`. A time-limited caller stops waiting after its own budget and takes the
+        deepest completed iteration. None when the search ends (or narrows to fewer
+        lines than `multipv`, as live jobs do past the display depth) without an answer.
+        """
+        if score_moves and search.progress is not None:
+            search.progress.request_moves(score_moves)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + time_limit if time_limit else None
+        self._attached += 1
+        search.attached += 1
+        try:
+            while True:
+                timeout = self._poll_seconds if search.progress is not None else None
+                if deadline is not None:
+                    remaining = max(0.0, deadline - loop.time())
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+                done, _ = await asyncio.wait({search.task}, timeout=timeout)
+                if done and not search.task.cancelled() and search.task.result():
+                    return {**search.task.result(), "shared": True}
+
+                snapshot = search.snapshot()
+                timed_out = deadline is not None and loop.time() >= deadline
+                if _snapshot_covers(snapshot, None if timed_out else depth, multipv):
+                    self._snapshot_answers += 1
+                    return {**snapshot, "shared": True}
+                if done or timed_out or search.multipv < multipv:
+                    return None
+        finally:
+            self._detach(search)
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "in_flight": sum(len(searches) for searches in self._searches.values()),
+            "started": self._started,
+            "attached": self._attached,
+            "snapshot_answers": self._snapshot_answers,
+        }
+
+    async def _wait(self, search: InFlightSearch) -> dict[str, Any]:
+        search.attached += 1
+        try:
+            return await asyncio.shield(search.task)
+        finally:
+            self._detach(search)
+
+    def _detach(self, search: InFlightSearch) -> None:
+        search.attached -= 1
+        if search.attached <= 0 and search.owned and not search.task.done():
+            logger.info("Every caller left the %s search of %s; cancelling it", search.source, search.position)
+            search.task.cancel()
+
+    def _discard(self, search: InFlightSearch) -> None:
+        searches = self._searches.get(search.position)
+        if searches and search in searches:
+            searches.remove(search)
+            if not searches:
+                self._searches.pop(search.position, None)
+
+
+inflight_searches = InFlightSearches()
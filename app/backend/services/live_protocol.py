@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Live Protocol: negotiated encoding and delta events for the analysis websocket
+
+Clients that say nothing keep today's behaviour: every event is a full JSON
+object. A client can instead open with a control message
+
+    {"type": "hello", "encoding": "json" | "msgpack" | "cbor", "delta": true}
+
+and gets back a `protocol` event (already in the chosen encoding) naming what
+was accepted; binary encodings arrive as binary frames, JSON as text frames.
+MessagePack and CBOR need the optional `msgpack` / `cbor2` packages and fall
+back to JSON when they are missing.
+
+With `delta` on, snapshot and status events carry a `seq`. The client confirms
+the ones it has applied with {"type": "ack", "seq": n}; later events of that
+type are sent as
+
+    {"type": "delta", "event": "snapshot", "seq": 9, "base": 7,
+     "set": {...}, "unset": [...], "lines": [...], "drop_lines": [...]}
+
+holding only the fields, and the whole lines (keyed by line_number), that differ
+from the acknowledged event. Deltas are always taken against the acknowledged
+base, so a lost frame never corrupts the client's state. {"type": "resync"}
+drops the bases and re-sends the latest event of each type in full.
+"""
+from __future__ import annotations
+
+import importlib
+import json
+from typing import Any
+
+from fastapi import WebSocket
+
+# -------------------------------------------------------------------
+# Optional binary encoders
+# -------------------------------------------------------------------
+try:
+    msgpack = importlib.import_module("msgpack")
+except ImportError:
+    msgpack = None
+
+try:
+    cbor2 = importlib.import_module("cbor2")
+except ImportError:
+    cbor2 = None
+
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+ENCODING_CBOR = "cbor"
+CONTROL_TYPES = frozenset({"hello", "ack", "resync"})
+DELTA_EVENT_TYPES = ("snapshot", "status")
+# Sent events remembered for acknowledgement; acks older than this are ignored.
+ACK_HISTORY = 64
+
+
+def available_encodings() -> list[str]:
+    encodings = [ENCODING_JSON]
+    if msgpack is not None:
+        encodings.append(ENCODING_MSGPACK)
+    if cbor2 is not None:
+        encodings.append(ENCODING_CBOR)
+    return encodings
+
+
+def _line_number(line: dict[str, Any], index: int) -> int:
+    return int(line.get("line_number") or index + 1)
+
+
+def _lines_by_number(lines: list[dict[str, Any]] | None) -> dict[int, dict[str, Any]]:
+    return {_line_number(line, index): line for index, line in enumerate(lines or [])}
+
+
+def diff_event(base: dict[str, Any], event: dict[str, Any]) -> dict[str, Any]:
+    """Changes turning `base` into `event`: changed fields, removed fields, changed and dropped lines."""
+    delta: dict[str, Any] = {}
+    changed = {
+        key: value
+        for key, value in event.items()
+        if key not in ("lines", "seq") and (key not in base or base[key] != value)
+    }
+    removed = sorted(key for key in base if key not in event)
+    if changed:
+        delta["set"] = changed
+    if removed:
+        delta["unset"] = removed
+
+    base_lines = _lines_by_number(base.get("lines"))
+    event_lines = _lines_by_number(event.get("lines"))
+    changed_lines = [
+        {**line, "line_number": number} for number, line in event_lines.items() if base_lines.get(number) != line
+    ]
+    dropped_lines = sorted(number for number in base_lines if number not in event_lines)
+    if changed_lines:
+        delta["lines"] = changed_lines
+    if dropped_lines:
+        delta["drop_lines"] = dropped_lines
+    return delta
+
+
+def apply_delta(base: dict[str, Any], delta: dict[str, Any]) -> dict[str, Any]:
+    """Rebuild the full event from its acknowledged `base` (what a client does on receipt)."""
+    unset = set(delta.get("unset", ()))
+    event = {key: value for key, value in base.items() if key not in unset}
+    event.update(delta.get("set", {}))
+    if "lines" not in unset and ("lines" in base or "lines" in delta):
+        lines = _lines_by_number(base.get("lines"))
+        for number in delta.get("drop_lines", ()):
+            lines.pop(number, None)
+        for line in delta.get("lines", ()):
+            lines[int(line["line_number"])] = line
+        event["lines"] = [lines[number] for number in sorted(lines)]
+    event["seq"] = delta["seq"]
+    return event
+
+
+class LiveProtocol:
+    """Per-connection encoding choice and delta state."""
+
+    def __init__(self, encoding: str = ENCODING_JSON, delta: bool = False) -> None:
+        self.encoding = ENCODING_JSON
+        self.delta = False
+        self._seq = 0
+        self._sent: dict[int, dict[str, Any]] = {}
+        self._bases: dict[str, dict[str, Any]] = {}
+        self._latest: dict[str, dict[str, Any]] = {}
+        self.negotiate(encoding, delta)
+
+    def negotiate(self, encoding: str | None, delta: bool) -> dict[str, Any]:
+        requested = str(encoding or ENCODING_JSON).lower()
+        self.encoding = requested if requested in available_encodings() else ENCODING_JSON
+        self.delta = bool(delta)
+        self._sent.clear()
+        self._bases.clear()
+        return {
+            "type": "protocol",
+            "encoding": self.encoding,
+            "delta": self.delta,
+            "available_encodings": available_encodings(),
+        }
+
+    def handle_control(self, payload: str) -> list[dict[str, Any]] | None:
+        """Events to send in reply to a control message, or None if `payload` is not one."""
+        if not payload.lstrip().startswith("{"):
+            return None
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            return None
+        if not isinstance(data, dict) or data.get("type") not in CONTROL_TYPES:
+            return None
+
+        if data["type"] == "hello":
+            return [self.negotiate(data.get("encoding"), bool(data.get("delta")))]
+        if data["type"] == "ack":
+            try:
+                self.acknowledge(int(data.get("seq")))
+            except (TypeError, ValueError):
+                pass
+            return []
+        return self.resync()
+
+    def acknowledge(self, seq: int) -> None:
+        event = self._sent.get(seq)
+        if event is None:
+            return
+        base = self._bases.get(event["type"])
+        if base is None or base["seq"] < seq:
+            self._bases[event["type"]] = event
+
+    def resync(self) -> list[dict[str, Any]]:
+        self._bases.clear()
+        latest = sorted(self._latest.values(), key=lambda event: event["seq"])
+        return [{key: value for key, value in event.items() if key != "seq"} for event in latest]
+
+    def prepare(self, event: dict[str, Any]) -> dict[str, Any]:
+        """The message to send for `event`: unchanged, or sequenced and delta-encoded when enabled."""
+        if not self.delta or event.get("type") not in DELTA_EVENT_TYPES:
+            return event
+
+        self._seq += 1
+        full = {**event, "seq": self._seq}
+        self._sent[self._seq] = full
+        self._sent.pop(self._seq - ACK_HISTORY, None)
+        self._latest[event["type"]] = full
+
+        base = self._bases.get(event["type"])
+        if base is None:
+            return full
+        return {
+            "type": "delta",
+            "event": event["type"],
+            "seq": self._seq,
+            "base": base["seq"],
+            **diff_event(base, full),
+        }
+
+    def encode(self, message: dict[str, Any]) -> str | bytes:
+        if self.encoding == ENCODING_MSGPACK:
+            return msgpack.packb(message, use_bin_type=True)
+        if self.encoding == ENCODING_CBOR:
+            return cbor2.dumps(message)
+        return json.dumps(message, separators=(",", ":"))
+
+
+class ProtocolWebSocket:
+    """WebSocket wrapper whose `send_json` goes through the connection's LiveProtocol."""
+
+    def __init__(self, websocket: WebSocket, protocol: LiveProtocol | None = None) -> None:
+        self.websocket = websocket
+        self.protocol = protocol or LiveProtocol()
+
+    async def send_json(self, event: dict[str, Any]) -> None:
+        message = self.protocol.prepare(event)
+        if self.protocol.encoding == ENCODING_JSON:
+            await self.websocket.send_json(message)
+            return
+        await self.websocket.send_bytes(self.protocol.encode(message))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.websocket, name)
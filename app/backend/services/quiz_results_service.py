@@ -3,16 +3,25 @@
 Quiz Results Service: Evaluate and compare user moves with Stockfish analysis
 """
 
-import chess
 import asyncio
-from typing import Dict, List, Optional
+import chess
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.backend.config import QUIZ_ANALYSIS_DEPTH, QUIZ_EVALUATION_CONCURRENCY
 from app.backend.logs.logger import logger
-from app.backend.services.analyzer_service import analyze_position
+from app.backend.services.analyzer_service import _engine_info_result, analyze_position
+from app.backend.services.engine_scheduler import EngineLease, EnginePriority, engine_scheduler
+from app.backend.services.inflight_searches import SearchProgress, inflight_searches, stored_result_covers
 from app.backend.runtime import get_stockfish_path
 
 # Try to import DB functions; gracefully degrade if not available
 try:
-    from app.backend.db.db import get_moves, DB_ENABLED
+    from app.backend.db.db import (
+        get_moves,
+        get_latest_analysis_snapshot,
+        store_analysis_lines,
+        upsert_eval,
+        DB_ENABLED,
+    )
 except Exception as e:
     logger.warning(f"Could not import DB functions: {e}")
     DB_ENABLED = False
@@ -20,11 +29,41 @@ except Exception as e:
     async def get_moves(game_id: int):
         return []
 
+    async def get_latest_analysis_snapshot(fen: str, target_depth=None, prefer_richer_lines: bool = False):
+        return None
+
+    async def store_analysis_lines(fen: str, depth: int, lines: list) -> None:
+        pass
+
+    async def upsert_eval(fen: str, **kwargs) -> None:
+        pass
 
-def _run_multipv_analysis(fen: str, depth: int, time_limit: float, num_lines: int = 3) -> List[Dict]:
+QUIZ_MULTIPV = 3
+MATE_SCORE_CP = 30000
+
+# Background quiz precomputation started by imports / annotation saves; referenced here so it runs to completion.
+_precompute_tasks: set[asyncio.Task] = set()
+# Times a preempted precompute search is queued again before the position is left for the quiz itself.
+PRECOMPUTE_MAX_REQUEUES = 3
+
+
+def _run_multipv_analysis(
+    fen: str,
+    depth: int,
+    time_limit: float,
+    num_lines: int = 3,
+    lease: Optional[EngineLease] = None,
+    score_moves: Sequence[str] = (),
+    progress: Optional[SearchProgress] = None,
+) -> Tuple[List[Dict], Dict[str, Dict]]:
     """
     Run Stockfish with MultiPV to get multiple evaluation lines.
-    Returns list of dicts: [{best_move, score_cp, score_mate, pv_san, pv_uci, depth}, ...]
+    Returns (lines, move_scores): lines is a list of dicts
+    [{best_move, score_cp, score_mate, pv_san, pv_uci, depth}, ...]; move_scores maps each
+    UCI move in `score_moves`, and each move requested through `progress` by callers that
+    joined this search, to its {score_cp, score_mate} from the same engine session
+    (moves outside the top lines are scored with a `searchmoves` search at the same limit).
+    A stop request on `lease` ends the search early.
     """
     import chess.engine
 
@@ -33,8 +72,8 @@ def _run_multipv_analysis(fen: str, depth: int, time_limit: float, num_lines: in
 
     try:
         with chess.engine.SimpleEngine.popen_uci(stockfish_path) as engine:
-            limit = chess.engine.Limit(time=time_limit, depth=depth)
-            info_list = engine.analyse(board, limit, multipv=num_lines)
+            limit = chess.engine.Limit(time=time_limit or None, depth=depth)
+            info_list = _analyse_with_lease(engine, board, limit, lease, multipv=num_lines)
 
             lines = []
             for entry in (info_list if isinstance(info_list, list) else [info_list]):
@@ -89,18 +128,24 @@ def _run_multipv_analysis(fen: str, depth: int, time_limit: float, num_lines: in
                     "pv_uci": " ".join(pv_uci_parts),
                     "multipv": entry.get("multipv", 1),
                 })
-            return lines
+
+            wanted = list(dict.fromkeys([*score_moves, *(progress.requested_moves() if progress is not None else ())]))
+            move_scores = _line_move_scores(lines, wanted)
+            unscored = [move for move in wanted if move not in move_scores]
+            if unscored:
+                move_scores.update(_score_root_moves(engine, board, limit, unscored, lease))
+            return lines, move_scores
 
     except NotImplementedError:
         # Fallback: run single PV via UCI session, return as single line
         from app.backend.services.analyzer_service import _analyze_with_stockfish_session
-        result = _analyze_with_stockfish_session(fen, depth, time_limit, stockfish_path)
+        result = _analyze_with_stockfish_session(fen, depth, time_limit, stockfish_path, lease)
         if not result:
-            return []
+            return [], {}
         best_san = _get_move_san(fen, result.get("best_move", ""))
         pv_uci = result.get("pv", "")
         pv_san = _convert_pv_uci_to_san(fen, pv_uci) if pv_uci else ""
-        return [{
+        lines = [{
             "best_move": result.get("best_move"),
             "best_move_san": best_san,
             "score_cp": result.get("score_cp"),
@@ -110,14 +155,87 @@ def _run_multipv_analysis(fen: str, depth: int, time_limit: float, num_lines: in
             "pv_uci": pv_uci,
             "multipv": 1,
         }]
+        return lines, _line_move_scores(lines, [*score_moves, *(progress.requested_moves() if progress is not None else ())])
 
 
-async def _analyze_position_multipv(fen: str, depth: int = 20, time_limit: float = 0.5) -> Dict:
+def _line_move_scores(lines: List[Dict], moves: Sequence[str]) -> Dict[str, Dict]:
+    """Scores of the requested moves that head one of the MultiPV lines."""
+    scores = {}
+    for line in lines:
+        move = line.get("best_move")
+        if move in moves and move not in scores:
+            scores[move] = {"score_cp": line.get("score_cp"), "score_mate": line.get("score_mate")}
+    return scores
+
+
+def _score_root_moves(engine, board: chess.Board, limit, moves: Sequence[str], lease: Optional[EngineLease]) -> Dict[str, Dict]:
+    """Score `moves` from the root position with `go searchmoves`, one line per move."""
+    root_moves = []
+    for move in moves:
+        try:
+            root_move = chess.Move.from_uci(move)
+        except ValueError:
+            continue
+        if board.is_legal(root_move):
+            root_moves.append(root_move)
+    if not root_moves:
+        return {}
+
+    with engine.analysis(board, limit, multipv=len(root_moves), root_moves=root_moves) as analysis:
+        if lease is not None:
+            lease.add_stop_callback(analysis.stop)
+        try:
+            analysis.wait()
+        finally:
+            if lease is not None:
+                lease.remove_stop_callback(analysis.stop)
+        infos = analysis.multipv
+
+    scores = {}
+    for info in infos:
+        result = _engine_info_result(info, limit.depth)
+        if result["best_move"] and result["best_move"] not in scores:
+            scores[result["best_move"]] = {"score_cp": result["score_cp"], "score_mate": result["score_mate"]}
+    return scores
+
+
+async def _analyze_position_multipv(
+    fen: str,
+    depth: int = 20,
+    time_limit: float = 0.5,
+    score_moves: Sequence[str] = (),
+    priority: EnginePriority = EnginePriority.QUIZ,
+) -> Dict:
     """
     Analyze a position with MultiPV=3, returning top 3 lines.
+
+    A stored snapshot (evals / analysis line sets) with enough lines at the requested depth
+    is used as is; otherwise the position is searched, joining a live or quiz search
+    already in flight, and the computed lines are stored for the next submission.
+    `score_moves` (UCI) are scored from the root in the same search settings and
+    returned in `move_scores`; only moves outside the top lines need a `searchmoves` search.
+    A quiz search joined while running scores them in its own engine session; a separate
+    searchmoves search is only started for cached lines or a search that could not.
     """
+    move_scores: Dict[str, Dict] = {}
     try:
-        lines = await asyncio.to_thread(_run_multipv_analysis, fen, depth, time_limit, 3)
+        result = await _cached_multipv(fen, depth, time_limit)
+        if result is None:
+            result = await inflight_searches.run(
+                fen,
+                depth,
+                QUIZ_MULTIPV,
+                lambda progress: _search_multipv(fen, depth, time_limit, score_moves, priority, progress),
+                time_limit=time_limit,
+                source=priority.name.lower(),
+                score_moves=score_moves,
+            )
+        lines = [_with_san(fen, line) for line in result.get("lines", [])]
+        move_scores = {**_line_move_scores(lines, score_moves), **result.get("move_scores", {})}
+        unscored = [move for move in score_moves if move not in move_scores]
+        if lines and unscored:
+            # Cached or shared lines: score the remaining moves at the depth the lines reached.
+            move_scores.update(await _score_moves(fen, unscored, int(lines[0].get("depth") or depth), time_limit))
     except Exception as e:
         logger.error(f"MultiPV analysis failed: {e}", exc_info=True)
         lines = []
@@ -138,34 +256,198 @@ async def _analyze_position_multipv(fen: str, depth: int = 20, time_limit: float
         "nag": top.get("nag"),
         "depth": top.get("depth"),
         "lines": lines,
+        "move_scores": move_scores,
+        **({"preempted": True} if result.get("preempted") else {}),
     }
 
 
-def _analyze_position_after_move_sync(fen: str, move_san: str, depth: int, time_limit: float) -> Optional[float]:
+def schedule_quiz_precompute(fens: Sequence[str], depth: int = QUIZ_ANALYSIS_DEPTH) -> Optional[asyncio.Task]:
+    """
+    Analyze quiz target positions in the background (preemptible, depth-bounded) and store
+    their lines, so a later quiz submission at `depth` is served from the cache.
+    """
+    fens = list(dict.fromkeys(fen for fen in fens if fen))
+    if not fens or depth <= 0 or not DB_ENABLED:
+        return None
+
+    task = asyncio.create_task(_precompute_quiz_analysis(fens, depth))
+    _precompute_tasks.add(task)
+    task.add_done_callback(_precompute_tasks.discard)
+    return task
+
+
+async def _precompute_quiz_analysis(fens: List[str], depth: int) -> None:
+    logger.info(f"Precomputing quiz analysis for {len(fens)} positions at depth {depth}")
+    budget = asyncio.Semaphore(QUIZ_EVALUATION_CONCURRENCY)
+
+    async def precompute(fen: str) -> None:
+        async with budget:
+            for _ in range(PRECOMPUTE_MAX_REQUEUES + 1):
+                result = await _analyze_position_multipv(fen, depth, time_limit=0, priority=EnginePriority.BACKGROUND)
+                if not result.get("preempted"):
+                    return
+                # Cut short by a higher-priority request and not stored: queue the position again.
+                logger.info(f"Quiz precompute for {fen[:40]}... was preempted; requeueing")
+
+    await asyncio.gather(*(precompute(fen) for fen in fens))
+
+
+async def _cached_multipv(fen: str, depth: int, time_limit: float = 0) -> Optional[Dict]:
     """
-    Make move_san on fen and analyze the resulting position.
-    Returns White-perspective eval in centipawns, or None on failure.
+    Stored snapshot of `fen` with every quiz line at `depth` or deeper, if there is one.
+
+    Lines that stopped short of `depth` still count when they are at least as deep as a stored
+    search that ran with the same or larger limits (a time-capped quiz search ends below the
+    requested depth, and running it again would end there too).
     """
+    if not DB_ENABLED:
+        return None
+    try:
+        snapshot = await get_latest_analysis_snapshot(fen, prefer_richer_lines=True)
+    except Exception as e:
+        logger.warning(f"Could not read cached analysis for quiz position: {e}")
+        return None
+    if not stored_result_covers(snapshot, depth, time_limit):
+        return None
+    snapshot_depth = int(snapshot.get("depth") or 0)
+    if snapshot_depth < depth and snapshot_depth < int(snapshot.get("eval_depth") or 0):
+        return None
+
+    # Positions with fewer legal moves than MultiPV lines never store a full set.
+    wanted_lines = min(QUIZ_MULTIPV, chess.Board(fen).legal_moves.count())
+    if len(snapshot.get("lines") or []) < wanted_lines:
+        return None
+    logger.info(f"Quiz position served from cache at depth {snapshot.get('depth')} (requested {depth})")
+    return snapshot
+
+
+async def _search_multipv(
+    fen: str,
+    depth: int,
+    time_limit: float,
+    score_moves: Sequence[str] = (),
+    priority: EnginePriority = EnginePriority.QUIZ,
+    progress: Optional[SearchProgress] = None,
+) -> Dict:
+    """MultiPV search in the shared result shape (top line's fields plus `lines`) other callers can join."""
+    async with engine_scheduler.lease(priority, label=fen) as lease:
+        lines, move_scores = await engine_scheduler.run_in_thread(
+            lease, _run_multipv_analysis, fen, depth, time_limit, QUIZ_MULTIPV, lease, score_moves, progress
+        )
+        preempted = lease.preempted
+    if not lines:
+        return {}
+    top = lines[0]
+    result = {
+        "best_move": top.get("best_move"),
+        "score_cp": top.get("score_cp"),
+        "score_mate": top.get("score_mate"),
+        "depth": top.get("depth"),
+        "pv": top.get("pv_uci"),
+        "lines": lines,
+        "move_scores": move_scores,
+    }
+    if preempted and int(top.get("depth") or 0) < depth:
+        # Partial lines from a preempted background search are not stored; the caller requeues it.
+        return {**result, "preempted": True}
+    limits = {}
+    if int(top.get("depth") or 0) < depth:
+        # Time-capped: record the limits so the same request is served from the cache next time.
+        limits = {"target_depth": depth, "target_time": time_limit or None, "stopped_early": False}
+    await _store_multipv(fen, result, **limits)
+    return result
+
+
+async def _score_moves(fen: str, moves: Sequence[str], depth: int, time_limit: float) -> Dict[str, Dict]:
+    async with engine_scheduler.lease(EnginePriority.QUIZ, label=fen) as lease:
+        return await engine_scheduler.run_in_thread(lease, _score_moves_sync, fen, moves, depth, time_limit, lease)
+
+
+def _score_moves_sync(
+    fen: str,
+    moves: Sequence[str],
+    depth: int,
+    time_limit: float,
+    lease: Optional[EngineLease] = None,
+) -> Dict[str, Dict]:
     import chess.engine
     try:
-        board = chess.Board(fen)
-        move = board.parse_san(move_san)
-        board.push(move)
-        stockfish_path = get_stockfish_path()
-        with chess.engine.SimpleEngine.popen_uci(stockfish_path) as engine:
-            limit = chess.engine.Limit(time=min(time_limit, 0.25), depth=min(depth, 14))
-            info = engine.analyse(board, limit)
-            score = info.get("score") if isinstance(info, dict) else (info[0].get("score") if info else None)
-            if score:
-                ws = score.white()
-                if ws.is_mate():
-                    return 30000 if ws.mate() > 0 else -30000
-                return ws.score()
+        with chess.engine.SimpleEngine.popen_uci(get_stockfish_path()) as engine:
+            limit = chess.engine.Limit(time=time_limit or None, depth=depth)
+            return _score_root_moves(engine, chess.Board(fen), limit, moves, lease)
     except NotImplementedError:
         pass  # fallback not needed — partial credit will use default
     except Exception as e:
-        logger.warning(f"Could not analyze after move {move_san}: {e}")
-    return None
+        logger.warning(f"Could not score moves {list(moves)} in {fen}: {e}")
+    return {}
+
+
+async def _store_multipv(fen: str, result: Dict, **limits) -> None:
+    if not DB_ENABLED:
+        return
+    try:
+        await upsert_eval(
+            fen=fen,
+            best_move=result.get("best_move"),
+            score_cp=result.get("score_cp"),
+            score_mate=result.get("score_mate"),
+            depth=result.get("depth"),
+            pv=result.get("pv"),
+            **limits,
+        )
+        await store_analysis_lines(
+            fen=fen,
+            depth=result.get("depth"),
+            lines=[
+                {
+                    "best_move": line.get("best_move"),
+                    "score_cp": line.get("score_cp"),
+                    "score_mate": line.get("score_mate"),
+                    "pv": line.get("pv_uci"),
+                    "search_mode": "multipv",
+                }
+                for line in result["lines"]
+            ],
+        )
+    except Exception as e:
+        logger.error(f"Error storing quiz analysis in DB: {e}", exc_info=True)
+
+
+def _with_san(fen: str, line: Dict) -> Dict:
+    """Quiz line for a line from a live search or stored snapshot (UCI `pv`, no SAN yet)."""
+    if "pv_san" in line:
+        return dict(line)
+    pv_uci = line.get("pv") or ""
+    return {
+        "best_move": line.get("best_move"),
+        "best_move_san": _get_move_san(fen, line.get("best_move") or ""),
+        "score_cp": line.get("score_cp"),
+        "score_mate": line.get("score_mate"),
+        "depth": line.get("depth"),
+        "pv_san": _convert_pv_uci_to_san(fen, pv_uci) if pv_uci else "",
+        "pv_uci": pv_uci,
+        "multipv": line.get("multipv") or line.get("line_number") or 1,
+    }
+
+
+def _analyse_with_lease(engine, board: chess.Board, limit, lease: Optional[EngineLease], multipv: Optional[int] = None):
+    """`engine.analyse` that a stop request on the lease can interrupt."""
+    with engine.analysis(board, limit, multipv=multipv) as analysis:
+        if lease is not None:
+            lease.add_stop_callback(analysis.stop)
+        try:
+            analysis.wait()
+        finally:
+            if lease is not None:
+                lease.remove_stop_callback(analysis.stop)
+        return analysis.multipv if multipv else (analysis.multipv[0] if analysis.multipv else {})
+
+
+def _score_value(score_cp: Optional[float], score_mate: Optional[int]) -> float:
+    """White-perspective score in centipawns, with mates pinned to ±MATE_SCORE_CP."""
+    if score_mate is not None:
+        return MATE_SCORE_CP if score_mate > 0 else -MATE_SCORE_CP
+    return score_cp or 0
 
 
 def _partial_credit(eval_swing_cp: Optional[float]) -> float:
@@ -256,6 +538,131 @@ def _convert_pv_uci_to_san(fen: str, pv_uci_str: str) -> str:
         return pv_uci_str
 
 
+async def _evaluate_response(i: int, response: Dict, depth: int, time_limit: float) -> Optional[Dict]:
+    """Grade one quiz response against Stockfish; None when it cannot be evaluated."""
+    ply           = response.get("ply")
+    fen_before    = response.get("fen_before")
+    user_move     = response.get("user_move", "").strip()   # UCI
+    game_move_san = response.get("expected_move", "").strip()  # SAN from PGN
+
+    if not fen_before or not user_move:
+        logger.warning(f"Response {i} missing fen_before or user_move")
+        return None
+
+    # Convert game move SAN → UCI for comparison
+    game_move_uci = ""
+    try:
+        board = chess.Board(fen_before)
+        game_move_uci = board.parse_san(game_move_san).uci()
+    except Exception:
+        pass
+    played_game_move = bool(game_move_uci and user_move.lower() == game_move_uci.lower())
+
+    # --- MultiPV analysis (3 lines); the game move is scored alongside when it may earn partial credit ---
+    sf = await _analyze_position_multipv(
+        fen_before, depth, time_limit, score_moves=(game_move_uci,) if played_game_move else ()
+    )
+    if "error" in sf and not sf.get("lines"):
+        logger.warning(f"Could not analyze position {i}: {sf.get('error')}")
+        return None
+
+    sf_best_uci = sf.get("best_move", "")
+    sf_best_san = sf.get("best_move_san", "") or _get_move_san(fen_before, sf_best_uci)
+    sf_eval_cp  = sf.get("score_cp")
+    sf_eval_mate = sf.get("score_mate")
+    sf_nag      = sf.get("nag", _eval_nag(sf_eval_cp, sf_eval_mate))
+
+    user_move_san = _get_move_san(fen_before, user_move)
+
+    played_sf_best   = bool(sf_best_uci and user_move.lower() == sf_best_uci.lower())
+    game_differs_from_sf = bool(
+        sf_best_uci and game_move_uci and
+        sf_best_uci.lower() != game_move_uci.lower()
+    )
+
+    # --- Partial credit calculation ---
+    credit = 0.0
+    eval_swing_cp = None
+    partial_nag   = None
+
+    if played_sf_best:
+        credit      = 1.0
+        result_type = "full"
+    elif played_game_move and game_differs_from_sf:
+        # Eval swing: best move vs game move, both scored from this position by the same search
+        game_score = sf.get("move_scores", {}).get(game_move_uci)
+        if game_score is not None:
+            eval_swing_cp = abs(
+                _score_value(sf_eval_cp, sf_eval_mate)
+                - _score_value(game_score.get("score_cp"), game_score.get("score_mate"))
+            )
+            partial_nag = _eval_nag(game_score.get("score_cp"), game_score.get("score_mate"))
+        elif sf_eval_mate is not None:
+            # SF has mate; game move must be much worse
+            eval_swing_cp = 200  # conservative max penalty
+        credit      = _partial_credit(eval_swing_cp)
+        result_type = "partial"
+    elif played_game_move:
+        # game move == SF best, so full credit
+        credit      = 1.0
+        result_type = "full"
+    else:
+        credit      = 0.0
+        result_type = "fail"
+
+    # --- Feedback text ---
+    eval_str = _format_score(sf_eval_cp, sf_eval_mate)
+    if result_type == "full" and not game_differs_from_sf:
+        feedback = f"✓ Correct — {user_move_san} matches both the game and Stockfish's best move."
+    elif result_type == "full" and game_differs_from_sf:
+        feedback = (
+            f"✓ Excellent — {user_move_san} is Stockfish's best move "
+            f"(stronger than the game move {game_move_san})."
+        )
+    elif result_type == "partial":
+        swing_str = f"{eval_swing_cp:.0f} cp" if eval_swing_cp is not None else "unknown"
+        gm_nag = partial_nag or "?"
+        feedback = (
+            f"Partial credit ({credit:.2f}) — you played the game move ({game_move_san} {gm_nag}). "
+            f"Stockfish prefers {sf_best_san} {sf_nag}. "
+            f"Eval swing: {swing_str}."
+        )
+    else:
+        feedback = (
+            f"✗ Incorrect — you played {user_move_san}. "
+            f"Game move: {game_move_san}. "
+            f"SF best: {sf_best_san} {sf_nag} ({eval_str})."
+        )
+
+    result_entry = {
+        "ply": ply,
+        "position_fen": fen_before,
+        "game_move_san": game_move_san,
+        "game_move_uci": game_move_uci,
+        "game_differs_from_sf": game_differs_from_sf,
+        "user_move": user_move,
+        "user_move_san": user_move_san,
+        "result_type": result_type,   # "full" | "partial" | "fail"
+        "credit": credit,
+        "eval_swing_cp": eval_swing_cp,
+        "pass": result_type != "fail",
+        "played_sf_best": played_sf_best,
+        "played_game_move": played_game_move,
+        "feedback": feedback,
+        "stockfish": {
+            "best_move": sf_best_uci,
+            "best_move_san": sf_best_san,
+            "score_cp": sf_eval_cp,
+            "score_mate": sf_eval_mate,
+            "nag": sf_nag,
+            "score_formatted": eval_str,
+            "depth": sf.get("depth"),
+            "lines": sf.get("lines", []),
+        },
+    }
+    return result_entry
+
+
 async def evaluate_quiz_response(
     game_id: int,
     responses: List[Dict],
@@ -275,140 +682,20 @@ async def evaluate_quiz_response(
 
     logger.info(f"Evaluating {len(responses)} quiz responses for game {game_id}")
 
-    results = []
-    total_credit = 0.0
+    # Positions are independent: evaluate them concurrently within the quiz engine budget.
+    budget = asyncio.Semaphore(QUIZ_EVALUATION_CONCURRENCY)
 
-    for i, response in enumerate(responses):
-        try:
-            ply           = response.get("ply")
-            fen_before    = response.get("fen_before")
-            user_move     = response.get("user_move", "").strip()   # UCI
-            game_move_san = response.get("expected_move", "").strip()  # SAN from PGN
-
-            if not fen_before or not user_move:
-                logger.warning(f"Response {i} missing fen_before or user_move")
-                continue
-
-            # --- MultiPV analysis (3 lines) ---
-            sf = await _analyze_position_multipv(fen_before, depth, time_limit)
-            if "error" in sf and not sf.get("lines"):
-                logger.warning(f"Could not analyze position {i}: {sf.get('error')}")
-                continue
-
-            sf_best_uci = sf.get("best_move", "")
-            sf_best_san = sf.get("best_move_san", "") or _get_move_san(fen_before, sf_best_uci)
-            sf_eval_cp  = sf.get("score_cp")
-            sf_eval_mate = sf.get("score_mate")
-            sf_nag      = sf.get("nag", _eval_nag(sf_eval_cp, sf_eval_mate))
-
-            user_move_san = _get_move_san(fen_before, user_move)
-
-            # Convert game move SAN → UCI for comparison
-            game_move_uci = ""
+    async def evaluate(i: int, response: Dict) -> Optional[Dict]:
+        async with budget:
             try:
-                board = chess.Board(fen_before)
-                game_move_uci = board.parse_san(game_move_san).uci()
-            except Exception:
-                pass
-
-            played_sf_best   = bool(sf_best_uci and user_move.lower() == sf_best_uci.lower())
-            played_game_move = bool(game_move_uci and user_move.lower() == game_move_uci.lower())
-            game_differs_from_sf = bool(
-                sf_best_uci and game_move_uci and
-                sf_best_uci.lower() != game_move_uci.lower()
-            )
-
-            # --- Partial credit calculation ---
-            credit = 0.0
-            eval_swing_cp = None
-            partial_nag   = None
-
-            if played_sf_best:
-                credit      = 1.0
-                result_type = "full"
-            elif played_game_move and game_differs_from_sf:
-                # Analyze position AFTER game move to measure the eval swing
-                game_eval_after = await asyncio.to_thread(
-                    _analyze_position_after_move_sync,
-                    fen_before, game_move_san, depth, time_limit
-                )
-                if sf_eval_cp is not None and game_eval_after is not None:
-                    eval_swing_cp = abs(sf_eval_cp - game_eval_after)
-                elif sf_eval_mate is not None:
-                    # SF has mate; game move must be much worse
-                    eval_swing_cp = 200  # conservative max penalty
-                credit      = _partial_credit(eval_swing_cp)
-                result_type = "partial"
-                partial_nag = _eval_nag(
-                    game_eval_after,
-                    None  # mate score doesn't apply here generally
-                )
-            elif played_game_move:
-                # game move == SF best, so full credit
-                credit      = 1.0
-                result_type = "full"
-            else:
-                credit      = 0.0
-                result_type = "fail"
-
-            total_credit += credit
-
-            # --- Feedback text ---
-            eval_str = _format_score(sf_eval_cp, sf_eval_mate)
-            if result_type == "full" and not game_differs_from_sf:
-                feedback = f"✓ Correct — {user_move_san} matches both the game and Stockfish's best move."
-            elif result_type == "full" and game_differs_from_sf:
-                feedback = (
-                    f"✓ Excellent — {user_move_san} is Stockfish's best move "
-                    f"(stronger than the game move {game_move_san})."
-                )
-            elif result_type == "partial":
-                swing_str = f"{eval_swing_cp:.0f} cp" if eval_swing_cp is not None else "unknown"
-                gm_nag = partial_nag or "?"
-                feedback = (
-                    f"Partial credit ({credit:.2f}) — you played the game move ({game_move_san} {gm_nag}). "
-                    f"Stockfish prefers {sf_best_san} {sf_nag}. "
-                    f"Eval swing: {swing_str}."
-                )
-            else:
-                feedback = (
-                    f"✗ Incorrect — you played {user_move_san}. "
-                    f"Game move: {game_move_san}. "
-                    f"SF best: {sf_best_san} {sf_nag} ({eval_str})."
-                )
-
-            result_entry = {
-                "ply": ply,
-                "position_fen": fen_before,
-                "game_move_san": game_move_san,
-                "game_move_uci": game_move_uci,
-                "game_differs_from_sf": game_differs_from_sf,
-                "user_move": user_move,
-                "user_move_san": user_move_san,
-                "result_type": result_type,   # "full" | "partial" | "fail"
-                "credit": credit,
-                "eval_swing_cp": eval_swing_cp,
-                "pass": result_type != "fail",
-                "played_sf_best": played_sf_best,
-                "played_game_move": played_game_move,
-                "feedback": feedback,
-                "stockfish": {
-                    "best_move": sf_best_uci,
-                    "best_move_san": sf_best_san,
-                    "score_cp": sf_eval_cp,
-                    "score_mate": sf_eval_mate,
-                    "nag": sf_nag,
-                    "score_formatted": eval_str,
-                    "depth": sf.get("depth"),
-                    "lines": sf.get("lines", []),
-                },
-            }
-
-            results.append(result_entry)
-
-        except Exception as e:
-            logger.error(f"Error evaluating response {i}: {e}", exc_info=True)
-            continue
+                return await _evaluate_response(i, response, depth, time_limit)
+            except Exception as e:
+                logger.error(f"Error evaluating response {i}: {e}", exc_info=True)
+                return None
+
+    evaluated = await asyncio.gather(*(evaluate(i, response) for i, response in enumerate(responses)))
+    results = [entry for entry in evaluated if entry is not None]
+    total_credit = sum(entry["credit"] for entry in results)
 
     total    = len(results)
     max_score = float(total) if total > 0 else 1.0
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Search Convergence: adaptive early stopping for budgeted searches
+
+`/analyze` and batch game analysis search to a fixed depth/time limit. A
+ConvergenceTracker watches the completed iterations of a search and asks for a
+stop once the best move and score have held within a tolerance for K depths,
+or as soon as a forced mate is found.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from app.backend.config import (
+    ANALYSIS_EARLY_STOP_MIN_DEPTH,
+    ANALYSIS_EARLY_STOP_SCORE_TOLERANCE_CP,
+    ANALYSIS_EARLY_STOP_STABLE_DEPTHS,
+    MAX_ANALYSIS_DEPTH,
+    MAX_ANALYSIS_EARLY_STOP_SCORE_TOLERANCE_CP,
+)
+
+STOP_REASON_CONVERGED = "converged"
+STOP_REASON_MATE = "mate"
+
+
+@dataclass(frozen=True)
+class ConvergencePolicy:
+    stable_depths: int = ANALYSIS_EARLY_STOP_STABLE_DEPTHS
+    score_tolerance_cp: int = ANALYSIS_EARLY_STOP_SCORE_TOLERANCE_CP
+    min_depth: int = ANALYSIS_EARLY_STOP_MIN_DEPTH
+    stop_on_mate: bool = True
+
+    @property
+    def enabled(self) -> bool:
+        return self.stable_depths > 0 or self.stop_on_mate
+
+    @classmethod
+    def from_payload(cls, value: Any, default_enabled: bool) -> ConvergencePolicy | None:
+        """Policy for an `early_stop` request field: omitted, true/false, or an object of overrides."""
+        if value is None:
+            value = default_enabled and ANALYSIS_EARLY_STOP_STABLE_DEPTHS > 0
+        if value is True:
+            return cls()
+        if not isinstance(value, dict):
+            return None
+
+        policy = cls(
+            stable_depths=_clamp(value.get("stable_depths"), ANALYSIS_EARLY_STOP_STABLE_DEPTHS, 0, MAX_ANALYSIS_DEPTH),
+            score_tolerance_cp=_clamp(
+                value.get("score_tolerance_cp"),
+                ANALYSIS_EARLY_STOP_SCORE_TOLERANCE_CP,
+                0,
+                MAX_ANALYSIS_EARLY_STOP_SCORE_TOLERANCE_CP,
+            ),
+            min_depth=_clamp(value.get("min_depth"), ANALYSIS_EARLY_STOP_MIN_DEPTH, 1, MAX_ANALYSIS_DEPTH),
+            stop_on_mate=bool(value.get("stop_on_mate", True)),
+        )
+        return policy if policy.enabled else None
+
+
+class ConvergenceTracker:
+    """Feed it every principal-line update; an iteration counts once the next depth starts."""
+
+    def __init__(self, policy: ConvergencePolicy) -> None:
+        self.policy = policy
+        self.stop_reason: str | None = None
+        self.stopped_at_depth: int | None = None
+        self._depth = 0
+        self._current: tuple[str | None, int | None, int | None] | None = None
+        self._previous: tuple[str | None, int | None, int | None] | None = None
+        self._stable = 0
+
+    def observe(self, depth: int, best_move: str | None, score_cp: int | None, score_mate: int | None) -> bool:
+        """Record an update for the principal line; True once the search should stop."""
+        if self.stop_reason is not None:
+            return True
+        if depth < self._depth:
+            return False
+        if depth > self._depth and self._current is not None:
+            self._complete(self._depth, self._current)
+        self._depth = depth
+        self._current = (best_move, score_cp, score_mate)
+        return self.stop_reason is not None
+
+    def summary(self, time_limit: float, elapsed_seconds: float) -> dict[str, Any]:
+        """Result fields for a finished search; the saved time is the unused part of its time budget."""
+        time_saved = max(0.0, time_limit - elapsed_seconds) if self.stop_reason and time_limit > 0 else 0.0
+        convergence_stats.record(self.stop_reason, time_saved)
+        return {
+            "stopped_early": self.stop_reason,
+            "search_time_ms": round(elapsed_seconds * 1000, 1),
+            "time_saved_ms": round(time_saved * 1000, 1),
+        }
+
+    def _complete(self, depth: int, result: tuple[str | None, int | None, int | None]) -> None:
+        best_move, score_cp, score_mate = result
+        if score_mate is not None and self.policy.stop_on_mate:
+            self._stop(STOP_REASON_MATE, depth)
+            return
+
+        previous = self._previous
+        self._previous = result
+        if (
+            previous is not None
+            and best_move is not None
+            and best_move == previous[0]
+            and score_cp is not None
+            and previous[1] is not None
+            and abs(score_cp - previous[1]) <= self.policy.score_tolerance_cp
+        ):
+            self._stable += 1
+        else:
+            self._stable = 0
+
+        if self.policy.stable_depths > 0 and self._stable >= self.policy.stable_depths and depth >= self.policy.min_depth:
+            self._stop(STOP_REASON_CONVERGED, depth)
+
+    def _stop(self, reason: str, depth: int) -> None:
+        self.stop_reason = reason
+        self.stopped_at_depth = depth
+
+
+@dataclass
+class ConvergenceStats:
+    searches: int = 0
+    stopped_early: int = 0
+    mate_stops: int = 0
+    time_saved_seconds: float = 0.0
+
+    def record(self, stop_reason: str | None, time_saved: float) -> None:
+        self.searches += 1
+        if stop_reason:
+            self.stopped_early += 1
+            self.time_saved_seconds += time_saved
+        if stop_reason == STOP_REASON_MATE:
+            self.mate_stops += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "searches": self.searches,
+            "stopped_early": self.stopped_early,
+            "mate_stops": self.mate_stops,
+            "time_saved_seconds": round(self.time_saved_seconds, 3),
+        }
+
+
+def _clamp(value: Any, default: int, minimum: int, maximum: int) -> int:
+    try:
+        return max(minimum, min(int(value if value is not None else default), maximum))
+    except (TypeError, ValueError):
+        return default
+
+
+convergence_stats = ConvergenceStats()
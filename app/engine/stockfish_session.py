@@ -1,6 +1,21 @@
+import asyncio
 import subprocess
 import threading
+
+import chess
+
 from app.backend.logs.logger import logger
+
+
+def uci_position_command(board: chess.Board) -> str:
+    """`position` command for a board, carrying its move stack so the engine sees the game history."""
+    root = board.root()
+    command = "position startpos" if root.fen() == chess.STARTING_FEN else f"position fen {root.fen()}"
+    if board.move_stack:
+        command += " moves " + " ".join(move.uci() for move in board.move_stack)
+    return command
+
+
 class StockfishSession:
     def __init__(self, path):
         self.process = subprocess.Popen(
@@ -24,4 +39,100 @@ class StockfishSession:
             line = self.process.stdout.readline()
             if line:
                 logger.debug("Raw Stockfish output: %s", line.strip())
-                yield line.strip()
\ No newline at end of file
+                yield line.strip()
+
+class AsyncStockfishSession:
+    """Long-lived StockfishSession driven from asyncio.
+
+    A reader thread pumps engine output into an asyncio queue, so a caller can
+    abandon a read (e.g. on task cancellation) without losing lines, and switch
+    positions with stop + position + go while keeping the engine's hash table.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.process = session.process
+        self.searching = False
+        self._loop = asyncio.get_running_loop()
+        self._lines = asyncio.Queue()
+        self._reader = threading.Thread(target=self._pump_output, daemon=True)
+        self._reader.start()
+
+    @classmethod
+    def open(cls, path):
+        return cls(StockfishSession(path))
+
+    def _pump_output(self):
+        try:
+            for line in iter(self.process.stdout.readline, ""):
+                self._loop.call_soon_threadsafe(self._lines.put_nowait, line.strip())
+        except Exception as exc:
+            logger.debug("Stockfish output reader stopped: %s", exc)
+        finally:
+            try:
+                self._loop.call_soon_threadsafe(self._lines.put_nowait, None)
+            except RuntimeError:
+                pass
+
+    def send(self, command: str):
+        self.session.send(command)
+
+    async def readline(self, timeout=None):
+        """Next output line, None at EOF; raises asyncio.TimeoutError after `timeout` seconds."""
+        if timeout is None:
+            line = await self._lines.get()
+        else:
+            line = await asyncio.wait_for(self._lines.get(), timeout)
+        if line is None or line.startswith("bestmove"):
+            self.searching = False
+        return line
+
+    async def read_until(self, prefix: str):
+        while True:
+            line = await self.readline()
+            if line is None or line.startswith(prefix):
+                return line
+
+    async def start(self, options=None):
+        self.send("uci")
+        await self.read_until("uciok")
+        self.send("ucinewgame")
+        for name, value in (options or {}).items():
+            self.set_option(name, value)
+        await self.wait_ready()
+
+    def set_option(self, name: str, value):
+        self.send(f"setoption name {name} value {value}")
+
+    async def wait_ready(self):
+        self.send("isready")
+        await self.read_until("readyok")
+
+    async def go(self, position_command: str, go_command: str = "go infinite"):
+        await self.stop()
+        self.send(position_command)
+        self.send(go_command)
+        self.searching = True
+
+    async def stop(self):
+        """Stop the running search and drain its output up to `bestmove`."""
+        if not self.searching:
+            return
+        self.send("stop")
+        await self.read_until("bestmove")
+
+    async def close(self):
+        try:
+            self.send("stop")
+            self.send("quit")
+        except Exception:
+            pass
+        try:
+            if self.process.poll() is None:
+                self.process.terminate()
+                await asyncio.to_thread(self.process.wait, 2)
+        except Exception:
+            try:
+                self.process.kill()
+            except Exception:
+                pass
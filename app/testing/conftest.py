@@ -111,17 +111,199 @@ async def prepare_schema():
             )
             await cur.execute(
                 """
-                CREATE TABLE IF NOT EXISTS public.analysis_lines (
-                    fen TEXT NOT NULL,
-                    depth INT NOT NULL,
-                    line_number INT NOT NULL,
-                    best_move TEXT,
-                    score_cp INT,
-                    score_mate INT,
-                    pv TEXT,
+                CREATE TABLE IF NOT EXISTS public.positions (
+                    id BIGSERIAL PRIMARY KEY,
+                    epd TEXT NOT NULL UNIQUE,
+                    zobrist BIGINT
+                );
+                """
+            )
+            await cur.execute("ALTER TABLE public.positions ADD COLUMN IF NOT EXISTS zobrist BIGINT;")
+            await cur.execute(
+                """
+                ALTER TABLE public.moves
+                    ADD COLUMN IF NOT EXISTS position_id BIGINT REFERENCES public.positions(id),
+                    ADD COLUMN IF NOT EXISTS position_before_id BIGINT REFERENCES public.positions(id),
+                    ADD COLUMN IF NOT EXISTS nag SMALLINT;
+                """
+            )
+            await cur.execute(
+                "ALTER TABLE public.evals ADD COLUMN IF NOT EXISTS position_id BIGINT REFERENCES public.positions(id);"
+            )
+            await cur.execute(
+                """
+                ALTER TABLE public.evals
+                    ADD COLUMN IF NOT EXISTS target_depth INT,
+                    ADD COLUMN IF NOT EXISTS target_time REAL,
+                    ADD COLUMN IF NOT EXISTS stopped_early BOOLEAN;
+                """
+            )
+            await cur.execute(
+                """
+                ALTER TABLE public.games
+                    ADD COLUMN IF NOT EXISTS white_elo INT,
+                    ADD COLUMN IF NOT EXISTS black_elo INT,
+                    ADD COLUMN IF NOT EXISTS explorer_indexed BOOLEAN NOT NULL DEFAULT FALSE;
+                """
+            )
+            await cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.explorer_moves (
+                    position_id BIGINT NOT NULL REFERENCES public.positions(id),
+                    move SMALLINT NOT NULL,
+                    games INT NOT NULL,
+                    white_wins INT NOT NULL,
+                    draws INT NOT NULL,
+                    black_wins INT NOT NULL,
+                    white_elo_total BIGINT NOT NULL,
+                    white_elo_games INT NOT NULL,
+                    black_elo_total BIGINT NOT NULL,
+                    black_elo_games INT NOT NULL,
+                    PRIMARY KEY (position_id, move)
+                );
+                """
+            )
+            await cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.position_occurrences (
+                    zobrist BIGINT NOT NULL,
+                    game_id INT NOT NULL REFERENCES public.games(id),
+                    ply INT NOT NULL,
+                    PRIMARY KEY (zobrist, game_id, ply)
+                );
+                """
+            )
+            await cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.position_structures (
+                    position_id BIGINT PRIMARY KEY REFERENCES public.positions(id),
+                    white_pawns BIGINT NOT NULL,
+                    black_pawns BIGINT NOT NULL,
+                    material_key BIGINT NOT NULL,
+                    king_zones SMALLINT NOT NULL
+                );
+                """
+            )
+            await cur.execute("ALTER TABLE public.position_structures ADD COLUMN IF NOT EXISTS pawn_blocks BIGINT[];")
+            await cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.game_accuracy (
+                    game_id INT PRIMARY KEY REFERENCES public.games(id),
+                    white_acpl REAL,
+                    black_acpl REAL,
+                    white_accuracy REAL,
+                    black_accuracy REAL,
+                    report JSONB NOT NULL,
+                    evaluated_plies INT NOT NULL,
+                    eval_depth_total INT NOT NULL,
+                    stale BOOLEAN NOT NULL DEFAULT FALSE,
+                    updated_at TIMESTAMP DEFAULT NOW()
+                );
+                """
+            )
+            await cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.accuracy_stale_positions (
+                    position_id BIGINT PRIMARY KEY REFERENCES public.positions(id),
+                    queued_at TIMESTAMP NOT NULL DEFAULT NOW()
+                );
+                """
+            )
+            await cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.player_game_stats (
+                    player_key TEXT NOT NULL,
+                    game_id INT NOT NULL REFERENCES public.games(id),
+                    color CHAR(1) NOT NULL,
+                    date TEXT,
+                    games INT NOT NULL,
+                    wins INT NOT NULL,
+                    draws INT NOT NULL,
+                    losses INT NOT NULL,
+                    acpl_total REAL NOT NULL,
+                    acpl_games INT NOT NULL,
+                    accuracy_total REAL NOT NULL,
+                    accuracy_games INT NOT NULL,
+                    blunders_opening INT NOT NULL,
+                    blunders_middlegame INT NOT NULL,
+                    blunders_endgame INT NOT NULL,
+                    PRIMARY KEY (player_key, game_id, color)
+                );
+                """
+            )
+            await cur.execute(
+                """
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (
+                        SELECT 1 FROM information_schema.key_column_usage
+                        WHERE table_schema = 'public' AND table_name = 'player_game_stats'
+                          AND constraint_name = 'player_game_stats_pkey' AND column_name = 'color'
+                    ) THEN
+                        ALTER TABLE public.player_game_stats
+                            DROP CONSTRAINT player_game_stats_pkey,
+                            ADD PRIMARY KEY (player_key, game_id, color);
+                    END IF;
+                END $$;
+                """
+            )
+            await cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.player_stats (
+                    player_key TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    games INT NOT NULL,
+                    wins INT NOT NULL,
+                    draws INT NOT NULL,
+                    losses INT NOT NULL,
+                    acpl_total REAL NOT NULL,
+                    acpl_games INT NOT NULL,
+                    accuracy_total REAL NOT NULL,
+                    accuracy_games INT NOT NULL,
+                    blunders_opening INT NOT NULL,
+                    blunders_middlegame INT NOT NULL,
+                    blunders_endgame INT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT NOW()
+                );
+                """
+            )
+            await cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.analysis_line_sets (
+                    position_id BIGINT NOT NULL REFERENCES public.positions(id),
+                    depth SMALLINT NOT NULL,
+                    line_count SMALLINT NOT NULL,
+                    lines BYTEA NOT NULL,
                     updated_at TIMESTAMP DEFAULT NOW(),
-                    PRIMARY KEY (fen, depth, line_number),
-                    FOREIGN KEY (fen) REFERENCES public.evals(fen)
+                    PRIMARY KEY (position_id, depth)
+                );
+                """
+            )
+            # Only the legacy FEN-keyed layout is dropped (as init_db does); a current table is kept.
+            await cur.execute(
+                """
+                DO $$
+                BEGIN
+                    IF EXISTS (
+                        SELECT 1 FROM information_schema.columns
+                        WHERE table_schema = 'public' AND table_name = 'analysis_latest' AND column_name = 'fen'
+                    ) THEN
+                        DROP TABLE public.analysis_latest;
+                    END IF;
+                END $$;
+                """
+            )
+            await cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.analysis_latest (
+                    position_id BIGINT PRIMARY KEY REFERENCES public.positions(id),
+                    depth SMALLINT NOT NULL,
+                    line_count SMALLINT NOT NULL,
+                    lines BYTEA NOT NULL,
+                    rich_depth SMALLINT NOT NULL,
+                    rich_line_count SMALLINT NOT NULL,
+                    rich_lines BYTEA NOT NULL,
+                    updated_at TIMESTAMP DEFAULT NOW()
                 );
                 """
             )
@@ -0,0 +1,31 @@
+import pytest
+
+from app.backend.services.analysis_compactor import AnalysisCompactor, retained_depths
+
+
+def test_retention_keeps_latest_depths_and_milestones():
+    depths = list(range(1, 36))
+
+    assert retained_depths(depths, keep_latest=3, milestone_step=10) == [10, 20, 30, 33, 34, 35]
+    assert retained_depths(depths, keep_latest=2, milestone_step=0) == [34, 35]
+
+
+@pytest.mark.asyncio
+async def test_compactor_walks_positions_in_batches_and_reports_reclaimed_space():
+    position_ids = list(range(1, 8))
+    calls = []
+
+    async def fake_prune(after, keep_latest, milestone_step, batch_size):
+        calls.append((after, keep_latest, milestone_step, batch_size))
+        batch = [position_id for position_id in position_ids if position_id > after][:batch_size]
+        if not batch:
+            return {"last_position_id": None, "line_sets": 0, "bytes": 0}
+        return {"last_position_id": batch[-1], "line_sets": 2 * len(batch), "bytes": 100 * len(batch)}
+
+    compactor = AnalysisCompactor(keep_latest=4, milestone_step=10, batch_size=3, prune_batch=fake_prune, batch_pause_seconds=0)
+    run = await compactor.run_once()
+
+    assert [call[0] for call in calls] == [0, 3, 6, 7]
+    assert all(call[1:] == (4, 10, 3) for call in calls)
+    assert run.as_dict()["line_sets_deleted"] == 14 and run.as_dict()["bytes_reclaimed"] == 700
+    assert compactor.metrics()["runs"] == 1 and compactor.metrics()["total"]["batches"] == 3
@@ -82,3 +82,133 @@ async def test_analyze_position_falls_back_to_direct_stockfish_session(monkeypat
     assert "uci" in latest_commands
     assert "isready" in latest_commands
     assert any(command.startswith("go depth 15 movetime 1000") for command in latest_commands)
+
+
+class _FakeGameSession(_FakeSession):
+    def __init__(self, path):
+        super().__init__(path)
+        self._lines = iter(["uciok", "readyok"])
+
+    def send(self, command: str):
+        super().send(command)
+        if command.startswith("go"):
+            self._lines = iter(["info depth 12 multipv 1 score cp 20 nodes 99 pv g1f3", "bestmove g1f3"])
+
+
+def test_game_session_sends_move_history_on_one_engine(monkeypatch):
+    session_command_logs.clear()
+
+    class _FakeSimpleEngine:
+        @staticmethod
+        def popen_uci(path):
+            raise NotImplementedError
+
+    monkeypatch.setattr(analyzer_service.chess.engine, "SimpleEngine", _FakeSimpleEngine)
+    monkeypatch.setattr(analyzer_service, "StockfishSession", _FakeGameSession)
+    rows = [
+        {"ply": 0, "san": None, "fen": analyzer_service.chess.STARTING_FEN, "is_mainline": True},
+        {"ply": 1, "san": "e4", "fen": "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1", "is_mainline": True},
+        {"ply": 2, "san": "e5", "fen": "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2", "is_mainline": True},
+    ]
+    boards = analyzer_service.build_game_boards(rows)
+    game_session = analyzer_service.GameAnalysisSession(game_key=1, stockfish_path="fake-stockfish")
+
+    try:
+        results = [game_session.analyze(boards[ply], 12, 0.1) for ply in (1, 2)]
+    finally:
+        game_session.close()
+
+    assert len(session_command_logs) == 1
+    commands = session_command_logs[0]
+    assert commands.count("ucinewgame") == 1
+    assert "position startpos moves e2e4" in commands
+    assert "position startpos moves e2e4 e7e5" in commands
+    assert [result["best_move"] for result in results] == ["g1f3", "g1f3"]
+
+
+def test_build_game_boards_restarts_from_stored_fen_when_replay_disagrees():
+    fen = "8/8/8/8/8/5k2/8/5K2 w - - 0 1"
+    boards = analyzer_service.build_game_boards([
+        {"ply": 0, "san": None, "fen": analyzer_service.chess.STARTING_FEN, "is_mainline": True},
+        {"ply": 1, "san": "e4", "fen": fen, "fen_before": analyzer_service.chess.STARTING_FEN, "is_mainline": True},
+    ])
+
+    assert boards[1].fen() == fen
+    assert boards[1].move_stack == []
+
+
+@pytest.mark.asyncio
+async def test_deadline_returns_deepest_completed_iteration_and_keeps_searching(monkeypatch):
+    import asyncio
+    import threading
+
+    fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+    release = threading.Event()
+    stored: list[dict] = []
+
+    def fake_analyze(fen, depth, time_limit, lease=None, convergence=None, progress=None):
+        for iteration in (1, 2, 3):
+            progress.observe({"best_move": "e2e4", "score_cp": 20 + iteration, "score_mate": None, "depth": iteration, "pv": "e2e4"})
+        release.wait(2)
+        final = {"best_move": "d2d4", "score_cp": 30, "score_mate": None, "depth": depth, "pv": "d2d4"}
+        progress.finish(final)
+        return final
+
+    async def fake_get_eval(fen):
+        return None
+
+    async def fake_upsert_eval(fen, **kwargs):
+        stored.append(kwargs)
+
+    monkeypatch.setattr(analyzer_service, "DB_ENABLED", True)
+    monkeypatch.setattr(analyzer_service, "get_eval", fake_get_eval)
+    monkeypatch.setattr(analyzer_service, "upsert_eval", fake_upsert_eval)
+    monkeypatch.setattr(analyzer_service, "_analyze_with_stockfish", fake_analyze)
+
+    result = await analyzer_service.analyze_position(fen, depth=18, time_limit=0, deadline_ms=50)
+
+    assert result["partial"] is True
+    assert result["background_search"] is True
+    assert result["depth"] == 2
+    assert result["score_cp"] == 22
+    assert result["requested_depth"] == 18
+    assert not stored
+
+    release.set()
+    await asyncio.gather(*analyzer_service._background_searches)
+    assert stored and stored[0]["depth"] == 18
+
+
+@pytest.mark.asyncio
+async def test_converged_result_is_a_cache_hit_for_the_same_request(monkeypatch):
+    from app.backend.services.search_convergence import ConvergencePolicy
+
+    fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+    stored: dict[str, dict] = {}
+    searches: list[int] = []
+
+    def converging_analyze(fen, depth, time_limit, lease=None, convergence=None, progress=None):
+        searches.append(depth)
+        return {"best_move": "e2e4", "score_cp": 25, "score_mate": None, "depth": 14, "pv": "e2e4", "stopped_early": True}
+
+    async def fake_get_eval(fen):
+        return stored.get(fen)
+
+    async def fake_upsert_eval(fen, **kwargs):
+        stored[fen] = kwargs
+
+    monkeypatch.setattr(analyzer_service, "DB_ENABLED", True)
+    monkeypatch.setattr(analyzer_service, "get_eval", fake_get_eval)
+    monkeypatch.setattr(analyzer_service, "upsert_eval", fake_upsert_eval)
+    monkeypatch.setattr(analyzer_service, "_analyze_with_stockfish", converging_analyze)
+    policy = ConvergencePolicy(stable_depths=3, score_tolerance_cp=10, min_depth=6)
+
+    first = await analyzer_service.analyze_position(fen, depth=20, time_limit=0, convergence=policy)
+    again = await analyzer_service.analyze_position(fen, depth=20, time_limit=0, convergence=policy)
+    full = await analyzer_service.analyze_position(fen, depth=20, time_limit=0, force_recompute=False)
+
+    assert first["cached"] is False and first["stopped_early"] is True
+    assert again["cached"] is True and again["depth"] == 14
+    assert stored[fen]["target_depth"] == 20 and stored[fen]["stopped_early"] is True
+    # A request without early stopping still searches to its full depth.
+    assert full["cached"] is False and searches == [20, 20]
@@ -0,0 +1,37 @@
+from app.backend.db.codecs import merge_lines, pack_lines, pack_move, pack_pv, unpack_lines, unpack_move, unpack_pv
+
+
+def test_moves_and_pvs_pack_to_two_bytes_per_move():
+    for uci in ("e2e4", "a7a8q", "h2h1n", "e1g1", "0000"):
+        assert unpack_move(pack_move(uci)) == uci
+
+    pv = "e2e4 e7e5 g1f3 b8c6 f1b5"
+    assert len(pack_pv(pv)) == 10
+    assert unpack_pv(pack_pv(pv)) == pv
+    assert unpack_pv(b"") == ""
+
+
+def test_line_sets_round_trip_scores_modes_and_best_move_only_lines():
+    lines = [
+        {"line_number": 2, "best_move": "d2d4", "score_cp": -15, "score_mate": None, "pv": "d2d4 d7d5", "search_mode": "multipv"},
+        {"line_number": 1, "best_move": "e2e4", "score_cp": None, "score_mate": -4, "pv": "e2e4 e7e5", "search_mode": "deep"},
+        {"line_number": 3, "best_move": "c2c4", "score_cp": None, "score_mate": None, "pv": None},
+    ]
+
+    decoded = unpack_lines(pack_lines(lines), depth=18)
+
+    assert [line["line_number"] for line in decoded] == [1, 2, 3]
+    assert decoded[0] == {
+        "depth": 18, "line_number": 1, "best_move": "e2e4", "score_cp": None, "score_mate": -4,
+        "pv": "e2e4 e7e5", "search_mode": "deep",
+    }
+    assert decoded[1]["score_cp"] == -15 and decoded[1]["search_mode"] == "multipv"
+    assert decoded[2]["best_move"] == "c2c4" and decoded[2]["pv"] == "" and decoded[2]["score_cp"] is None
+
+
+def test_merge_lines_replaces_matching_line_numbers():
+    existing = [{"line_number": 1, "best_move": "e2e4"}, {"line_number": 2, "best_move": "d2d4"}]
+
+    merged = merge_lines(existing, [{"line_number": 1, "best_move": "g1f3"}, {"line_number": 3, "best_move": "c2c4"}])
+
+    assert [line["best_move"] for line in merged] == ["g1f3", "d2d4", "c2c4"]
@@ -0,0 +1,146 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.backend.services.engine_scheduler import EnginePriority, EngineScheduler
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_granted_by_priority_then_fifo():
+    scheduler = EngineScheduler(max_concurrency=1)
+    holder = await scheduler.acquire(EnginePriority.LIVE, "holder")
+    granted: list[str] = []
+
+    async def wait_for(priority: EnginePriority, label: str) -> None:
+        lease = await scheduler.acquire(priority, label)
+        granted.append(label)
+        scheduler.release(lease)
+
+    tasks = [
+        asyncio.create_task(wait_for(EnginePriority.BATCH, "batch")),
+        asyncio.create_task(wait_for(EnginePriority.QUIZ, "quiz-1")),
+        asyncio.create_task(wait_for(EnginePriority.REST, "rest")),
+        asyncio.create_task(wait_for(EnginePriority.QUIZ, "quiz-2")),
+    ]
+    await asyncio.sleep(0)
+    assert scheduler.metrics()["waiting"] == 4
+
+    scheduler.release(holder)
+    await asyncio.gather(*tasks)
+
+    assert granted == ["rest", "quiz-1", "quiz-2", "batch"]
+    metrics = scheduler.metrics()
+    assert metrics["active"] == 0
+    assert metrics["classes"]["quiz"]["acquired"] == 2
+    assert metrics["classes"]["batch"]["max_wait_ms"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_higher_priority_waiter_preempts_lowest_priority_search():
+    scheduler = EngineScheduler(max_concurrency=2)
+    batch = await scheduler.acquire(EnginePriority.BATCH, "batch")
+    background = await scheduler.acquire(EnginePriority.BACKGROUND, "background")
+    stopped: list[str] = []
+    background.add_stop_callback(lambda: stopped.append("background"))
+
+    waiter = asyncio.create_task(scheduler.acquire(EnginePriority.LIVE, "live"))
+    await asyncio.sleep(0)
+
+    assert background.preempted is True
+    assert background.stop_requested is True
+    assert batch.stop_requested is False
+    assert stopped == ["background"]
+    assert not waiter.done()
+
+    scheduler.release(background)
+    live = await waiter
+    assert live.priority == EnginePriority.LIVE
+    assert scheduler.metrics()["classes"]["background"]["preempted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_interactive_searches_are_never_preempted():
+    scheduler = EngineScheduler(max_concurrency=1)
+    rest = await scheduler.acquire(EnginePriority.REST, "rest")
+
+    waiter = asyncio.create_task(scheduler.acquire(EnginePriority.LIVE, "live"))
+    await asyncio.sleep(0)
+
+    assert rest.stop_requested is False
+    scheduler.release(rest)
+    scheduler.release(await waiter)
+
+
+@pytest.mark.asyncio
+async def test_demoted_lease_becomes_preemptible():
+    scheduler = EngineScheduler(max_concurrency=1)
+    live = await scheduler.acquire(EnginePriority.LIVE, "live")
+
+    waiter = asyncio.create_task(scheduler.acquire(EnginePriority.REST, "rest"))
+    await asyncio.sleep(0)
+    assert live.stop_requested is False
+
+    scheduler.set_priority(live, EnginePriority.BACKGROUND)
+    assert live.preempted is True
+    assert scheduler.metrics()["classes"]["background"]["active"] == 1
+
+    scheduler.release(live)
+    scheduler.release(await waiter)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+    scheduler = EngineScheduler(max_concurrency=1)
+    holder = await scheduler.acquire(EnginePriority.REST, "holder")
+
+    waiter = asyncio.create_task(scheduler.acquire(EnginePriority.QUIZ, "quiz"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert scheduler.metrics()["waiting"] == 0
+    assert scheduler.metrics()["classes"]["quiz"]["waiting"] == 0
+    scheduler.release(holder)
+    assert scheduler.has_capacity()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_requester_stops_engine_and_frees_slot():
+    scheduler = EngineScheduler(max_concurrency=1)
+    lease = await scheduler.acquire(EnginePriority.REST, "rest")
+    engine_stopped = threading.Event()
+    lease.add_stop_callback(engine_stopped.set)
+
+    def blocking_search() -> str:
+        engine_stopped.wait(timeout=5)
+        return "bestmove e2e4"
+
+    task = asyncio.create_task(scheduler.run_in_thread(lease, blocking_search))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert lease.cancelled is True
+    assert lease.stop_requested is True
+    assert engine_stopped.is_set()
+    assert scheduler.has_capacity()
+    assert scheduler.metrics()["classes"]["rest"]["cancelled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_waiter_cancelled_after_grant_clears_waiting_gauge():
+    scheduler = EngineScheduler(max_concurrency=1)
+    holder = await scheduler.acquire(EnginePriority.REST, "holder")
+
+    waiter = asyncio.create_task(scheduler.acquire(EnginePriority.QUIZ, "quiz"))
+    await asyncio.sleep(0)
+    scheduler.release(holder)  # grants the waiter before it gets to run
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert scheduler.metrics()["classes"]["quiz"]["waiting"] == 0
+    assert scheduler.has_capacity()
@@ -0,0 +1,231 @@
+import asyncio
+import re
+
+import pytest
+
+from app.backend.services.analysis_coordinator import AnalysisCoordinator, JobSearchState
+from app.backend.services.engine_scheduler import EnginePriority, EngineScheduler
+from app.backend.services.engine_time_slicer import EngineTimeSlicer
+
+
+class _FakeAsyncSession:
+    def __init__(self) -> None:
+        self.commands: list[str] = []
+        self.searching = False
+        self.started = 0
+        self.closed = False
+        self._fen = None
+        self._depths: dict[str, int] = {}
+
+    async def start(self, options=None) -> None:
+        self.started += 1
+        self.commands.append("ucinewgame")
+
+    async def go(self, position_command: str, go_command: str = "go infinite") -> None:
+        await self.stop()
+        self.commands.append(position_command)
+        self._fen = position_command.removeprefix("position fen ")
+        # A warm hash table lets a resumed position climb back close to its previous depth.
+        self._depths[self._fen] = max(0, self._depths.get(self._fen, 0) - 2)
+        self.searching = True
+
+    async def stop(self) -> None:
+        if self.searching:
+            self.commands.append("stop")
+        self.searching = False
+
+    async def readline(self, timeout=None) -> str:
+        await asyncio.sleep(0.002)
+        self._depths[self._fen] += 1
+        return f"info depth {self._depths[self._fen]} multipv 1 score cp 12 pv e2e4 e7e5"
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_time_slicer_round_robins_positions_on_one_engine(monkeypatch):
+    import app.backend.services.engine_time_slicer as slicer_module
+
+    scheduler = EngineScheduler(max_concurrency=1)
+    monkeypatch.setattr(slicer_module, "engine_scheduler", scheduler)
+    busy = await scheduler.acquire(EnginePriority.LIVE, "busy")  # no slot frees up, so nothing is handed off
+    session = _FakeAsyncSession()
+    slicer = EngineTimeSlicer(0.01, 3, session_factory=lambda: session)
+    seen: dict[str, list[int]] = {"fen-a": [], "fen-b": []}
+
+    def handler(fen: str, target: int):
+        async def on_line(line: str) -> bool:
+            depth = int(re.search(r"depth (\d+)", line).group(1))
+            seen[fen].append(depth)
+            return depth >= target
+
+        return on_line
+
+    await asyncio.gather(
+        slicer.analyze("fen-a", handler("fen-a", 12)),
+        slicer.analyze("fen-b", handler("fen-b", 12)),
+    )
+    await asyncio.sleep(0.01)
+
+    positions = [command for command in session.commands if command.startswith("position")]
+    assert session.started == 1
+    assert session.commands.count("ucinewgame") == 1
+    assert positions[:3] == ["position fen fen-a", "position fen fen-b", "position fen fen-a"]
+    assert max(seen["fen-a"]) >= 12 and max(seen["fen-b"]) >= 12
+    assert session.closed is True
+    assert slicer.positions() == []
+    scheduler.release(busy)
+
+
+@pytest.mark.asyncio
+async def test_time_slicer_overflows_capacity_and_repays_it(monkeypatch):
+    import app.backend.services.engine_time_slicer as slicer_module
+
+    scheduler = EngineScheduler(max_concurrency=1)
+    monkeypatch.setattr(slicer_module, "engine_scheduler", scheduler)
+    busy = await scheduler.acquire(EnginePriority.LIVE, "busy")
+    session = _FakeAsyncSession()
+    slicer = EngineTimeSlicer(0.01, 3, session_factory=lambda: session)
+    seen_active: list[int] = []
+
+    async def on_line(line: str) -> bool:
+        seen_active.append(scheduler.metrics()["active"])
+        return int(re.search(r"depth (\d+)", line).group(1)) >= 3
+
+    assert await asyncio.wait_for(slicer.analyze("fen-a", on_line), timeout=1) is None
+
+    assert session.started == 1
+    assert seen_active and set(seen_active) == {2}  # the shared engine counts against capacity
+    assert scheduler.acquire_overflow(EnginePriority.LIVE, "second") is not None
+    assert scheduler.acquire_overflow(EnginePriority.LIVE, "third") is None
+    scheduler.release(busy)
+
+
+@pytest.mark.asyncio
+async def test_time_slicer_hands_positions_a_lease_once_a_slot_frees(monkeypatch):
+    import app.backend.services.engine_time_slicer as slicer_module
+
+    scheduler = EngineScheduler(max_concurrency=2)
+    monkeypatch.setattr(slicer_module, "engine_scheduler", scheduler)
+    busy = [await scheduler.acquire(EnginePriority.LIVE, "busy") for _ in range(2)]
+    session = _FakeAsyncSession()
+    slicer = EngineTimeSlicer(0.01, 3, session_factory=lambda: session)
+
+    async def never_done(line: str) -> bool:
+        return False
+
+    first = asyncio.create_task(slicer.analyze("fen-a", never_done))
+    second = asyncio.create_task(slicer.analyze("fen-b", never_done))
+    await asyncio.sleep(0.03)
+    assert not first.done() and not second.done()
+
+    for lease in busy:
+        scheduler.release(lease)
+    handed = await asyncio.wait_for(asyncio.wait([first, second], return_when=asyncio.FIRST_COMPLETED), timeout=1)
+    lease = next(iter(handed[0])).result()
+
+    assert lease is not None and lease.priority == EnginePriority.LIVE
+    assert len(slicer.positions()) == 1
+    await slicer.shutdown()
+    await asyncio.gather(first, second, return_exceptions=True)
+    scheduler.release(lease)
+    assert scheduler.metrics()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_job_line_recorder_resumes_from_stored_depth(monkeypatch):
+    coordinator = AnalysisCoordinator(poll_interval=0)
+    persisted: list[int] = []
+
+    async def fake_persist(fen, depth, depth_bucket):
+        persisted.append(depth)
+
+    async def fake_target(fen):
+        return 4
+
+    monkeypatch.setattr(coordinator, "_persist_depth_snapshot", fake_persist)
+    monkeypatch.setattr(coordinator, "_get_job_worker_target_depth", fake_target)
+    fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+    state = JobSearchState(fen=fen)
+
+    for depth in (1, 2, 3, 1, 2, 3, 4):
+        finished = await coordinator._record_job_line(state, f"info depth {depth} multipv 1 score cp 5 pv e2e4")
+
+    assert persisted == [1, 2, 3, 4]
+    assert finished is True
+
+
+@pytest.mark.asyncio
+async def test_run_analysis_job_time_slices_when_engines_are_busy(monkeypatch):
+    import app.backend.services.analysis_coordinator as coordinator_module
+
+    coordinator = AnalysisCoordinator(poll_interval=0, time_slice_ms=50)
+    sliced: list[str] = []
+
+    async def fake_analyze(fen, on_line, position_command=None):
+        sliced.append(fen)
+
+    monkeypatch.setattr(coordinator_module.engine_scheduler, "has_capacity", lambda: False)
+    monkeypatch.setattr(coordinator._time_slicer, "analyze", fake_analyze)
+
+    await coordinator._run_analysis_job("fen-1")
+
+    assert sliced == ["fen-1"]
+
+
+@pytest.mark.asyncio
+async def test_run_analysis_job_moves_off_the_slicer_onto_a_handed_lease(monkeypatch):
+    import app.backend.services.analysis_coordinator as coordinator_module
+
+    coordinator = AnalysisCoordinator(poll_interval=0, time_slice_ms=50)
+    scheduler = EngineScheduler(max_concurrency=1)
+    handed = scheduler.acquire_overflow(EnginePriority.LIVE, "handed")
+    searched: list[tuple] = []
+
+    async def fake_analyze(fen, on_line, position_command=None):
+        await on_line("info depth 7 multipv 1 score cp 5 pv e2e4")
+        return handed
+
+    async def fake_search(fen, lease, position_command=None, state=None):
+        searched.append((fen, lease, state.depth))
+
+    async def fake_persist(fen, depth, depth_bucket):
+        pass
+
+    async def fake_target(fen):
+        return 30
+
+    monkeypatch.setattr(coordinator_module, "engine_scheduler", scheduler)
+    monkeypatch.setattr(scheduler, "has_capacity", lambda: False)
+    monkeypatch.setattr(coordinator._time_slicer, "analyze", fake_analyze)
+    monkeypatch.setattr(coordinator, "_search_analysis_job", fake_search)
+    monkeypatch.setattr(coordinator, "_persist_depth_snapshot", fake_persist)
+    monkeypatch.setattr(coordinator, "_get_job_worker_target_depth", fake_target)
+
+    await coordinator._run_analysis_job("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
+
+    assert searched == [("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", handed, 7)]
+    assert scheduler.metrics()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_time_slicer_finishes_terminal_positions_instead_of_restarting(monkeypatch):
+    import app.backend.services.engine_time_slicer as slicer_module
+
+    class _MatedSession(_FakeAsyncSession):
+        async def readline(self, timeout=None) -> str:
+            await asyncio.sleep(0)
+            self.searching = False
+            return "bestmove (none)"
+
+    scheduler = EngineScheduler(max_concurrency=1)
+    monkeypatch.setattr(slicer_module, "engine_scheduler", scheduler)
+    session = _MatedSession()
+    slicer = EngineTimeSlicer(0.01, 3, session_factory=lambda: session)
+
+    async def never_done(line: str) -> bool:
+        return False
+
+    assert await asyncio.wait_for(slicer.analyze("fen-mate", never_done), timeout=1) is None
+    assert [command for command in session.commands if command.startswith("position")] == ["position fen fen-mate"]
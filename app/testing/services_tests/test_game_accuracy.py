@@ -0,0 +1,75 @@
+import pytest
+
+from app.backend.services import game_accuracy
+from app.backend.services.game_accuracy import compute_games_accuracy, critical_plies
+
+
+def _rows(scores):
+    rows = []
+    for ply, score in enumerate(scores):
+        cp, mate = (None, None) if score is None else (score if isinstance(score, int) else None, None)
+        if isinstance(score, str):
+            mate = int(score[1:])
+        rows.append({"ply": ply, "score_cp": cp, "score_mate": mate, "depth": None if score is None else 20})
+    return rows
+
+
+def test_accuracy_measures_losses_from_the_movers_point_of_view():
+    # 1. ok, 1... inaccuracy, 2. blunder (white drops a piece), 2... accurate
+    results = compute_games_accuracy({1: _rows([20, 30, 100, -300, -290])})
+    report = results[1]
+
+    assert [move["cpl"] for move in report["moves"]] == [0, 70, 400, 10]
+    assert [move["classification"] for move in report["moves"]] == [None, "inaccuracy", "blunder", None]
+    assert [move["nag"] for move in report["moves"]] == [None, 6, 4, None]
+    assert report["white"]["acpl"] == 200.0 and report["white"]["blunders"] == 1
+    assert report["black"]["acpl"] == 40.0 and report["black"]["inaccuracies"] == 1
+    assert report["black"]["accuracy"] > report["white"]["accuracy"]
+    assert critical_plies(report) == [2]
+
+
+def test_missing_evals_and_mates_are_handled_per_game_in_one_batch():
+    results = compute_games_accuracy({
+        7: _rows([0, None, 10]),
+        8: _rows([0, "#3", "#0"]),
+        9: [],
+    })
+
+    assert set(results) == {7, 8}
+    assert [move["cpl"] for move in results[7]["moves"]] == [None, None]
+    assert results[7]["white"]["moves"] == 0 and results[7]["white"]["acpl"] is None
+    assert results[7]["evaluated_plies"] == 2 and results[7]["eval_depth_total"] == 40
+    # White finds a forced mate, black gets mated: no loss for either side.
+    assert [move["cpl"] for move in results[8]["moves"]] == [0, 0]
+
+
+def test_side_to_move_comes_from_the_fen_for_games_set_up_with_black_to_move():
+    fens = ["4k3/8/8/8/8/8/8/4K3 b - - 0 1", "4k3/8/8/8/8/8/8/4K3 w - - 1 2", "4k3/8/8/8/8/8/8/4K3 b - - 2 2"]
+    rows = [{**row, "fen": fen} for row, fen in zip(_rows([0, 300, 310]), fens)]
+
+    report = compute_games_accuracy({1: rows})[1]
+
+    # ... Ke7 hands white +300 (black's blunder); Kd1 gains 10 (no loss for white).
+    assert [move["side"] for move in report["moves"]] == ["black", "white"]
+    assert [move["cpl"] for move in report["moves"]] == [300, 0]
+    assert report["black"]["blunders"] == 1 and report["white"]["blunders"] == 0
+
+
+@pytest.mark.asyncio
+async def test_refresh_tags_the_position_before_each_mistake(monkeypatch):
+    saved = []
+
+    async def fake_get_games_evals(game_ids):
+        return {game_id: _rows([20, 30, 100, -300, -290]) for game_id in game_ids}
+
+    async def fake_save(results):
+        saved.extend(results)
+        return len(results)
+
+    monkeypatch.setattr(game_accuracy, "get_games_evals", fake_get_games_evals)
+    monkeypatch.setattr(game_accuracy, "save_game_accuracy", fake_save)
+
+    results = await game_accuracy.refresh_games_accuracy([3, 4])
+
+    assert set(results) == {3, 4}
+    assert [result["critical_plies"] for result in saved] == [[2], [2]]
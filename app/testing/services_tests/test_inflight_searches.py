@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from app.backend.services.inflight_searches import InFlightSearches, SearchProgress, canonical_position
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_search():
+    registry = InFlightSearches(poll_seconds=0.001)
+    started: list[str] = []
+    release = asyncio.Event()
+
+    async def start(progress):
+        started.append("search")
+        await release.wait()
+        return {"best_move": "e2e4", "score_cp": 20, "depth": 20, "pv": "e2e4 e7e5"}
+
+    first = asyncio.create_task(registry.run(START_FEN, 20, 1, start, time_limit=0.5))
+    await asyncio.sleep(0)
+    # Same position with different move clocks, a shallower request and a shorter budget.
+    second = asyncio.create_task(
+        registry.run(START_FEN.replace(" 0 1", " 4 9"), 18, 1, start, time_limit=0.25)
+    )
+    await asyncio.sleep(0.01)
+    release.set()
+
+    owner, attached = await asyncio.gather(first, second)
+    assert started == ["search"]
+    assert "shared" not in owner
+    assert attached["shared"] is True and attached["best_move"] == "e2e4"
+    assert registry.metrics() == {"in_flight": 0, "started": 1, "attached": 1, "snapshot_answers": 0}
+
+
+@pytest.mark.asyncio
+async def test_shallower_caller_returns_with_intermediate_snapshot():
+    registry = InFlightSearches(poll_seconds=0.001)
+    release = asyncio.Event()
+
+    async def deep_search(progress):
+        for depth in (10, 11, 12, 13):
+            progress.observe({"best_move": "d2d4", "depth": depth, "pv": "d2d4"})
+        await release.wait()
+        return {"best_move": "e2e4", "depth": 30}
+
+    owner = asyncio.create_task(registry.run(START_FEN, 30, 1, deep_search))
+    await asyncio.sleep(0.01)
+
+    async def never_started(progress):
+        raise AssertionError("should attach to the running search")
+
+    attached = await registry.run(START_FEN, 12, 1, never_started)
+    assert attached["depth"] == 12 and attached["shared"] is True
+    assert registry.find(START_FEN, 40) is None
+    assert registry.find(START_FEN, 20, multipv=3) is None
+
+    release.set()
+    assert (await owner)["depth"] == 30
+
+
+@pytest.mark.asyncio
+async def test_search_is_cancelled_when_every_caller_leaves():
+    registry = InFlightSearches(poll_seconds=0.001)
+    cancelled = asyncio.Event()
+
+    async def start(progress):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    callers = [asyncio.create_task(registry.run(START_FEN, 20, 1, start)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+
+    callers[0].cancel()
+    await asyncio.sleep(0.01)
+    assert not cancelled.is_set()
+
+    callers[1].cancel()
+    await asyncio.gather(*callers, return_exceptions=True)
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert registry.find(START_FEN, 20) is None
+    assert canonical_position(START_FEN) == "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq -"
+
+
+@pytest.mark.asyncio
+async def test_attached_caller_stops_waiting_when_search_narrows_its_lines():
+    registry = InFlightSearches(poll_seconds=0.001)
+    release = asyncio.Event()
+    progress_task = asyncio.ensure_future(release.wait())
+    search = registry.register(START_FEN, 70, 3, progress_task, progress=SearchProgress(), owned=False)
+
+    waiter = asyncio.create_task(registry.attach(search, 20, multipv=3))
+    await asyncio.sleep(0.01)
+    assert registry.find(START_FEN, 20, multipv=3) is search
+
+    search.multipv = 1  # live job entered its single-line deep phase
+    assert await asyncio.wait_for(waiter, 1) is None
+    assert registry.find(START_FEN, 20, multipv=3) is None
+    release.set()
+    await progress_task
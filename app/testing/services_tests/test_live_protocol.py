@@ -0,0 +1,123 @@
+import asyncio
+import json
+
+from app.backend.services import live_protocol
+from app.backend.services.live_protocol import LiveProtocol, ProtocolWebSocket, apply_delta, diff_event
+
+
+def _snapshot(depth: int, lines: list[tuple[int, int, str]]) -> dict:
+    return {
+        "type": "snapshot",
+        "fen": "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+        "depth": depth,
+        "display_locked": False,
+        "lines": [{"line_number": number, "score_cp": score, "pv": pv} for number, score, pv in lines],
+    }
+
+
+class RecordingWebSocket:
+    def __init__(self) -> None:
+        self.text: list[dict] = []
+        self.binary: list[bytes] = []
+
+    async def send_json(self, payload: dict) -> None:
+        self.text.append(payload)
+
+    async def send_bytes(self, payload: bytes) -> None:
+        self.binary.append(payload)
+
+
+def test_diff_round_trips_changed_fields_and_lines():
+    base = {**_snapshot(18, [(1, 30, "e2e4 e7e5"), (2, 20, "d2d4"), (3, 10, "c2c4")]), "seq": 1}
+    event = {**_snapshot(19, [(1, 35, "e2e4 e7e5"), (2, 20, "d2d4")]), "seq": 2}
+    del event["display_locked"]
+
+    delta = {"seq": 2, **diff_event(base, event)}
+
+    assert delta["set"] == {"depth": 19}
+    assert delta["unset"] == ["display_locked"]
+    assert [line["line_number"] for line in delta["lines"]] == [1]
+    assert delta["drop_lines"] == [3]
+    assert apply_delta(base, delta) == event
+
+
+def test_delta_without_lines_drops_the_base_lines():
+    base = {**_snapshot(18, [(1, 30, "e2e4")]), "seq": 1}
+    event = {key: value for key, value in base.items() if key != "lines"}
+    event["seq"] = 2
+
+    rebuilt = apply_delta(base, {"seq": 2, **diff_event(base, event)})
+
+    assert "lines" not in rebuilt
+    assert rebuilt == event
+
+
+def test_deltas_start_after_an_ack_and_stay_against_the_acked_base():
+    protocol = LiveProtocol()
+    assert protocol.handle_control('{"type": "hello", "delta": true}')[0]["delta"] is True
+
+    first = protocol.prepare(_snapshot(10, [(1, 30, "e2e4")]))
+    assert first["type"] == "snapshot" and first["seq"] == 1
+    protocol.handle_control(json.dumps({"type": "ack", "seq": first["seq"]}))
+
+    second = protocol.prepare(_snapshot(11, [(1, 30, "e2e4")]))
+    third = protocol.prepare(_snapshot(12, [(1, 40, "e2e4 e7e5")]))
+
+    assert second == {"type": "delta", "event": "snapshot", "seq": 2, "base": 1, "set": {"depth": 11}}
+    assert third["base"] == 1 and third["set"] == {"depth": 12}
+    assert apply_delta(first, third) == {**_snapshot(12, [(1, 40, "e2e4 e7e5")]), "seq": 3}
+
+    protocol.acknowledge(1)  # stale ack never moves the base back
+    protocol.acknowledge(3)
+    assert protocol.prepare(_snapshot(12, [(1, 40, "e2e4 e7e5")]))["base"] == 3
+
+
+def test_resync_resends_latest_events_in_full():
+    protocol = LiveProtocol(delta=True)
+    snapshot = protocol.prepare(_snapshot(10, [(1, 30, "e2e4")]))
+    protocol.prepare({"type": "status", "status": "analysis_running", "fen": snapshot["fen"]})
+    protocol.acknowledge(snapshot["seq"])
+
+    replies = protocol.handle_control('{"type": "resync"}')
+
+    assert [reply["type"] for reply in replies] == ["snapshot", "status"]
+    assert protocol.prepare(replies[0])["type"] == "snapshot"
+
+
+def test_control_messages_are_told_apart_from_analysis_requests():
+    protocol = LiveProtocol()
+
+    assert protocol.handle_control('{"fen": "8/8/8/8/8/8/8/K6k w - - 0 1"}') is None
+    assert protocol.handle_control("8/8/8/8/8/8/8/K6k w - - 0 1") is None
+    assert protocol.handle_control('{"type": "ack", "seq": "nope"}') == []
+    assert protocol.prepare({"type": "error", "message": "x"}) == {"type": "error", "message": "x"}
+
+
+def test_binary_encodings_fall_back_to_json_when_missing(monkeypatch):
+    monkeypatch.setattr(live_protocol, "msgpack", None)
+    monkeypatch.setattr(live_protocol, "cbor2", None)
+    protocol = LiveProtocol()
+
+    reply = protocol.handle_control('{"type": "hello", "encoding": "msgpack"}')[0]
+
+    assert reply["encoding"] == "json"
+    assert reply["available_encodings"] == ["json"]
+    websocket = RecordingWebSocket()
+    asyncio.run(ProtocolWebSocket(websocket, protocol).send_json(reply))
+    assert websocket.text == [reply] and websocket.binary == []
+
+
+def test_msgpack_events_go_out_as_binary_frames(monkeypatch):
+    class FakeMsgpack:
+        @staticmethod
+        def packb(message, use_bin_type=True):
+            return json.dumps(message).encode()
+
+    monkeypatch.setattr(live_protocol, "msgpack", FakeMsgpack)
+    protocol = LiveProtocol(encoding="msgpack")
+    websocket = RecordingWebSocket()
+
+    asyncio.run(ProtocolWebSocket(websocket, protocol).send_json({"type": "error", "message": "x"}))
+
+    assert protocol.encoding == "msgpack"
+    assert websocket.text == [] and json.loads(websocket.binary[0]) == {"type": "error", "message": "x"}
@@ -0,0 +1,64 @@
+from app.backend.db.db import _player_contributions, player_key
+from app.backend.services.game_accuracy import compute_games_accuracy
+
+ENDGAME_FEN = "8/5k2/8/3r4/8/2R5/5K2/8 b - - 0 40"
+
+
+def _report():
+    rows = [
+        {"ply": 0, "score_cp": 20, "score_mate": None, "depth": 20},
+        {"ply": 1, "score_cp": -300, "score_mate": None, "depth": 20},
+        {"ply": 2, "score_cp": -290, "score_mate": None, "depth": 20},
+        {"ply": 29, "fen": ENDGAME_FEN, "score_cp": 0, "score_mate": None, "depth": 20},
+        {"ply": 30, "score_cp": 500, "score_mate": None, "depth": 20},
+    ]
+    return compute_games_accuracy({5: rows})[5]
+
+
+def test_blunders_are_tagged_with_the_phase_they_were_played_in():
+    report = _report()
+
+    assert [(move["ply"], move["phase"], move["classification"]) for move in report["moves"]] == [
+        (1, "opening", "blunder"),
+        (2, "opening", None),
+        (29, "opening", None),
+        (30, "endgame", "blunder"),
+    ]
+
+
+def test_player_contributions_split_results_and_blunder_phases_by_side():
+    game = {"white": "  Magnus   Carlsen ", "black": "?", "result": "1-0", "date": "2026.01.02"}
+
+    rows = _player_contributions(_report(), game)
+
+    assert len(rows) == 1  # unknown opponent is not tracked
+    white = rows[0]
+    assert white["player_key"] == player_key("magnus carlsen") == "magnus carlsen"
+    assert white["name"] == "Magnus Carlsen"
+    assert (white["games"], white["wins"], white["draws"], white["losses"]) == (1, 1, 0, 0)
+    assert (white["blunders_opening"], white["blunders_middlegame"], white["blunders_endgame"]) == (1, 0, 0)
+    assert white["acpl_games"] == 1 and white["acpl_total"] > 0
+
+
+def test_player_contributions_keep_both_sides_of_a_same_name_game():
+    game = {"white": "Test Engine", "black": "test  engine", "result": "0-1", "date": None}
+
+    rows = _player_contributions(_report(), game)
+
+    assert [(row["player_key"], row["color"]) for row in rows] == [("test engine", "W"), ("test engine", "B")]
+    assert [(row["wins"], row["losses"]) for row in rows] == [(0, 1), (1, 0)]
+
+
+def test_player_contributions_credit_blunders_to_the_side_that_played_them():
+    # Game set up with Black to move: the first move (ply 1) is Black's.
+    report = {
+        "game_id": 6,
+        "white": {"acpl": None, "accuracy": None},
+        "black": {"acpl": 300.0, "accuracy": 10.0},
+        "moves": [{"ply": 1, "side": "black", "phase": "endgame", "classification": "blunder"}],
+    }
+    game = {"white": "White Player", "black": "Black Player", "result": "1-0", "date": None}
+
+    white, black = _player_contributions(report, game)
+
+    assert (white["blunders_endgame"], black["blunders_endgame"]) == (0, 1)
@@ -0,0 +1,25 @@
+import chess
+
+from app.backend.db.db import position_key, position_zobrist
+
+
+def test_position_key_ignores_move_clocks_and_matches_polyglot_zobrist():
+    board = chess.Board()
+    board.push_san("Nf3")
+    board.push_san("Nf6")
+    board.push_san("Ng1")
+    board.push_san("Ng8")
+
+    assert position_key(board.fen()) == position_key(chess.STARTING_FEN)
+    assert position_zobrist(chess.STARTING_FEN) == 0x463B96181691FC9C
+    assert position_zobrist(board.fen()) == position_zobrist(chess.STARTING_FEN)
+
+
+def test_position_zobrist_fits_signed_bigint():
+    board = chess.Board("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+    key = chess.polyglot.zobrist_hash(board)
+
+    stored = position_zobrist(board.fen())
+
+    assert -(1 << 63) <= stored < 1 << 63
+    assert stored % (1 << 64) == key
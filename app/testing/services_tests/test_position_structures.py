@@ -0,0 +1,51 @@
+import chess
+
+from app.backend.db.structures import PAWN_BLOCK_COUNT, king_zone, material_key, pawn_distance, position_structure
+
+START = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+AFTER_E4 = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+# Same pawns and material as AFTER_E4, different pieces placement and move clocks.
+AFTER_E4_NF3_NC6 = "r1bqkbnr/pppppppp/2n5/8/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 2 2"
+
+
+def test_structure_ignores_piece_placement_but_not_pawns():
+    assert position_structure(AFTER_E4) == position_structure(AFTER_E4_NF3_NC6)
+    assert position_structure(START)["material_key"] == position_structure(AFTER_E4)["material_key"]
+    assert pawn_distance(position_structure(START), position_structure(AFTER_E4)) == 2
+
+
+def test_material_key_packs_counts_per_side():
+    board = chess.Board("4k3/8/8/8/8/8/4P3/R3K3 w - - 0 1")
+
+    assert material_key(board) == (1 << 32) | (1 << 20)  # White: one rook, one pawn; Black: nothing
+
+
+def test_king_zones_split_files_and_home_ranks():
+    castled = chess.Board("r4rk1/8/8/8/8/8/8/2KR4 w - - 0 1")
+    advanced = chess.Board("8/8/8/3k4/8/8/8/K7 w - - 0 1")
+
+    assert (king_zone(castled, chess.WHITE), king_zone(castled, chess.BLACK)) == (0, 2)
+    assert (king_zone(advanced, chess.WHITE), king_zone(advanced, chess.BLACK)) == (0, 4)
+
+
+def test_pawn_on_h8_still_fits_a_signed_bigint():
+    # Set-up FEN with a (never promoted) white pawn on h8: bit 63 of the bitboard.
+    structure = position_structure("4k2P/8/8/8/8/8/8/4K3 w - - 0 1")
+
+    assert structure["white_pawns"] == -(1 << 63)
+    assert pawn_distance(structure, position_structure("4k3/8/8/8/8/8/8/4K3 w - - 0 1")) == 1
+
+
+def test_near_structures_share_a_pawn_block_key():
+    start, after_e4 = position_structure(START), position_structure(AFTER_E4)
+    far = position_structure("rnbqkbnr/8/pppppppp/8/8/PPPPPPPP/8/RNBQKBNR w KQkq - 0 1")
+
+    assert len(start["pawn_blocks"]) == PAWN_BLOCK_COUNT
+    assert len(set(start["pawn_blocks"]) & set(after_e4["pawn_blocks"])) == PAWN_BLOCK_COUNT - 1
+    assert pawn_distance(start, far) >= PAWN_BLOCK_COUNT and not set(start["pawn_blocks"]) & set(far["pawn_blocks"])
+    # Same pawns, different material: no shared key.
+    assert not set(after_e4["pawn_blocks"]) & set(position_structure("4k3/pppppppp/8/8/4P3/8/PPPP1PPP/4K3 w - - 0 1")["pawn_blocks"])
+
+
+def test_invalid_fen_has_no_structure():
+    assert position_structure("not a fen") is None
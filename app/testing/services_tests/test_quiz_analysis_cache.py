@@ -0,0 +1,254 @@
+import pytest
+
+import app.backend.services.quiz_results_service as quiz
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+
+def _line(number, move, cp):
+    return {"depth": 32, "line_number": number, "best_move": move, "score_cp": cp, "score_mate": None, "pv": f"{move} e7e5"}
+
+
+@pytest.mark.asyncio
+async def test_quiz_positions_use_stored_multi_line_snapshots(monkeypatch):
+    async def fake_snapshot(fen, target_depth=None, prefer_richer_lines=False):
+        lines = [_line(1, "e2e4", 30), _line(2, "d2d4", 25), _line(3, "g1f3", 20)]
+        return {"fen": fen, "depth": 32, **lines[0], "lines": lines}
+
+    async def no_search(*args, **kwargs):
+        raise AssertionError("a cached position must not start an engine")
+
+    monkeypatch.setattr(quiz, "DB_ENABLED", True)
+    monkeypatch.setattr(quiz, "get_latest_analysis_snapshot", fake_snapshot)
+    monkeypatch.setattr(quiz.inflight_searches, "run", no_search)
+
+    result = await quiz._analyze_position_multipv(START_FEN, depth=20)
+
+    assert result["best_move"] == "e2e4" and result["best_move_san"] == "e4"
+    assert [line["multipv"] for line in result["lines"]] == [1, 2, 3]
+    assert result["lines"][1]["pv_san"] == "1. d4 e5"
+
+
+@pytest.mark.asyncio
+async def test_shallow_snapshots_are_searched_and_stored(monkeypatch):
+    stored: dict[str, object] = {}
+
+    async def shallow_snapshot(fen, target_depth=None, prefer_richer_lines=False):
+        return {"fen": fen, "depth": 12, "lines": [_line(1, "e2e4", 30)] * 3}
+
+    def fake_multipv(fen, depth, time_limit, num_lines=3, lease=None, score_moves=(), progress=None):
+        lines = [
+            {"best_move": "d2d4", "best_move_san": "d4", "score_cp": 18, "score_mate": None, "depth": 20,
+             "pv_san": "1. d4", "pv_uci": "d2d4", "multipv": 1},
+        ]
+        return lines, {}
+
+    async def fake_upsert(fen, **kwargs):
+        stored["eval"] = kwargs
+
+    async def fake_store_lines(fen, depth, lines):
+        stored["lines"] = (depth, lines)
+
+    monkeypatch.setattr(quiz, "DB_ENABLED", True)
+    monkeypatch.setattr(quiz, "get_latest_analysis_snapshot", shallow_snapshot)
+    monkeypatch.setattr(quiz, "_run_multipv_analysis", fake_multipv)
+    monkeypatch.setattr(quiz, "upsert_eval", fake_upsert)
+    monkeypatch.setattr(quiz, "store_analysis_lines", fake_store_lines)
+
+    result = await quiz._analyze_position_multipv(START_FEN, depth=20)
+
+    assert result["best_move"] == "d2d4"
+    assert stored["eval"]["depth"] == 20 and stored["eval"]["pv"] == "d2d4"
+    assert stored["lines"] == (20, [{"best_move": "d2d4", "score_cp": 18, "score_mate": None, "pv": "d2d4", "search_mode": "multipv"}])
+
+
+@pytest.mark.asyncio
+async def test_quiz_responses_are_evaluated_concurrently_in_order(monkeypatch):
+    import asyncio
+
+    running = 0
+    peak = 0
+
+    async def slow_multipv(fen, depth, time_limit, score_moves=()):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02 if fen == START_FEN else 0.01)
+        running -= 1
+        return {"best_move": "e2e4", "best_move_san": "e4", "score_cp": 30, "score_mate": None, "depth": 20, "lines": []}
+
+    monkeypatch.setattr(quiz, "_analyze_position_multipv", slow_multipv)
+    monkeypatch.setattr(quiz, "QUIZ_EVALUATION_CONCURRENCY", 2)
+    after_e4 = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+    responses = [
+        {"ply": 1, "fen_before": START_FEN, "user_move": "e2e4", "expected_move": "e4"},
+        {"ply": 2, "fen_before": after_e4, "user_move": "e7e5", "expected_move": "c5"},
+        {"ply": 3, "fen_before": START_FEN, "user_move": "d2d4", "expected_move": "c4"},
+    ]
+
+    result = await quiz.evaluate_quiz_response(1, responses)
+
+    assert peak == 2
+    assert [entry["ply"] for entry in result["results"]] == [1, 2, 3]
+    assert [entry["result_type"] for entry in result["results"]] == ["full", "fail", "fail"]
+
+
+@pytest.mark.asyncio
+async def test_game_move_outside_the_top_lines_is_scored_with_searchmoves(monkeypatch):
+    scored: list[tuple] = []
+
+    async def fake_snapshot(fen, target_depth=None, prefer_richer_lines=False):
+        lines = [_line(1, "e2e4", 30), _line(2, "d2d4", 25), _line(3, "g1f3", 20)]
+        return {"fen": fen, "depth": 32, **lines[0], "lines": lines}
+
+    async def fake_score_moves(fen, moves, depth, time_limit):
+        scored.append((tuple(moves), depth))
+        return {"a2a3": {"score_cp": -40, "score_mate": None}}
+
+    monkeypatch.setattr(quiz, "DB_ENABLED", True)
+    monkeypatch.setattr(quiz, "get_latest_analysis_snapshot", fake_snapshot)
+    monkeypatch.setattr(quiz, "_score_moves", fake_score_moves)
+    responses = [
+        {"ply": 1, "fen_before": START_FEN, "user_move": "d2d4", "expected_move": "d4"},
+        {"ply": 1, "fen_before": START_FEN, "user_move": "a2a3", "expected_move": "a3"},
+    ]
+
+    result = await quiz.evaluate_quiz_response(1, responses)
+
+    # d4 heads the second line, so only a3 needs a searchmoves search, at the depth the lines reached.
+    assert scored == [(("a2a3",), 32)]
+    assert [entry["eval_swing_cp"] for entry in result["results"]] == [5, 70]
+    assert [entry["result_type"] for entry in result["results"]] == ["partial", "partial"]
+
+
+@pytest.mark.asyncio
+async def test_joined_search_scores_the_attached_submissions_moves_in_its_own_session(monkeypatch):
+    import asyncio
+    import time
+
+    searches: list[tuple] = []
+
+    def waiting_multipv(fen, depth, time_limit, num_lines=3, lease=None, score_moves=(), progress=None):
+        searches.append(tuple(score_moves))
+        deadline = time.monotonic() + 2
+        while "a2a3" not in progress.requested_moves() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        line = {"best_move": "e2e4", "best_move_san": "e4", "score_cp": 30, "score_mate": None, "depth": depth,
+                "pv_san": "1. e4", "pv_uci": "e2e4", "multipv": 1}
+        scores = {move: {"score_cp": -10, "score_mate": None} for move in [*score_moves, *progress.requested_moves()]}
+        return [line], scores
+
+    async def no_separate_engine(*args):
+        raise AssertionError("moves requested from a running search must not start another engine")
+
+    monkeypatch.setattr(quiz, "DB_ENABLED", False)
+    monkeypatch.setattr(quiz, "_run_multipv_analysis", waiting_multipv)
+    monkeypatch.setattr(quiz, "_score_moves", no_separate_engine)
+
+    first = asyncio.create_task(quiz._analyze_position_multipv(START_FEN, depth=20, time_limit=0, score_moves=("d2d4",)))
+    await asyncio.sleep(0)
+    second = await quiz._analyze_position_multipv(START_FEN, depth=20, time_limit=0, score_moves=("a2a3",))
+
+    assert searches == [("d2d4",)]
+    assert second["move_scores"]["a2a3"] == {"score_cp": -10, "score_mate": None}
+    assert set((await first)["move_scores"]) == {"d2d4", "a2a3"}
+
+
+@pytest.mark.asyncio
+async def test_precompute_analyses_each_quiz_position_in_the_background(monkeypatch):
+    calls: list[tuple] = []
+
+    async def fake_multipv(fen, depth, time_limit=0.5, score_moves=(), priority=None):
+        calls.append((fen, depth, time_limit, priority))
+        return {"lines": []}
+
+    monkeypatch.setattr(quiz, "DB_ENABLED", True)
+    monkeypatch.setattr(quiz, "_analyze_position_multipv", fake_multipv)
+
+    task = quiz.schedule_quiz_precompute([START_FEN, None, START_FEN], depth=22)
+    await task
+
+    assert calls == [(START_FEN, 22, 0, quiz.EnginePriority.BACKGROUND)]
+    assert quiz.schedule_quiz_precompute([START_FEN], depth=0) is None
+
+
+@pytest.mark.asyncio
+async def test_time_capped_quiz_result_is_reused_for_the_same_limits(monkeypatch):
+    stored: dict[str, object] = {}
+
+    async def snapshot_after_capped_search(fen, target_depth=None, prefer_richer_lines=False):
+        lines = [{**_line(number, move, cp), "depth": 14} for number, move, cp in ((1, "e2e4", 30), (2, "d2d4", 25), (3, "g1f3", 20))]
+        return {"fen": fen, "depth": 14, **lines[0], "lines": lines, **stored.get("limits", {}), "eval_depth": 14}
+
+    def capped_multipv(fen, depth, time_limit, num_lines=3, lease=None, score_moves=(), progress=None):
+        lines = [
+            {"best_move": "e2e4", "best_move_san": "e4", "score_cp": 30, "score_mate": None, "depth": 14,
+             "pv_san": "1. e4", "pv_uci": "e2e4", "multipv": 1},
+        ]
+        return lines, {}
+
+    async def fake_upsert(fen, **kwargs):
+        stored["limits"] = {key: kwargs.get(key) for key in ("target_depth", "target_time", "stopped_early")}
+
+    async def fake_store_lines(fen, depth, lines):
+        pass
+
+    monkeypatch.setattr(quiz, "DB_ENABLED", True)
+    monkeypatch.setattr(quiz, "get_latest_analysis_snapshot", snapshot_after_capped_search)
+    monkeypatch.setattr(quiz, "_run_multipv_analysis", capped_multipv)
+    monkeypatch.setattr(quiz, "upsert_eval", fake_upsert)
+    monkeypatch.setattr(quiz, "store_analysis_lines", fake_store_lines)
+
+    assert await quiz._cached_multipv(START_FEN, 20, 0.5) is None
+    await quiz._analyze_position_multipv(START_FEN, depth=20, time_limit=0.5)
+    assert stored["limits"] == {"target_depth": 20, "target_time": 0.5, "stopped_early": False}
+
+    assert (await quiz._cached_multipv(START_FEN, 20, 0.5))["depth"] == 14
+    assert (await quiz._cached_multipv(START_FEN, 18, 0.25))["depth"] == 14
+    assert await quiz._cached_multipv(START_FEN, 20, 1.0) is None
+    assert await quiz._cached_multipv(START_FEN, 20, 0) is None
+
+
+@pytest.mark.asyncio
+async def test_preempted_precompute_is_requeued_without_storing_partial_lines(monkeypatch):
+    from app.backend.services.engine_scheduler import EngineLease
+
+    attempts: list[bool] = []
+    stored: list[int] = []
+
+    async def no_snapshot(fen, target_depth=None, prefer_richer_lines=False):
+        return None
+
+    class FakeLeaseContext:
+        async def __aenter__(self):
+            self.lease = EngineLease(priority=quiz.EnginePriority.BACKGROUND)
+            return self.lease
+
+        async def __aexit__(self, *exc):
+            return False
+
+    async def run_in_thread(lease, fn, fen, depth, time_limit, num_lines, lease_arg, score_moves, progress):
+        lease.preempted = not attempts  # the first attempt is cut short
+        attempts.append(lease.preempted)
+        reached = 9 if lease.preempted else depth
+        line = {"best_move": "e2e4", "best_move_san": "e4", "score_cp": 30, "score_mate": None, "depth": reached,
+                "pv_san": "1. e4", "pv_uci": "e2e4", "multipv": 1}
+        return [line], {}
+
+    async def fake_upsert(fen, **kwargs):
+        stored.append(kwargs["depth"])
+
+    async def fake_store_lines(fen, depth, lines):
+        pass
+
+    monkeypatch.setattr(quiz, "DB_ENABLED", True)
+    monkeypatch.setattr(quiz, "get_latest_analysis_snapshot", no_snapshot)
+    monkeypatch.setattr(quiz.engine_scheduler, "lease", lambda priority, label=None: FakeLeaseContext())
+    monkeypatch.setattr(quiz.engine_scheduler, "run_in_thread", run_in_thread)
+    monkeypatch.setattr(quiz, "upsert_eval", fake_upsert)
+    monkeypatch.setattr(quiz, "store_analysis_lines", fake_store_lines)
+
+    await quiz.schedule_quiz_precompute([START_FEN], depth=20)
+
+    assert attempts == [True, False]
+    assert stored == [20]
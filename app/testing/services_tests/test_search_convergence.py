@@ -0,0 +1,57 @@
+from app.backend.services.search_convergence import ConvergencePolicy, ConvergenceTracker
+
+
+def _feed(tracker: ConvergenceTracker, updates) -> int | None:
+    for depth, move, score_cp, score_mate in updates:
+        if tracker.observe(depth, move, score_cp, score_mate):
+            return depth
+    return None
+
+
+def test_tracker_stops_after_stable_depths_past_min_depth():
+    tracker = ConvergenceTracker(ConvergencePolicy(stable_depths=3, score_tolerance_cp=10, min_depth=6))
+    updates = [(depth, "e2e4", 30 + (depth % 2) * 5, None) for depth in range(1, 20)]
+
+    stopped_on = _feed(tracker, updates)
+
+    # Depth 6 is the first completed depth past the minimum with three stable transitions behind it.
+    assert stopped_on == 7
+    assert tracker.stop_reason == "converged"
+    assert tracker.stopped_at_depth == 6
+
+
+def test_tracker_resets_when_best_move_or_score_changes():
+    tracker = ConvergenceTracker(ConvergencePolicy(stable_depths=2, score_tolerance_cp=10, min_depth=1))
+    updates = [
+        (1, "e2e4", 20, None),
+        (2, "e2e4", 25, None),
+        (3, "d2d4", 25, None),
+        (4, "d2d4", 60, None),
+        (5, "d2d4", 62, None),
+        (6, "d2d4", 61, None),
+        (7, "d2d4", 61, None),
+    ]
+
+    assert _feed(tracker, updates) == 7
+    assert tracker.stopped_at_depth == 6
+
+
+def test_tracker_stops_on_mate_and_reports_saved_budget():
+    tracker = ConvergenceTracker(ConvergencePolicy(stable_depths=5, min_depth=20))
+
+    assert _feed(tracker, [(1, "h5f7", None, 1), (2, "h5f7", None, 1)]) == 2
+    assert tracker.stop_reason == "mate"
+    summary = tracker.summary(time_limit=0.5, elapsed_seconds=0.1)
+    assert summary["stopped_early"] == "mate"
+    assert summary["time_saved_ms"] == 400.0
+
+
+def test_policy_from_payload():
+    assert ConvergencePolicy.from_payload(None, default_enabled=False) is None
+    assert ConvergencePolicy.from_payload(False, default_enabled=True) is None
+    assert ConvergencePolicy.from_payload(True, default_enabled=False) == ConvergencePolicy()
+
+    policy = ConvergencePolicy.from_payload({"stable_depths": 3, "min_depth": "8"}, default_enabled=False)
+    assert policy.stable_depths == 3
+    assert policy.min_depth == 8
+    assert policy.stop_on_mate is True
@@ -132,6 +132,82 @@ async def test_ensure_analysis_reuses_existing_job_and_raises_worker_target_dept
     await asyncio.gather(*(job.task for job in coordinator._jobs.values()), return_exceptions=True)
 
 
+def test_position_command_replays_game_moves_and_falls_back_to_fen() -> None:
+    fen = "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2"
+    request = AnalysisCoordinator.parse_request_payload(f'{{"fen": "{fen}", "moves": ["e2e4", "e7e5"]}}')
+    mismatched = AnalysisCoordinator.parse_request_payload(f'{{"fen": "{fen}", "moves": ["d2d4"]}}')
+
+    assert AnalysisCoordinator.position_command(request) == "position startpos moves e2e4 e7e5"
+    assert AnalysisCoordinator.position_command(mismatched) == f"position fen {fen}"
+
+
+@pytest.mark.asyncio
+async def test_prefetch_queues_next_mainline_plies_at_background_priority(monkeypatch) -> None:
+    import app.backend.db.db as db_module
+    from app.backend.services.analysis_coordinator import LiveConnection
+    from app.backend.services.engine_scheduler import EnginePriority
+
+    coordinator = AnalysisCoordinator(prefetch_plies=2, prefetch_depth=16)
+    board = importlib.import_module("chess").Board()
+    rows = []
+    for ply, san in enumerate(["e4", "e5", "Nf3", "Nc6"], start=1):
+        board.push_san(san)
+        rows.append({"ply": ply, "san": san, "fen": board.fen(), "is_mainline": True})
+    loads: list[int] = []
+    scheduled: list[tuple[str, int, EnginePriority]] = []
+
+    async def fake_get_moves(game_id: int) -> list[dict]:
+        loads.append(game_id)
+        return rows
+
+    async def fake_get_snapshot(fen: str, target_depth=None, prefer_richer_lines=False):
+        return _snapshot(20) if fen == rows[1]["fen"] else None
+
+    async def fake_ensure_analysis(fen, worker_target_depth, multipv=3, priority=EnginePriority.LIVE) -> bool:
+        scheduled.append((fen, worker_target_depth, priority))
+        return True
+
+    monkeypatch.setattr(db_module, "get_moves", fake_get_moves)
+    monkeypatch.setattr(coordinator, "_db_enabled", lambda: True)
+    monkeypatch.setattr(coordinator, "get_snapshot", fake_get_snapshot)
+    monkeypatch.setattr(coordinator, "ensure_analysis", fake_ensure_analysis)
+
+    connection = LiveConnection()
+    request = coordinator.parse_request_payload(f'{{"fen": "{rows[0]["fen"]}", "game_id": 7, "ply": 1}}')
+    await coordinator.prefetch_upcoming(request, connection)
+    await coordinator.prefetch_upcoming(request, connection)
+
+    assert loads == [7]
+    assert scheduled[0] == (rows[2]["fen"], 16, EnginePriority.BACKGROUND)
+    assert {fen for fen, _, _ in scheduled} == {rows[2]["fen"]}
+
+
+@pytest.mark.asyncio
+async def test_live_request_requeues_waiting_prefetch_job_at_live_priority(monkeypatch) -> None:
+    from app.backend.services.engine_scheduler import EnginePriority
+
+    coordinator = AnalysisCoordinator()
+    release = asyncio.Event()
+
+    async def fake_run_analysis_job(fen: str) -> None:
+        await release.wait()
+
+    monkeypatch.setattr(coordinator, "_run_analysis_job", fake_run_analysis_job)
+
+    await coordinator.ensure_analysis("fen-1", 16, priority=EnginePriority.BACKGROUND)
+    prefetch_task = coordinator._jobs["fen-1"].task
+    started = await coordinator.ensure_analysis("fen-1", 24)
+    await asyncio.sleep(0)
+
+    assert started is True
+    assert prefetch_task.cancelled()
+    assert coordinator._jobs["fen-1"].priority == EnginePriority.LIVE
+    assert coordinator._jobs["fen-1"].worker_target_depth == 24
+
+    release.set()
+    await asyncio.gather(*(job.task for job in coordinator._jobs.values()), return_exceptions=True)
+
+
 @pytest.mark.asyncio
 async def test_handle_websocket_extends_cached_snapshot_beyond_requested_worker_target(monkeypatch) -> None:
     coordinator = AnalysisCoordinator(poll_interval=0)
@@ -148,7 +224,7 @@ async def test_handle_websocket_extends_cached_snapshot_beyond_requested_worker_
             return _snapshot(20)
         return _snapshot(min(target_depth, 20))
 
-    async def fake_ensure_analysis(fen: str, worker_target_depth: int, multipv: int = 3) -> bool:
+    async def fake_ensure_analysis(fen: str, worker_target_depth: int, multipv: int = 3, **kwargs) -> bool:
         started.append((fen, worker_target_depth))
         return True
 
@@ -203,7 +279,7 @@ async def test_handle_websocket_holds_cached_snapshot_until_worker_reaches_cache
 
         return _snapshot(min(target_depth, 22))
 
-    async def fake_ensure_analysis(fen: str, worker_target_depth: int, multipv: int = 3) -> bool:
+    async def fake_ensure_analysis(fen: str, worker_target_depth: int, multipv: int = 3, **kwargs) -> bool:
         return True
 
     async def fake_job_is_running(fen: str) -> bool:
@@ -296,7 +372,7 @@ async def test_handle_websocket_prefers_richer_snapshot_over_one_line_lagged_sna
             return rich_snapshot
         return one_line_lagged_snapshot
 
-    async def fake_ensure_analysis(fen: str, worker_target_depth: int, multipv: int = 3) -> bool:
+    async def fake_ensure_analysis(fen: str, worker_target_depth: int, multipv: int = 3, **kwargs) -> bool:
         return False
 
     async def fake_job_is_running(fen: str) -> bool:
@@ -339,7 +415,7 @@ async def test_handle_websocket_starts_worker_and_streams_lagged_db_snapshots(mo
 
         return _snapshot(min(target_depth, 18))
 
-    async def fake_ensure_analysis(fen: str, worker_target_depth: int, multipv: int = 3) -> bool:
+    async def fake_ensure_analysis(fen: str, worker_target_depth: int, multipv: int = 3, **kwargs) -> bool:
         started.append((fen, worker_target_depth))
         return True
 
@@ -401,7 +477,7 @@ async def test_handle_websocket_reports_worker_progress_while_cached_depth_is_lo
 
         return _snapshot(min(target_depth, 43))
 
-    async def fake_ensure_analysis(fen: str, worker_target_depth: int, multipv: int = 3) -> bool:
+    async def fake_ensure_analysis(fen: str, worker_target_depth: int, multipv: int = 3, **kwargs) -> bool:
         return True
 
     async def fake_job_is_running(fen: str) -> bool:
@@ -435,3 +511,259 @@ async def test_handle_websocket_reports_worker_progress_while_cached_depth_is_lo
     assert websocket.messages[-1]["worker_depth"] == 43
 
 
+
+
+class ScriptedWebSocket:
+    def __init__(self, payloads: list[str]) -> None:
+        self.payloads = list(payloads)
+        self.accepted = False
+        self.messages: list[dict] = []
+        self.finished = asyncio.Event()
+
+    async def accept(self) -> None:
+        self.accepted = True
+
+    async def receive_text(self) -> str:
+        if self.payloads:
+            if len(self.payloads) == 1:
+                await self._wait_for_complete()
+            return self.payloads.pop(0)
+        await self.finished.wait()
+        from fastapi import WebSocketDisconnect
+
+        raise WebSocketDisconnect()
+
+    async def _wait_for_complete(self) -> None:
+        while not any(message.get("status") == "complete" for message in self.messages):
+            await asyncio.sleep(0)
+
+    async def send_json(self, payload: dict) -> None:
+        self.messages.append(payload)
+        completes = [message for message in self.messages if message.get("status") == "complete"]
+        if len(completes) == 2:
+            self.finished.set()
+
+
+class FakeLeasedEngine:
+    opened = 0
+
+    def __init__(self) -> None:
+        FakeLeasedEngine.opened += 1
+        self.commands: list[str] = []
+        self.closed = False
+        self.searching = False
+        self._depth = 0
+
+    async def start(self, options=None) -> None:
+        self.commands.append("ucinewgame")
+
+    def set_option(self, name: str, value) -> None:
+        self.commands.append(f"setoption name {name} value {value}")
+
+    async def go(self, position_command: str, go_command: str = "go infinite") -> None:
+        await self.stop()
+        self.commands.append(position_command)
+        self._depth = 0
+        self.searching = True
+
+    async def stop(self) -> None:
+        if self.searching:
+            self.commands.append("stop")
+        self.searching = False
+
+    async def readline(self, timeout=None) -> str:
+        await asyncio.sleep(0)
+        self._depth += 1
+        return f"info depth {self._depth} multipv 1 score cp 20 pv e2e4 e7e5"
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_direct_engine_stream_reuses_one_leased_engine_per_connection(monkeypatch) -> None:
+    import app.backend.services.analysis_coordinator as coordinator_module
+
+    coordinator = AnalysisCoordinator(poll_interval=0)
+    first_fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+    second_fen = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+    websocket = ScriptedWebSocket([
+        '{"fen": "' + first_fen + '", "depth": 2, "worker_target_depth": 3, "display_lag_depth": 0}',
+        '{"fen": "' + second_fen + '", "depth": 2, "worker_target_depth": 3, "display_lag_depth": 0}',
+    ])
+    engines: list[FakeLeasedEngine] = []
+
+    def open_engine(path: str) -> FakeLeasedEngine:
+        engine = FakeLeasedEngine()
+        engines.append(engine)
+        return engine
+
+    monkeypatch.setattr(coordinator, "_db_enabled", lambda: False)
+    monkeypatch.setattr(coordinator_module, "get_stockfish_path", lambda: "fake-stockfish")
+    monkeypatch.setattr(coordinator_module.AsyncStockfishSession, "open", staticmethod(open_engine))
+
+    await coordinator.handle_websocket(websocket)
+
+    assert len(engines) == 1
+    assert engines[0].commands.count("ucinewgame") == 1
+    assert [command for command in engines[0].commands if command.startswith("position")] == [
+        f"position fen {first_fen}",
+        f"position fen {second_fen}",
+    ]
+    assert engines[0].closed is True
+    assert coordinator_module.engine_scheduler.metrics()["active"] == 0
+    assert [message["fen"] for message in websocket.messages if message.get("status") == "complete"] == [
+        first_fen,
+        second_fen,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_idle_connection_yields_its_engine_and_re_leases_on_next_request(monkeypatch) -> None:
+    import app.backend.services.analysis_coordinator as coordinator_module
+    from app.backend.services.engine_scheduler import EnginePriority, EngineScheduler
+
+    scheduler = EngineScheduler(max_concurrency=1)
+    coordinator = AnalysisCoordinator(poll_interval=0)
+    fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+    request = coordinator.parse_request_payload(
+        '{"fen": "' + fen + '", "depth": 2, "worker_target_depth": 3, "display_lag_depth": 0}'
+    )
+    websocket = ScriptedWebSocket([])
+    engines: list[FakeLeasedEngine] = []
+
+    def open_engine(path: str) -> FakeLeasedEngine:
+        engine = FakeLeasedEngine()
+        engines.append(engine)
+        return engine
+
+    monkeypatch.setattr(coordinator_module, "engine_scheduler", scheduler)
+    monkeypatch.setattr(coordinator_module, "get_stockfish_path", lambda: "fake-stockfish")
+    monkeypatch.setattr(coordinator_module.AsyncStockfishSession, "open", staticmethod(open_engine))
+    connection = coordinator_module.LiveConnection()
+
+    await coordinator._stream_direct_engine(websocket, request, connection)
+    assert connection.lease.priority == EnginePriority.BACKGROUND
+
+    # A REST request arriving while the tab is idle gets the engine at once.
+    rest = await asyncio.wait_for(scheduler.acquire(EnginePriority.REST, "rest"), timeout=1)
+    assert connection.lease is None and connection.engine is None
+
+    waiting = asyncio.create_task(coordinator._stream_direct_engine(websocket, request, connection))
+    await asyncio.sleep(0)
+    assert not waiting.done()
+    scheduler.release(rest)
+    await asyncio.wait_for(waiting, timeout=1)
+    await connection.close()
+
+    assert len(engines) == 2 and all(engine.closed for engine in engines)
+    assert scheduler.metrics()["active"] == 0
+    assert scheduler.metrics()["classes"]["live"]["acquired"] == 2
+
+
+@pytest.mark.asyncio
+async def test_direct_engine_stream_tags_snapshots_with_the_phase_that_produced_them(monkeypatch) -> None:
+    import app.backend.services.analysis_coordinator as coordinator_module
+
+    coordinator = AnalysisCoordinator(poll_interval=0, deep_multipv=1, multipv_milestone_step=0)
+    fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+    display_depth = coordinator_module.DEFAULT_DISPLAY_TARGET_DEPTH
+    request = coordinator.parse_request_payload(
+        '{"fen": "' + fen + '", "depth": 2, "worker_target_depth": %d, "display_lag_depth": 0}' % (display_depth + 2)
+    )
+    websocket = ScriptedWebSocket([])
+    engine = FakeLeasedEngine()
+
+    monkeypatch.setattr(coordinator_module, "get_stockfish_path", lambda: "fake-stockfish")
+    monkeypatch.setattr(coordinator_module.AsyncStockfishSession, "open", staticmethod(lambda path: engine))
+    connection = coordinator_module.LiveConnection()
+
+    await coordinator._stream_direct_engine(websocket, request, connection)
+    await connection.close()
+
+    modes = {message["depth"]: message["search_mode"] for message in websocket.messages if message.get("type") == "snapshot"}
+    assert modes[display_depth] == "multipv"
+    assert modes[display_depth + 1] == modes[display_depth + 2] == "deep"
+    assert [command for command in engine.commands if command.startswith("setoption name MultiPV")] == [
+        "setoption name MultiPV value 3",
+        "setoption name MultiPV value 1",
+    ]
+
+
+class FakeUciProcess:
+    def __init__(self) -> None:
+        self.commands: list[str] = []
+        self.stdout = self
+        self._pending: list[str] = []
+        self._multipv = 1
+        self._depth = 0
+        self._searching = False
+
+    def write(self, command: str) -> None:
+        command = command.strip()
+        self.commands.append(command)
+        if command.startswith("setoption name MultiPV value"):
+            self._multipv = int(command.rsplit(" ", 1)[1])
+        elif command == "go infinite":
+            self._depth = 0
+            self._searching = True
+        elif command == "stop" and self._searching:
+            self._searching = False
+            self._pending = ["bestmove e2e4\n"]
+
+    def flush(self) -> None:
+        pass
+
+    def readline(self) -> str:
+        if not self._pending and self._searching:
+            self._depth += 1
+            self._pending = [
+                f"info depth {self._depth} multipv {line} score cp 20 pv e2e4 e7e5\n"
+                for line in range(1, self._multipv + 1)
+            ]
+        return self._pending.pop(0) if self._pending else ""
+
+    def poll(self):
+        return 0
+
+
+@pytest.mark.asyncio
+async def test_live_worker_drops_to_single_pv_past_display_depth(monkeypatch) -> None:
+    import app.backend.services.analysis_coordinator as coordinator_module
+    from app.backend.services.engine_scheduler import EngineLease, EnginePriority
+
+    process = FakeUciProcess()
+
+    class FakeSession:
+        def __init__(self, path) -> None:
+            self.process = process
+
+        def send(self, command: str) -> None:
+            process.write(command)
+
+    coordinator = AnalysisCoordinator(poll_interval=0, deep_multipv=1, multipv_milestone_step=0)
+    persisted: dict[int, list[str]] = {}
+
+    async def fake_persist(fen, depth, depth_bucket):
+        persisted[depth] = [depth_bucket[idx]["search_mode"] for idx in sorted(depth_bucket)]
+
+    async def fake_target(fen):
+        return coordinator_module.DEFAULT_DISPLAY_TARGET_DEPTH + 3
+
+    monkeypatch.setattr(coordinator_module, "StockfishSession", FakeSession)
+    monkeypatch.setattr(coordinator_module, "get_stockfish_path", lambda: "fake-stockfish")
+    monkeypatch.setattr(coordinator, "_persist_depth_snapshot", fake_persist)
+    monkeypatch.setattr(coordinator, "_get_job_worker_target_depth", fake_target)
+
+    inflight = coordinator_module.InFlightSearch(position="fen-1", depth=70, multipv=3, task=asyncio.Future())
+    coordinator._jobs["fen-1"] = type("Job", (), {"inflight": inflight, "progress": coordinator_module.SearchProgress()})()
+
+    await coordinator._search_analysis_job("fen-1", EngineLease(priority=EnginePriority.LIVE))
+
+    display_depth = coordinator_module.DEFAULT_DISPLAY_TARGET_DEPTH
+    assert inflight.multipv == 1
+    multipv_settings = [command for command in process.commands if command.startswith("setoption name MultiPV")]
+    assert multipv_settings == ["setoption name MultiPV value 3", "setoption name MultiPV value 1"]
+    assert persisted[display_depth] == ["multipv"] * 3
+    assert persisted[display_depth + 1] == ["deep"]
+    assert max(persisted) == display_depth + 3
@@ -0,0 +1,141 @@
+import pytest
+
+from app.backend.db.db import (
+    get_analysis_lines,
+    get_latest_analysis_snapshot,
+    position_key,
+    prune_analysis_line_sets,
+    store_analysis_lines,
+    upsert_eval,
+)
+
+FEN = "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3"
+
+
+def _lines(count, score_cp):
+    moves = ["f1b5", "f1c4", "d2d4"]
+    return [
+        {"best_move": move, "score_cp": score_cp - idx, "score_mate": None, "pv": f"{move} a7a6"}
+        for idx, move in enumerate(moves[:count])
+    ]
+
+
+@pytest.mark.asyncio
+async def test_latest_snapshot_tracks_deepest_richest_and_capped_sets(db_conn):
+    async with db_conn.cursor() as cur:
+        await cur.execute(
+            "DELETE FROM public.analysis_latest WHERE position_id IN (SELECT id FROM public.positions WHERE epd = %s)",
+            (position_key(FEN),),
+        )
+        await cur.execute(
+            "DELETE FROM public.analysis_line_sets WHERE position_id IN (SELECT id FROM public.positions WHERE epd = %s)",
+            (position_key(FEN),),
+        )
+        await db_conn.commit()
+
+    await upsert_eval(fen=FEN, best_move="f1b5", score_cp=30, depth=24, pv="f1b5 a7a6")
+    await store_analysis_lines(FEN, 12, _lines(3, 20))
+    await store_analysis_lines(FEN, 18, _lines(3, 25))
+    await store_analysis_lines(FEN, 24, _lines(1, 30))
+
+    deepest = await get_latest_analysis_snapshot(FEN)
+    assert deepest["depth"] == 24 and len(deepest["lines"]) == 1
+
+    richest = await get_latest_analysis_snapshot(FEN, prefer_richer_lines=True)
+    assert richest["depth"] == 18 and [line["line_number"] for line in richest["lines"]] == [1, 2, 3]
+
+    capped = await get_latest_analysis_snapshot(FEN, target_depth=15)
+    assert capped["depth"] == 12 and capped["score_cp"] == 20
+
+    assert (await get_latest_analysis_snapshot(FEN, target_depth=5))["depth"] == 24  # evals fallback
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_shared_by_fens_differing_only_in_move_clocks(db_conn):
+    other_clocks = FEN.rsplit(" ", 2)[0] + " 0 9"
+    async with db_conn.cursor() as cur:
+        await cur.execute("DELETE FROM public.evals WHERE fen = %s", (other_clocks,))
+        await db_conn.commit()
+
+    await upsert_eval(fen=FEN, best_move="f1b5", score_cp=30, depth=24, pv="f1b5 a7a6")
+    await store_analysis_lines(FEN, 24, _lines(1, 30))
+
+    snapshot = await get_latest_analysis_snapshot(other_clocks)
+
+    assert snapshot["fen"] == other_clocks
+    assert snapshot["depth"] == 24 and snapshot["best_move"] == "f1b5"
+    assert snapshot["eval_depth"] is not None and snapshot["eval_depth"] >= 24
+    assert await get_latest_analysis_snapshot("8/8/8/8/8/2k5/8/K7 w - - 0 1") is None
+
+
+@pytest.mark.asyncio
+async def test_snapshot_falls_back_to_an_eval_row_without_a_position(db_conn):
+    legacy = "8/8/8/4k3/8/8/3QK3/8 w - - 0 60"
+    async with db_conn.cursor() as cur:
+        await cur.execute("DELETE FROM public.evals WHERE fen = %s", (legacy,))
+        await cur.execute(
+            "DELETE FROM public.position_structures WHERE position_id IN (SELECT id FROM public.positions WHERE epd = %s)",
+            (position_key(legacy),),
+        )
+        await cur.execute("DELETE FROM public.positions WHERE epd = %s", (position_key(legacy),))
+        await cur.execute(
+            "INSERT INTO public.evals (fen, best_move, score_cp, depth, pv) VALUES (%s, 'd2d4', 900, 30, 'd2d4')",
+            (legacy,),
+        )
+        await db_conn.commit()
+
+    snapshot = await get_latest_analysis_snapshot(legacy)
+
+    assert (snapshot["depth"], snapshot["best_move"], snapshot["score_cp"]) == (30, "d2d4", 900)
+
+
+@pytest.mark.asyncio
+async def test_analysis_lines_round_trip_through_packed_line_sets(db_conn):
+    await upsert_eval(fen=FEN, best_move="f1b5", score_cp=30, depth=10, pv="f1b5 a7a6")
+    await store_analysis_lines(FEN, 10, _lines(3, 40))
+    await store_analysis_lines(FEN, 10, [{"best_move": "e1g1", "score_cp": None, "score_mate": 3, "pv": ""}])
+
+    lines = await get_analysis_lines(FEN, 10)
+
+    assert [(line["line_number"], line["best_move"]) for line in lines] == [(1, "e1g1"), (2, "f1c4"), (3, "d2d4")]
+    assert lines[0]["score_mate"] == 3 and lines[0]["score_cp"] is None and lines[0]["pv"] == ""
+    assert lines[1]["pv"] == "f1c4 a7a6" and lines[1]["score_cp"] == 39
+
+
+@pytest.mark.asyncio
+async def test_prune_keeps_latest_depths_and_milestones(db_conn):
+    await upsert_eval(fen=FEN, best_move="f1b5", score_cp=30, depth=24, pv="f1b5 a7a6")
+    for depth in range(8, 25):
+        await store_analysis_lines(FEN, depth, _lines(1, depth))
+
+    after = 0
+    deleted = 0
+    while True:
+        result = await prune_analysis_line_sets(after, keep_latest=3, milestone_step=10, batch_size=100)
+        if result["last_position_id"] is None:
+            break
+        deleted += result["line_sets"]
+        after = result["last_position_id"]
+
+    remaining = sorted({line["depth"] for line in await get_analysis_lines(FEN)})
+    assert remaining == [10, 20, 22, 23, 24]
+    assert deleted >= 12
+    assert (await get_latest_analysis_snapshot(FEN))["depth"] == 24
+
+
+@pytest.mark.asyncio
+async def test_eval_keeps_the_limits_of_a_search_that_stopped_short(db_conn):
+    fen = "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"
+    async with db_conn.cursor() as cur:
+        await cur.execute("DELETE FROM public.evals WHERE fen = %s", (fen,))
+        await db_conn.commit()
+
+    await upsert_eval(fen=fen, best_move="e1g1", score_cp=35, depth=14, pv="e1g1", target_depth=20, target_time=0.5)
+    snapshot = await get_latest_analysis_snapshot(fen)
+    assert (snapshot["eval_depth"], snapshot["target_depth"], snapshot["target_time"]) == (14, 20, 0.5)
+
+    # A shallower time-capped result leaves the deeper row but hands it its limits.
+    await upsert_eval(fen=fen, best_move="e1g1", score_cp=40, depth=18, pv="e1g1")
+    await upsert_eval(fen=fen, best_move="d2d3", score_cp=20, depth=12, pv="d2d3", target_depth=22, target_time=0.5)
+    snapshot = await get_latest_analysis_snapshot(fen)
+    assert (snapshot["depth"], snapshot["best_move"], snapshot["target_depth"]) == (18, "e1g1", 22)
@@ -0,0 +1,58 @@
+import chess
+from fastapi.testclient import TestClient
+
+from app.backend.api import routes
+from app.backend.db import db
+from app.backend.db.codecs import pack_move
+from app.backend.db.db import _explorer_keys
+from app.backend.main import app
+
+
+def _row(move, games, white_wins, draws, black_wins, white_elos=(), black_elos=()):
+    return {
+        "move": pack_move(move),
+        "games": games,
+        "white_wins": white_wins,
+        "draws": draws,
+        "black_wins": black_wins,
+        "white_elo_total": sum(white_elos),
+        "white_elo_games": len(white_elos),
+        "black_elo_total": sum(black_elos),
+        "black_elo_games": len(black_elos),
+    }
+
+
+def test_explorer_returns_move_stats_and_cached_eval(monkeypatch):
+    async def fake_get_explorer_position(fen, limit=30):
+        return {
+            "games": 6,  # includes moves beyond the returned top `limit`
+            "moves": [_row("e2e4", 3, 2, 0, 1, (2400, 2600), (2500,)), _row("d2d4", 1, 0, 1, 0)],
+            "eval": {"best_move": "e2e4", "score_cp": 25, "score_mate": None, "depth": 30, "pv": "e2e4 e7e5"},
+        }
+
+    monkeypatch.setattr(routes, "DB_ENABLED", True)
+    monkeypatch.setattr(db, "get_explorer_position", fake_get_explorer_position)
+
+    resp = TestClient(app).get("/explorer", params={"fen": chess.STARTING_FEN})
+
+    assert resp.status_code == 200, resp.text
+    payload = resp.json()
+    assert payload["games"] == 6
+    assert payload["eval"]["depth"] == 30
+    e4, d4 = payload["moves"]
+    assert (e4["san"], e4["games"], e4["white_score_percentage"]) == ("e4", 3, 66.7)
+    assert (e4["average_white_elo"], e4["average_black_elo"]) == (2500, 2500)
+    assert (d4["san"], d4["white_score_percentage"], d4["average_white_elo"]) == ("d4", 50.0, None)
+
+
+def test_explorer_counts_each_position_move_pair_once_per_game():
+    board = chess.Board()
+    rows = [{"ply": 0, "san": "START", "fen_before": None, "position_before_id": None}]
+    for ply, san in enumerate(["Nf3", "Nf6", "Ng1", "Ng8", "Nf3"], start=1):
+        rows.append({"ply": ply, "san": san, "fen_before": board.fen(), "position_before_id": 100 + ply % 4})
+        board.push_san(san)
+
+    keys = _explorer_keys(rows)
+
+    assert (101, pack_move("g1f3")) in keys
+    assert len(keys) == 4  # the repeated Nf3 from the start position counts once
@@ -0,0 +1,77 @@
+import pytest
+
+from app.backend.db.db import (
+    create_game,
+    get_game_accuracy,
+    get_moves,
+    insert_moves,
+    mark_stale_accuracy_games,
+    save_game_accuracy,
+    upsert_eval,
+)
+
+START = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+AFTER_H3 = "rnbqkbnr/pppppppp/8/8/8/7P/PPPPPPP1/RNBQKBNR b KQkq - 0 1"
+
+
+def _result(game_id):
+    return {
+        "game_id": game_id,
+        "white": {"acpl": 10.0, "accuracy": 95.0},
+        "black": {"acpl": 10.0, "accuracy": 95.0},
+        "evaluated_plies": 2,
+        "eval_depth_total": 20,
+        "moves": [],
+        "critical_plies": [],
+    }
+
+
+@pytest.mark.asyncio
+async def test_only_deeper_evals_queue_their_games_for_recompute(db_conn):
+    async with db_conn.cursor() as cur:
+        await cur.execute("DELETE FROM public.evals WHERE fen = %s", (AFTER_H3,))
+        await db_conn.commit()
+
+    game_id = await create_game("1. h3 *", {"white": "A", "black": "B", "result": "*"})
+    await insert_moves(
+        game_id,
+        [
+            {"ply": 0, "san": "", "fen": START, "is_mainline": True},
+            {"ply": 1, "san": "h3", "fen": AFTER_H3, "fen_before": START, "is_mainline": True},
+        ],
+    )
+    await upsert_eval(fen=AFTER_H3, best_move="e7e5", score_cp=10, depth=12, pv="e7e5")
+    await save_game_accuracy([_result(game_id)])
+    assert (await get_game_accuracy(game_id))["stale"] is False
+
+    await upsert_eval(fen=AFTER_H3, best_move="e7e5", score_cp=12, depth=10, pv="e7e5")
+    assert (await get_game_accuracy(game_id))["stale"] is False
+
+    await upsert_eval(fen=AFTER_H3, best_move="d7d5", score_cp=15, depth=30, pv="d7d5")
+    assert (await get_game_accuracy(game_id))["stale"] is True
+
+    while await mark_stale_accuracy_games(1000):
+        pass
+    assert (await get_game_accuracy(game_id))["stale"] is True
+    await save_game_accuracy([_result(game_id)])
+    assert (await get_game_accuracy(game_id))["stale"] is False
+
+
+@pytest.mark.asyncio
+async def test_saving_a_report_stores_each_moves_nag(db_conn):
+    game_id = await create_game("1. h3 *", {"white": "A", "black": "B", "result": "*"})
+    await insert_moves(
+        game_id,
+        [
+            {"ply": 0, "san": "", "fen": START, "is_mainline": True},
+            {"ply": 1, "san": "h3", "fen": AFTER_H3, "fen_before": START, "is_mainline": True},
+        ],
+    )
+    result = {**_result(game_id), "moves": [{"ply": 1, "side": "white", "phase": "opening", "classification": "mistake", "nag": 2}]}
+
+    await save_game_accuracy([result])
+    assert [(row["ply"], row["nag"]) for row in await get_moves(game_id)] == [(0, None), (1, 2)]
+
+    result["moves"][0].update(classification=None, nag=None)
+    await save_game_accuracy([result])
+    assert [row["nag"] for row in await get_moves(game_id)] == [None, None]
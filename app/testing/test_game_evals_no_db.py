@@ -0,0 +1,63 @@
+import base64
+from array import array
+
+from fastapi.testclient import TestClient
+
+from app.backend.api import routes
+from app.backend.db.codecs import TYPED_ARRAY_MISSING, unpack_move
+from app.backend.main import app
+
+START = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+AFTER_E4 = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+AFTER_E5 = "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2"
+
+ROWS = [
+    {"ply": 0, "san": "START", "fen": START, "score_cp": 25, "score_mate": None, "depth": 22, "best_move": "e2e4"},
+    {"ply": 1, "san": "e4", "fen": AFTER_E4, "score_cp": None, "score_mate": None, "depth": None, "best_move": None},
+    {"ply": 2, "san": "e5", "fen": AFTER_E5, "score_cp": None, "score_mate": 3, "depth": 18, "best_move": "g1f3"},
+]
+
+
+def _decode(data: str, typecode: str = "i") -> list[int]:
+    return list(array(typecode, base64.b64decode(data)))
+
+
+def _client(monkeypatch) -> TestClient:
+    async def fake_get_game_evals(game_id: int):
+        return ROWS if game_id == 7 else []
+
+    monkeypatch.setattr(routes, "DB_ENABLED", True)
+    monkeypatch.setattr(routes, "get_game_evals", fake_get_game_evals, raising=False)
+    return TestClient(app)
+
+
+def test_game_evals_returns_aligned_arrays_and_missing_plies(monkeypatch):
+    resp = _client(monkeypatch).get("/games/7/evals")
+
+    assert resp.status_code == 200, resp.text
+    payload = resp.json()
+    assert payload["plies"] == [0, 1, 2]
+    assert payload["cp"] == [25, None, None]
+    assert payload["mate"] == [None, None, 3]
+    assert payload["depth"] == [22, None, 18]
+    assert payload["best_move"] == ["e2e4", None, "g1f3"]
+    assert payload["missing"] == [{"ply": 1, "fen": AFTER_E4}]
+
+
+def test_game_evals_typed_encoding_packs_base64_arrays(monkeypatch):
+    resp = _client(monkeypatch).get("/games/7/evals", params={"encoding": "typed"})
+
+    assert resp.status_code == 200, resp.text
+    payload = resp.json()
+    assert payload["missing_value"] == TYPED_ARRAY_MISSING
+    assert _decode(payload["cp"]) == [25, TYPED_ARRAY_MISSING, TYPED_ARRAY_MISSING]
+    assert _decode(payload["depth"]) == [22, TYPED_ARRAY_MISSING, 18]
+    assert [unpack_move(move) if move else None for move in _decode(payload["best_move"], "H")] == ["e2e4", None, "g1f3"]
+    assert payload["missing"] == [{"ply": 1, "fen": AFTER_E4}]
+
+
+def test_game_evals_rejects_unknown_encoding_and_missing_games(monkeypatch):
+    client = _client(monkeypatch)
+
+    assert client.get("/games/7/evals", params={"encoding": "xml"}).status_code == 400
+    assert client.get("/games/8/evals").status_code == 404
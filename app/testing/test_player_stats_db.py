@@ -0,0 +1,59 @@
+import pytest
+
+from app.backend.db.db import create_game, get_player_stats, save_game_accuracy
+
+
+def _result(game_id, white_acpl, black_acpl, blunder_ply=None):
+    moves = [{"ply": 1, "phase": "opening", "classification": None}]
+    if blunder_ply:
+        moves.append({"ply": blunder_ply, "phase": "middlegame", "classification": "blunder"})
+    return {
+        "game_id": game_id,
+        "white": {"acpl": white_acpl, "accuracy": 90.0},
+        "black": {"acpl": black_acpl, "accuracy": 80.0},
+        "evaluated_plies": 2,
+        "eval_depth_total": 40,
+        "moves": moves,
+        "critical_plies": [],
+    }
+
+
+@pytest.mark.asyncio
+async def test_player_stats_follow_recomputed_games_incrementally(db_conn):
+    async with db_conn.cursor() as cur:
+        await cur.execute("DELETE FROM public.player_game_stats WHERE player_key IN ('stats white', 'stats black')")
+        await cur.execute("DELETE FROM public.player_stats WHERE player_key IN ('stats white', 'stats black')")
+        await db_conn.commit()
+
+    first = await create_game("1. e4 1-0", {"white": "Stats White", "black": "Stats Black", "result": "1-0"})
+    second = await create_game("1. e4 0-1", {"white": "Stats Black", "black": "Stats White", "result": "0-1"})
+
+    await save_game_accuracy([_result(first, 20.0, 40.0), _result(second, 60.0, 10.0)])
+    # Deeper evals land on the first game: only its contribution changes.
+    await save_game_accuracy([_result(first, 30.0, 40.0, blunder_ply=25)])
+
+    player = await get_player_stats("stats white")
+    stats = player["stats"]
+    assert (stats["games"], stats["wins"], stats["losses"]) == (2, 2, 0)
+    assert stats["acpl_total"] == pytest.approx(40.0) and stats["acpl_games"] == 2
+    assert stats["blunders_middlegame"] == 1
+    assert [game["game_id"] for game in player["recent"]] == [second, first]
+
+
+@pytest.mark.asyncio
+async def test_player_stats_count_both_sides_of_a_game_against_oneself(db_conn):
+    async with db_conn.cursor() as cur:
+        await cur.execute("DELETE FROM public.player_game_stats WHERE player_key = 'stats mirror'")
+        await cur.execute("DELETE FROM public.player_stats WHERE player_key = 'stats mirror'")
+        await db_conn.commit()
+
+    game_id = await create_game("1. e4 1-0", {"white": "Stats Mirror", "black": "stats  mirror", "result": "1-0"})
+
+    await save_game_accuracy([_result(game_id, 20.0, 40.0)])
+    await save_game_accuracy([_result(game_id, 30.0, 40.0)])
+
+    player = await get_player_stats("stats mirror")
+    stats = player["stats"]
+    assert (stats["games"], stats["wins"], stats["losses"]) == (2, 1, 1)
+    assert stats["acpl_total"] == pytest.approx(70.0) and stats["acpl_games"] == 2
+    assert [(game["game_id"], game["color"]) for game in player["recent"]] == [(game_id, "W"), (game_id, "B")]
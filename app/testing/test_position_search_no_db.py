@@ -0,0 +1,69 @@
+import chess
+import chess.polyglot
+from fastapi.testclient import TestClient
+
+from app.backend.api import routes
+from app.backend.db import db
+from app.backend.main import app
+
+AFTER_E4 = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+
+
+def _client(monkeypatch, calls):
+    async def fake_find_position_games(zobrist, after=None, limit=50):
+        calls.append((zobrist, after, limit))
+        return [
+            {"game_id": 3, "ply": 1, "white": "A", "black": "B", "result": "1-0", "event": None, "date": None},
+            {"game_id": 9, "ply": 1, "white": "C", "black": "D", "result": "0-1", "event": None, "date": None},
+        ][:limit]
+
+    monkeypatch.setattr(routes, "DB_ENABLED", True)
+    monkeypatch.setattr(db, "find_position_games", fake_find_position_games)
+    return TestClient(app)
+
+
+def test_position_games_accepts_a_fen_and_pages_by_cursor(monkeypatch):
+    calls = []
+    client = _client(monkeypatch, calls)
+
+    resp = client.get(f"/positions/{AFTER_E4}/games", params={"limit": 2})
+
+    assert resp.status_code == 200, resp.text
+    payload = resp.json()
+    expected_key = chess.polyglot.zobrist_hash(chess.Board(AFTER_E4))
+    assert payload["key"] == f"{expected_key:016x}"
+    assert [game["game_id"] for game in payload["games"]] == [3, 9]
+    assert payload["next_cursor"] == "9:1"
+
+    resp = client.get(f"/positions/{payload['key']}/games", params={"after": "9:1", "limit": 5})
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["next_cursor"] is None
+    assert calls[0][0] == calls[1][0] and calls[1][1:] == ((9, 1), 5)
+
+
+def test_position_games_rejects_bad_keys_and_cursors(monkeypatch):
+    client = _client(monkeypatch, [])
+
+    assert client.get("/positions/not-a-position/games").status_code == 400
+    assert client.get(f"/positions/{AFTER_E4}/games", params={"after": "nine"}).status_code == 400
+
+
+def test_similar_positions_clamps_distance_and_reports_structure(monkeypatch):
+    calls = []
+
+    async def fake_find_similar_positions(fen, max_distance=0, same_king_zones=False, limit=50):
+        calls.append((fen, max_distance, same_king_zones, limit))
+        return [{"game_id": 4, "ply": 7, "fen": fen, "pawn_distance": 1, "same_king_zones": True}]
+
+    monkeypatch.setattr(routes, "DB_ENABLED", True)
+    monkeypatch.setattr(db, "find_similar_positions", fake_find_similar_positions)
+    client = TestClient(app)
+
+    resp = client.get("/positions/similar", params={"fen": AFTER_E4, "max_distance": 99, "same_king_zones": "true"})
+
+    assert resp.status_code == 200, resp.text
+    payload = resp.json()
+    assert calls == [(AFTER_E4, routes.SIMILAR_POSITIONS_MAX_DISTANCE, True, routes.POSITION_GAMES_DEFAULT_LIMIT)]
+    assert payload["structure"]["white_pawns"] == f"{int(chess.Board(AFTER_E4).pieces(chess.PAWN, chess.WHITE)):016x}"
+    assert payload["games"][0]["game_id"] == 4
+    assert client.get("/positions/similar", params={"fen": "nope"}).status_code == 400
@@ -0,0 +1,141 @@
+import pytest
+
+from app.backend.db.codecs import pack_move
+from app.backend.db.db import (
+    backfill_pawn_blocks,
+    create_game,
+    find_position_games,
+    find_similar_positions,
+    get_explorer_position,
+    get_connection,
+    get_game_evals,
+    insert_moves,
+    position_key,
+    position_zobrist,
+    upsert_eval,
+)
+
+START = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+AFTER_NF3 = "rnbqkbnr/pppppppp/8/8/8/5N2/PPPPPPPP/RNBQKB1R b KQkq - 1 1"
+AFTER_NF6 = "rnbqkb1r/pppppppp/5n2/8/8/5N2/PPPPPPPP/RNBQKB1R w KQkq - 2 2"
+AFTER_NG1 = "rnbqkb1r/pppppppp/5n2/8/8/8/PPPPPPPP/RNBQKBNR b KQkq - 3 2"
+AFTER_NG8 = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 4 3"
+
+
+@pytest.mark.asyncio
+async def test_moves_and_evals_share_position_ids(db_conn):
+    game_id = await create_game("1. Nf3 Nf6 2. Ng1 Ng8 *", {"white": "A", "black": "B", "result": "*"})
+    fens = [START, AFTER_NF3, AFTER_NF6, AFTER_NG1, AFTER_NG8]
+    await insert_moves(
+        game_id,
+        [
+            {"ply": ply, "san": san, "fen": fen, "fen_before": fens[ply - 1] if ply else None, "is_mainline": True}
+            for ply, (san, fen) in enumerate(zip(["", "Nf3", "Nf6", "Ng1", "Ng8"], fens))
+        ],
+    )
+    await upsert_eval(fen=START, best_move="e2e4", score_cp=25, depth=20, pv="e2e4")
+
+    async with await get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT ply, position_id, position_before_id FROM public.moves WHERE game_id = %s ORDER BY ply",
+                (game_id,),
+            )
+            rows = await cur.fetchall()
+            await cur.execute("SELECT id, zobrist FROM public.positions WHERE epd = %s", (position_key(START),))
+            start_position = await cur.fetchone()
+
+    assert rows[0]["position_id"] == rows[4]["position_id"] == start_position["id"]
+    assert rows[1]["position_before_id"] == start_position["id"]
+    assert start_position["zobrist"] is not None
+
+    evals = await get_game_evals(game_id)
+    assert [row["ply"] for row in evals] == [0, 1, 2, 3, 4]
+    assert evals[0]["score_cp"] == evals[4]["score_cp"] == 25
+
+
+@pytest.mark.asyncio
+async def test_position_occurrences_find_every_game_reaching_a_position(db_conn):
+    fens = [START, AFTER_NF3, AFTER_NF6, AFTER_NG1, AFTER_NG8]
+    moves = [
+        {"ply": ply, "san": san, "fen": fen, "is_mainline": True}
+        for ply, (san, fen) in enumerate(zip(["", "Nf3", "Nf6", "Ng1", "Ng8"], fens))
+    ]
+    game_ids = [
+        await create_game("1. Nf3 Nf6 2. Ng1 Ng8 *", {"white": "A", "black": "B", "result": "*"}) for _ in range(2)
+    ]
+    for game_id in game_ids:
+        await insert_moves(game_id, moves)
+
+    found = await find_position_games(position_zobrist(AFTER_NF6), limit=1000)
+    assert {(row["game_id"], row["ply"]) for row in found if row["game_id"] in game_ids} == {
+        (game_ids[0], 2),
+        (game_ids[1], 2),
+    }
+
+    first_page = await find_position_games(position_zobrist(START), after=(game_ids[0] - 1, 10**6), limit=2)
+    assert [(row["game_id"], row["ply"]) for row in first_page] == [(game_ids[0], 0), (game_ids[0], 4)]
+
+
+@pytest.mark.asyncio
+async def test_explorer_counts_survive_reimporting_a_game(db_conn):
+    fens = [START, AFTER_NF3, AFTER_NF6]
+    moves = [
+        {"ply": ply, "san": san, "fen": fen, "fen_before": fens[ply - 1] if ply else None, "is_mainline": True}
+        for ply, (san, fen) in enumerate(zip(["START", "Nf3", "Nf6"], fens))
+    ]
+    before = await get_explorer_position(AFTER_NF3)
+    game_id = await create_game("1. Nf3 Nf6 1-0", {"white": "A", "black": "B", "result": "1-0", "white_elo": 2000})
+
+    await insert_moves(game_id, moves)
+    await insert_moves(game_id, moves)
+
+    after = await get_explorer_position(AFTER_NF3)
+    counts = {row["move"]: row for row in after["moves"]}
+    previous = {row["move"]: row for row in before["moves"]}
+    nf6 = counts[pack_move("g8f6")]
+    old = previous.get(pack_move("g8f6"), {"games": 0, "white_wins": 0, "white_elo_total": 0})
+    assert nf6["games"] - old["games"] == 1
+    assert nf6["white_wins"] - old["white_wins"] == 1
+    assert nf6["white_elo_total"] - old["white_elo_total"] == 2000
+
+    limited = await get_explorer_position(AFTER_NF3, limit=1)
+    assert after["games"] - before["games"] == 1
+    assert limited["games"] == after["games"] == sum(row["games"] for row in after["moves"])
+
+
+@pytest.mark.asyncio
+async def test_similar_positions_match_pawn_structure_and_material(db_conn):
+    after_e4 = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+    after_e4_nc6 = "r1bqkbnr/pppppppp/2n5/8/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 1 2"
+    game_id = await create_game("1. e4 Nc6 *", {"white": "A", "black": "B", "result": "*"})
+    await insert_moves(
+        game_id,
+        [
+            {"ply": 0, "san": "", "fen": START, "is_mainline": True},
+            {"ply": 1, "san": "e4", "fen": after_e4, "is_mainline": True},
+            {"ply": 2, "san": "Nc6", "fen": after_e4_nc6, "is_mainline": True},
+        ],
+    )
+
+    exact = await find_similar_positions(after_e4, limit=1000)
+    assert {row["ply"] for row in exact if row["game_id"] == game_id} == {1, 2}
+
+    near = await find_similar_positions(START, max_distance=2, limit=1000)
+    found = {row["ply"]: row["pawn_distance"] for row in near if row["game_id"] == game_id}
+    assert found == {0: 0, 1: 2, 2: 2}
+
+    # Rows indexed before pawn block keys existed are found again once backfilled.
+    async with db_conn.cursor() as cur:
+        await cur.execute(
+            """
+            UPDATE public.position_structures SET pawn_blocks = NULL
+            WHERE position_id IN (SELECT position_id FROM public.moves WHERE game_id = %s)
+            """,
+            (game_id,),
+        )
+        await db_conn.commit()
+    assert not [row for row in await find_similar_positions(START, max_distance=2, limit=1000) if row["game_id"] == game_id]
+    assert await backfill_pawn_blocks(db_conn) >= 3
+    near = await find_similar_positions(START, max_distance=2, limit=1000)
+    assert {row["ply"] for row in near if row["game_id"] == game_id} == {0, 1, 2}